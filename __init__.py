@@ -3,12 +3,13 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
 
     # --- Config ---
@@ -16,12 +17,35 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.root_path, 'smartbank.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB, adjust as needed
+    # X-Forwarded-For hops to trust, so request.remote_addr (the face
+    # login rate limit key) is the client rather than the router in
+    # front of gunicorn. 0 when the app is not behind a proxy.
+    app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    if config:
+        app.config.update(config)
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 
+    from . import database
+    database.configure(app)  # DATABASE_PROFILE=default|production|postgres
 
     # --- Init extensions ---
     db.init_app(app)
+    with app.app_context():
+        database.install_pragmas(app, db.engine)
+    from .query_counter import query_counter
+    query_counter.init_app(app)  # QUERY_COUNTER, on in debug mode
     login_manager.init_app(app)
-    Migrate(app, db)
+    Migrate(app, db, directory=app.root_path)  # env.py and versions/ live next to this file
+
+    from . import face_service
+    from .face_pool import face_pool
+    from .rate_limit import face_login_limiter
+    face_service.init_app(app)  # NumPy/OpenCV load on the first face request
+    face_pool.init_app(app)
+    face_login_limiter.init_app(app)
+    from .fraud import fraud_scorer
+    fraud_scorer.init_app(app)
 
     # --- Login manager ---
     login_manager.login_view = "main.login"
@@ -29,6 +53,19 @@ def create_app():
 
     # --- Import models ---
     from . import models
+    models.identity_cache.configure(
+        maxsize=app.config.get('IDENTITY_CACHE_SIZE', 1024),
+        ttl=app.config.get('IDENTITY_CACHE_TTL', 30),
+    )
+    from .goal_analytics import analytics_cache
+    analytics_cache.configure(
+        maxsize=app.config.get('GOAL_ANALYTICS_CACHE_SIZE', 1024),
+        ttl=app.config.get('GOAL_ANALYTICS_CACHE_TTL', 300),
+    )
+    from .translation import translations
+    translations.init_app(app)
+    from .page_cache import page_cache
+    page_cache.init_app(app)
 
     # --- Register blueprints ---
     from .routes import main as main_blueprint
@@ -39,4 +76,10 @@ def create_app():
     app.register_blueprint(customer_bp, url_prefix='/customer')
     app.register_blueprint(staff_bp, url_prefix='/staff')
 
+    # --- CLI ---
+    from .cli import faces_cli, smart_saver_cli, translate_cli
+    app.cli.add_command(faces_cli)
+    app.cli.add_command(translate_cli)
+    app.cli.add_command(smart_saver_cli)
+
     return app
@@ -0,0 +1,99 @@
+"""Dashboard latency with and without the materialized summary.
+
+Usage: python -m app.bench_dashboard [--rows 10000] [--repeat 200]
+
+Seeds one customer with ``--rows`` goals and ``--rows`` transactions in a
+throwaway SQLite file, then times:
+
+  legacy   what the dashboard used to do: load the account and every goal
+           and sum the Smart Saver balances in Python
+  summary  the single primary-key read of dashboard_summary
+  route    a full GET /dashboard through the test client
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from app import create_app, db, summary
+from app.models import Account, FinancialGoal, Transaction, User
+
+
+def seed(rows):
+    user = User(email="bench@example.com", username="bench", name="Bench")
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Account(user_id=user.id, account_number="BE00000001", balance=100000))
+    db.session.add_all(
+        FinancialGoal(user_id=user.id, name=f"goal {i}", target_amount=1000,
+                      smart_saver_balance=1, deadline=date(2030, 1, 1))
+        for i in range(rows)
+    )
+    db.session.add_all(
+        Transaction(user_id=user.id, type="Deposit", amount=10, status="Success")
+        for _ in range(rows)
+    )
+    summary.rebuild(user.id)
+    db.session.commit()
+    return user.id
+
+
+def legacy(user_id):
+    user = db.session.get(User, user_id)
+    account = user.account
+    goal_savings = sum(goal.smart_saver_balance for goal in user.goals)
+    return account.balance - goal_savings
+
+
+def fresh(user_id):
+    return summary.get(user_id).usable_balance
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()  # every request starts with an empty session
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:>8}: median {statistics.median(samples):8.3f} ms  p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "dashboard_bench.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    with app.app_context():
+        db.create_all()
+        user_id = seed(args.rows)
+        assert legacy(user_id) == fresh(user_id)
+        print(f"{args.rows} goals and {args.rows} transactions, {args.repeat} runs")
+        report("legacy", timed(lambda: legacy(user_id), args.repeat))
+        report("summary", timed(lambda: fresh(user_id), args.repeat))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        client.get("/dashboard")
+        samples.append((time.perf_counter() - start) * 1000)
+    report("route", samples)
+
+
+if __name__ == "__main__":
+    main()
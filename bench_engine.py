@@ -0,0 +1,107 @@
+"""Compare database engine profiles under mixed route traffic.
+
+Usage: python -m app.bench_engine [--workers 4] [--requests 300] [--writes 0.2]
+                                  [--profiles default production]
+
+Each worker process plays a gunicorn worker: it builds its own app and
+drives the dashboard, transaction history and deposit routes through the
+test client for one seeded customer. Reads and writes are mixed in the
+given ratio. For every profile the script reports throughput, p95
+latency and the number of failed requests ("database is locked" shows up
+as HTTP 500).
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app import create_app, db
+from app.models import Account, Transaction, User
+
+READS = ["/dashboard", "/transactions"]
+
+
+def make_app(path, profile):
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "DATABASE_PROFILE": profile,
+        "WTF_CSRF_ENABLED": False,
+    })
+
+
+def seed(app, users):
+    with app.app_context():
+        db.create_all()
+        for i in range(users):
+            user = User(email=f"bench{i}@example.com", username=f"bench{i}", name=f"Bench {i}")
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Account(user_id=user.id, account_number=f"BE{i:08d}", balance=1000))
+            for _ in range(50):
+                db.session.add(Transaction(user_id=user.id, type="Deposit", amount=10, status="Success"))
+        db.session.commit()
+
+
+def worker(path, profile, user_id, requests, writes, seed_value, results):
+    app = make_app(path, profile)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    rng = random.Random(seed_value)
+    latencies, failures = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        if rng.random() < writes:
+            response = client.post("/deposit", data={"amount": "1.00"})
+        else:
+            response = client.get(rng.choice(READS))
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            failures += 1
+    results.put((latencies, failures))
+
+
+def run(profile, args):
+    path = os.path.join(tempfile.mkdtemp(), f"bench_{profile}.db")
+    seed(make_app(path, profile), args.workers)
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker,
+                                args=(path, profile, i + 1, args.requests, args.writes, i, results))
+        for i in range(args.workers)
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    collected = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(l for batch, _ in collected for l in batch)
+    failures = sum(f for _, f in collected)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{profile:>10}: {len(latencies) / elapsed:7.0f} req/s  p95 {p95:6.1f} ms  "
+          f"{failures} failed of {len(latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--writes", type=float, default=0.2)
+    parser.add_argument("--profiles", nargs="+", default=["default", "production"])
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.requests} requests, {args.writes:.0%} writes")
+    for profile in args.profiles:
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
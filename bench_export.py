@@ -0,0 +1,120 @@
+"""Peak memory and throughput of the streaming statement export.
+
+Usage: python -m app.bench_export [--rows 1000000] [--batch-size 2000] [--compare]
+
+Seeds one customer with ``--rows`` transactions in a throwaway SQLite
+file, then downloads GET /transactions/export through the test client
+in a fresh process and reports rows/sec and that process's peak RSS.
+``--compare`` also runs the naive approach (load every Transaction,
+then build the CSV) in its own process for reference.
+"""
+import argparse
+import csv
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app, db, history
+from app.models import Account, Transaction, User
+
+
+def make_app(path, batch_size=None):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    if batch_size:
+        history.EXPORT_BATCH_SIZE = batch_size
+    return app
+
+
+def seed(path, rows):
+    app = make_app(path)
+    with app.app_context():
+        db.create_all()
+        user = User(email="export@example.com", username="export", name="Export")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Account(user_id=user.id, account_number="EX00000001", balance=0))
+        db.session.commit()
+        start = datetime(2020, 1, 1)
+        chunk = 50000
+        for offset in range(0, rows, chunk):
+            db.session.execute(insert(Transaction), [
+                {"user_id": user.id, "type": "Deposit", "amount": 10, "status": "Success",
+                 "description": "Deposit", "timestamp": start + timedelta(minutes=i)}
+                for i in range(offset, min(offset + chunk, rows))
+            ])
+            db.session.commit()
+        return user.id
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def stream(path, user_id, batch_size, results):
+    app = make_app(path, batch_size)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    response = client.get("/transactions/export", buffered=False)
+    lines = sum(chunk.count(b"\n") for chunk in response.response)
+    elapsed = time.perf_counter() - start
+    results.put(("streaming", lines - 1, elapsed, baseline, peak_rss_mb()))
+
+
+def materialize(path, user_id, batch_size, results):
+    app = make_app(path)
+    with app.app_context():
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        txns = Transaction.query.filter_by(user_id=user_id).order_by(Transaction.timestamp).all()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for t in txns:
+            writer.writerow([t.id, t.timestamp, t.type, t.description, t.beneficiary_name,
+                             t.recipient_account, t.amount, t.status])
+        body = buffer.getvalue()
+        elapsed = time.perf_counter() - start
+        results.put(("materialized", len(txns), elapsed, baseline, peak_rss_mb()))
+        del body
+
+
+def run(target, path, user_id, batch_size):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=target, args=(path, user_id, batch_size, results))
+    process.start()
+    label, rows, elapsed, baseline, peak = results.get()
+    process.join()
+    print(f"{label:>12}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), "
+          f"peak RSS {peak:.0f} MB (+{peak - baseline:.0f} MB over startup)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=history.EXPORT_BATCH_SIZE)
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "export_bench.db")
+    start = time.perf_counter()
+    user_id = seed(path, args.rows)
+    print(f"seeded {args.rows} transactions in {time.perf_counter() - start:.1f}s")
+
+    run(stream, path, user_id, args.batch_size)
+    if args.compare:
+        run(materialize, path, user_id, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
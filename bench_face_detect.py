@@ -0,0 +1,155 @@
+"""Face detection latency and match accuracy, with and without cropping.
+
+Usage: python -m app.bench_face_detect --images DIR [--threshold T] [--repeat 20]
+
+DIR is a labeled local image set, either one sub-directory per person
+(DIR/<name>/*.jpg) or face_capture.py's flat <name>_<n>.jpg layout. The
+first image of each person is enrolled and every other image is matched
+against all enrolled people, once encoding the whole frame and once
+encoding the detected, aligned face crop. Reported per mode:
+
+  top-1      best match is the right person
+  accepted   best match scores above --threshold and is the right person
+  false      best match scores above --threshold but is someone else
+  no face    images the detector rejected (counted as misses)
+  FAR / FRR  false accept rate (a probe scores above --threshold against
+             someone else's enrolment, as a 1:1 login would) and false
+             reject rate (a probe scores at or below it against its own)
+  EER        the threshold where FAR and FRR meet, and their rate there
+
+The two pipelines need their own FACE_MATCH_THRESHOLD: use the face
+crop's FAR/FRR and EER to pick the value for FACE_DETECTION on.
+Without --images only the detection latency on a blank frame is shown.
+"""
+import argparse
+import os
+import statistics
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from app import create_app
+from app.face_detect import face_detector
+from app.face_service import NoFaceFound
+
+EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_set(directory):
+    people = defaultdict(list)
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in EXTENSIONS:
+                continue
+            if root != directory:
+                label = os.path.relpath(root, directory)
+            else:
+                label = stem.rpartition("_")[0] or stem
+            people[label].append(os.path.join(root, name))
+    return {label: paths for label, paths in people.items() if len(paths) >= 2}
+
+
+def encode(path, detect):
+    face_detector.enabled = detect
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    vec = face_detector.encode(gray).astype(np.float32)
+    return vec / (np.linalg.norm(vec) or 1.0)
+
+
+def accuracy(people, detect, threshold):
+    enrolled, probes, no_face = {}, [], 0
+    for label, paths in people.items():
+        try:
+            enrolled[label] = encode(paths[0], detect)
+        except NoFaceFound:
+            no_face += len(paths)
+            continue
+        for path in paths[1:]:
+            try:
+                probes.append((label, encode(path, detect)))
+            except NoFaceFound:
+                no_face += 1
+    mode = "crop" if detect else "full frame"
+    if not enrolled:
+        print(f"  {mode:>10}: nothing enrolled ({no_face} images without a face)")
+        return
+    labels = list(enrolled)
+    matrix = np.stack([enrolled[label] for label in labels])
+    top1 = accepted = false = 0
+    genuine, impostor = [], []
+    for label, vec in probes:
+        scores = matrix @ vec
+        best = int(np.argmax(scores))
+        right = labels[best] == label
+        top1 += right
+        if scores[best] > threshold:
+            accepted += right
+            false += not right
+        own = labels.index(label) if label in enrolled else None
+        genuine.extend(scores[[own]] if own is not None else [])
+        impostor.extend(np.delete(scores, own) if own is not None else scores)
+    total = max(1, len(probes) + no_face)
+    print(f"  {mode:>10}: top-1 {top1 / total:6.1%}  accepted {accepted / total:6.1%}  "
+          f"false {false / total:6.1%}  no face {no_face}")
+    if genuine and impostor:
+        genuine, impostor = np.array(genuine), np.array(impostor)
+        far, frr = np.mean(impostor > threshold), np.mean(genuine <= threshold)
+        sweep = np.linspace(-1, 1, 2001)
+        rates = [(np.mean(impostor > t), np.mean(genuine <= t)) for t in sweep]
+        i = int(np.argmin([abs(a - r) for a, r in rates]))
+        print(f"  {'':>10}  FAR {far:6.2%}  FRR {frr:6.2%} at {threshold}  "
+              f"EER {max(rates[i]):6.2%} at {sweep[i]:.3f}")
+
+
+def latency(paths, repeat):
+    frames = [cv2.imread(p, cv2.IMREAD_GRAYSCALE) for p in paths] or [np.full((480, 640), 128, np.uint8)]
+    face_detector.enabled = True
+    for label, fn in (("detect", face_detector.detect), ("detect+encode", _encode_or_skip)):
+        samples = []
+        for _ in range(repeat):
+            for gray in frames:
+                start = time.perf_counter()
+                fn(gray)
+                samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        print(f"  {label:>13}: median {statistics.median(samples):6.2f} ms  "
+              f"p95 {samples[int(len(samples) * 0.95) - 1]:6.2f} ms  over {len(samples)} frames")
+
+
+def _encode_or_skip(gray):
+    try:
+        face_detector.encode(gray)
+    except NoFaceFound:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", help="Labeled image directory.")
+    parser.add_argument("--threshold", type=float, help="Default: the app's FACE_MATCH_THRESHOLD.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "FACE_PRELOAD": True})  # loads the cascades
+    if not app.config["FACE_DETECTION"]:
+        parser.exit(1, f"OpenCV {cv2.__version__} has no CascadeClassifier; nothing to compare.\n")
+    if args.threshold is None:
+        args.threshold = app.config["FACE_MATCH_THRESHOLD"]
+    people = load_set(args.images) if args.images else {}
+    paths = [p for group in people.values() for p in group]
+
+    print("Per-frame latency")
+    latency(paths[:50], args.repeat)
+    if not people:
+        print("No labeled images given (--images DIR); skipping accuracy.")
+        return
+    print(f"\nAccuracy on {len(people)} people, {len(paths)} images, threshold {args.threshold}")
+    for detect in (False, True):
+        accuracy(people, detect, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
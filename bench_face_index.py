@@ -0,0 +1,64 @@
+"""Recall and latency of the IVF face index against brute force.
+
+Usage: python -m app.bench_face_index [--users 20000] [--dim 10000]
+
+Encodings are synthetic: one random "identity" vector per person plus
+per-capture noise, which is roughly how repeated webcam frames of the
+same face look to get_face_encoding.
+"""
+import argparse
+import time
+import numpy as np
+
+from app.face_index import FlatBackend, IVFBackend, normalize
+
+
+def synthetic_encodings(users, dim, noise, rng):
+    base = rng.random((users, dim), dtype=np.float32)
+    stored = base + noise * rng.standard_normal((users, dim), dtype=np.float32)
+    probes = base + noise * rng.standard_normal((users, dim), dtype=np.float32)
+    stored /= np.linalg.norm(stored, axis=1, keepdims=True)
+    return stored, probes
+
+
+def time_queries(backend, queries, **kwargs):
+    hits, start = [], time.perf_counter()
+    for q in queries:
+        result = backend.search(q, 1, **kwargs)
+        hits.append(result[0][0] if result else -1)
+    per_query = (time.perf_counter() - start) / len(queries) * 1000
+    return np.array(hits), per_query
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--noise", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    stored, probes = synthetic_encodings(args.users, args.dim, args.noise, rng)
+    ids = np.arange(1, args.users + 1, dtype=np.int64)
+    picked = rng.choice(args.users, args.queries, replace=False)
+    queries = [normalize(probes[i]) for i in picked]
+
+    flat = FlatBackend.from_arrays({"ids": ids, "vectors": stored})
+    truth, flat_ms = time_queries(flat, queries)
+    print(f"flat      users={args.users} dim={args.dim}  {flat_ms:7.2f} ms/query  recall@1=1.000")
+
+    ivf = IVFBackend.from_arrays({"ids": ids, "vectors": stored}, nlist=args.nlist)
+    start = time.perf_counter()
+    ivf.train()
+    print(f"ivf train nlist={args.nlist}  {time.perf_counter() - start:.1f}s")
+
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        found, ms = time_queries(ivf, queries, nprobe=nprobe)
+        recall = float(np.mean(found == truth))
+        print(f"ivf       nprobe={nprobe:<3}         {ms:7.2f} ms/query  recall@1={recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
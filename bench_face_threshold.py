@@ -0,0 +1,98 @@
+"""False accept/reject rates of FACE_MATCH_THRESHOLD before and after PCA.
+
+Usage: python -m app.bench_face_threshold [--users 500] [--probes 3] [--noise 0.3]
+                                          [--dims 256] [--threshold 0.6] [--images DIR]
+
+A projection is fitted on one stored encoding per person, as
+`flask faces fit-pca` does, and every probe is compared with every
+stored encoding, raw and through the projection (quantised as the
+codec stores it). Reported per space:
+
+  FAR   a probe scores above the threshold against someone else
+  FRR   a probe scores at or below it against its own encoding
+  EER   the threshold where FAR and FRR meet, and their rate there
+
+"projected, calibrated" uses face_codec.threshold, the projected
+threshold with the raw one's false accept rate on the fitting sample.
+
+Encodings are synthetic (bench_face_index's identity plus per-capture
+noise) unless --images gives a labeled set in bench_face_detect's
+layout, encoded as full frames.
+"""
+import argparse
+import numpy as np
+
+from app.face_codec import FaceCodec, RAW_DIM
+from app.face_index import normalize
+from app.face_service import FACE_MATCH_THRESHOLD
+
+
+def synthetic_set(users, probes, noise, rng):
+    """bench_face_index's encodings, with several probe captures per person."""
+    base = rng.random((users, RAW_DIM), dtype=np.float32)
+    stored = base + noise * rng.standard_normal(base.shape, dtype=np.float32)
+    captures = [base + noise * rng.standard_normal(base.shape, dtype=np.float32) for _ in range(probes)]
+    return stored, np.concatenate(captures), np.tile(np.arange(users), probes)
+
+
+def image_set(directory):
+    from app.bench_face_detect import encode, load_set
+
+    people = load_set(directory)
+    stored, probes, labels = [], [], []
+    for n, paths in enumerate(people.values()):
+        stored.append(encode(paths[0], False))
+        for path in paths[1:]:
+            probes.append(encode(path, False))
+            labels.append(n)
+    return np.array(stored), np.array(probes), np.array(labels)
+
+
+def rates(scores, labels, threshold):
+    own = np.zeros(scores.shape, dtype=bool)
+    own[np.arange(len(labels)), labels] = True
+    genuine, impostor = scores[own], scores[~own]
+    far, frr = np.mean(impostor > threshold), np.mean(genuine <= threshold)
+    sweep = np.linspace(-1, 1, 2001)
+    curve = [(np.mean(impostor > t), np.mean(genuine <= t)) for t in sweep]
+    i = int(np.argmin([abs(a - r) for a, r in curve]))
+    return far, frr, max(curve[i]), sweep[i]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--probes", type=int, default=3, help="Probe captures per person.")
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--threshold", type=float, default=FACE_MATCH_THRESHOLD)
+    parser.add_argument("--images", help="Labeled image directory instead of synthetic encodings.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.images:
+        stored, probes, labels = image_set(args.images)
+    else:
+        stored, probes, labels = synthetic_set(args.users, args.probes, args.noise, np.random.default_rng(args.seed))
+    codec = FaceCodec()
+    codec.fit(stored, args.dims)
+    calibrated = codec.threshold(args.threshold)
+
+    raw_stored = np.array([normalize(v) for v in stored])
+    raw_probes = np.array([normalize(v) for v in probes])
+    projected_stored = np.array([normalize(codec.decode(codec.encode(v))) for v in stored])
+    projected_probes = np.array([normalize(codec.project(v)) for v in probes])
+
+    print(f"{len(stored)} people, {len(probes)} probes, {codec.dim} components")
+    print(f"{'space':>22}  {'threshold':>9}  {'FAR':>7}  {'FRR':>7}  {'EER':>7}  {'at':>6}")
+    for name, scores, threshold in (
+        ("raw", raw_probes @ raw_stored.T, args.threshold),
+        ("projected", projected_probes @ projected_stored.T, args.threshold),
+        ("projected, calibrated", projected_probes @ projected_stored.T, calibrated),
+    ):
+        far, frr, eer, at = rates(scores, labels, threshold)
+        print(f"{name:>22}  {threshold:9.3f}  {far:7.2%}  {frr:7.2%}  {eer:7.2%}  {at:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
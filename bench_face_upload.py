@@ -0,0 +1,106 @@
+"""Data URL vs binary face upload: bytes copied and latency.
+
+Usage: python -m app.bench_face_upload [--width 640] [--height 480] [--repeat 200]
+
+Encodes one synthetic camera frame as JPEG, then
+
+  * walks both decode pipelines step by step and adds up the size of
+    every intermediate buffer they allocate (the "bytes copied"), and
+  * times POST /face_login (base64 data URL form field) against
+    POST /face_login/raw (raw image/jpeg body) through the test client.
+"""
+import argparse
+import base64
+import io
+import statistics
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app import create_app, db
+from app.face_images import encode_face_bytes, encode_face_data_url
+
+
+def frame(width, height):
+    rng = np.random.default_rng(0)
+    blocks = rng.random((height // 40 + 1, width // 40 + 1, 3))
+    image = (np.kron(blocks, np.ones((40, 40, 1)))[:height, :width] * 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(image).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def data_url_copies(jpeg):
+    """Intermediate buffers of the form-field path, in bytes."""
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+    steps = [("form field (data URL)", len(data_url))]
+    raw = base64.b64decode(data_url.split(",", 1)[1])
+    steps.append(("base64 decode", len(raw)))
+    rgb = Image.open(io.BytesIO(raw)).convert("RGB")
+    steps.append(("PIL RGB decode", rgb.width * rgb.height * 3))
+    array = np.array(rgb)
+    steps.append(("np.array(PIL)", array.nbytes))
+    gray = cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+    steps.append(("RGB -> gray", gray.nbytes))
+    return steps
+
+
+def binary_copies(jpeg):
+    """Intermediate buffers of the raw-body path, in bytes."""
+    body = bytearray(jpeg)  # read once from the socket into one buffer
+    steps = [("request body buffer", len(body))]
+    gray = cv2.imdecode(np.frombuffer(memoryview(body), np.uint8), cv2.IMREAD_GRAYSCALE)
+    steps.append(("imdecode grayscale", gray.nbytes))
+    return steps
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "FACE_POOL_QUEUE": args.repeat,
+                      "FACE_PRELOAD": True})
+    jpeg = frame(args.width, args.height)
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+    print(f"{args.width}x{args.height} JPEG, {len(jpeg):,} bytes")
+
+    for label, steps in (("data URL", data_url_copies(jpeg)), ("binary", binary_copies(jpeg))):
+        print(f"\n{label}: {sum(size for _, size in steps):,} bytes in intermediate buffers")
+        for step, size in steps:
+            print(f"  {step:<24}{size:>12,}")
+
+    print("\ndecode + encode only")
+    for label, fn in (("data URL", lambda: encode_face_data_url(data_url)),
+                      ("binary", lambda: encode_face_bytes(memoryview(jpeg)))):
+        median, p95 = timed(fn, args.repeat)
+        print(f"  {label:>8}: median {median:6.2f} ms  p95 {p95:6.2f} ms")
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    print("\nfull request (no enrolled faces)")
+    for label, fn in (
+        ("data URL", lambda: client.post("/face_login", data={"face_image": data_url})),
+        ("binary", lambda: client.post("/face_login/raw", data=jpeg, content_type="image/jpeg")),
+    ):
+        median, p95 = timed(fn, args.repeat)
+        print(f"  {label:>8}: median {median:6.2f} ms  p95 {p95:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
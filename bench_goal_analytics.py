@@ -0,0 +1,141 @@
+"""Goal analytics for one customer with many goals and a long history.
+
+Usage: python -m app.bench_goal_analytics [--goals 50] [--months 36]
+                                          [--deposits 20] [--repeat 50]
+
+Seeds one customer with ``--goals`` goals (deadlines up to five years
+out) and ``--deposits`` Smart Saver movements per goal per month over the
+last ``--months`` months in an in-memory SQLite database, then times:
+
+  legacy   the old view_goals loop (month labels by ``while`` loop, flat
+           average chart), which produced no projections or history
+  cold     goal_analytics.for_user with an empty cache: the grouped
+           history aggregate plus the NumPy computation
+  history  the grouped history aggregate alone
+  compute  the NumPy computation alone, history already fetched
+  cached   goal_analytics.for_user on a warm cache
+  route    GET /view_goals, warm cache
+"""
+import argparse
+import random
+import statistics
+import time
+from calendar import month_abbr
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app, db, goal_analytics
+from app.models import FinancialGoal, SavingMode, Transaction, User
+
+MODES = [SavingMode.DAILY, SavingMode.WEEKLY, SavingMode.MONTHLY, SavingMode.YEARLY]
+AMOUNT_COLUMN = {SavingMode.DAILY: "daily_amount", SavingMode.WEEKLY: "weekly_amount",
+                 SavingMode.MONTHLY: "monthly_amount", SavingMode.YEARLY: "yearly_amount"}
+
+
+def seed(goals, months, deposits, today, rng):
+    user = User(email="goals@example.com", username="goals", name="Goals")
+    db.session.add(user)
+    db.session.flush()
+    now = datetime.combine(today, datetime.min.time())
+    rows = []
+    for i in range(goals):
+        mode = MODES[i % len(MODES)]
+        rows.append({
+            "user_id": user.id, "name": f"goal {i}", "target_amount": rng.randint(100, 2_000) * 10_000,
+            "saving_mode": mode, AMOUNT_COLUMN[mode]: rng.randint(1, 50) * 100, "smart_saver_balance": 0,
+            "deadline": today + timedelta(days=rng.randint(30, 5 * 365)),
+            "created_at": now - timedelta(days=months * 30),
+        })
+    db.session.execute(insert(FinancialGoal), rows)
+    transactions, saved = [], [0] * goals
+    for i in range(goals):
+        for _ in range(months * deposits):
+            amount = rng.randint(1, 100) * 100
+            withdrawal = rng.random() < 0.05 and saved[i] >= amount
+            saved[i] += -amount if withdrawal else amount
+            transactions.append({
+                "user_id": user.id, "amount": amount, "status": "Success",
+                "timestamp": now - timedelta(minutes=rng.randint(1, months * 30 * 24 * 60)),
+                "type": "Smart Saver Withdrawal" if withdrawal else "Smart Saver Deposit",
+                "description": (f"Withdrawn from goal 'goal {i}'" if withdrawal
+                                else rng.choice(["Deposited to goal 'goal {}'", "Auto-saved to goal 'goal {}'"]).format(i)),
+            })
+    db.session.execute(insert(Transaction), transactions)
+    for i, goal in enumerate(FinancialGoal.query.order_by(FinancialGoal.id)):
+        goal.smart_saver_balance = saved[i]
+    db.session.commit()
+    return user.id, len(transactions)
+
+
+def legacy(goals, today):
+    """The loop view_goals used to run."""
+    for goal in goals:
+        labels = []
+        current = today
+        while current <= goal.deadline:
+            labels.append(month_abbr[current.month])
+            current = current.replace(year=current.year + (current.month // 12), month=(current.month % 12) + 1)
+        monthly_value = goal.smart_saver_balance / max(1, len(labels))
+        goal.chart_labels = labels
+        goal.chart_data = [float(monthly_value)] * len(labels)
+
+
+def timed(repeat, fn):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goals", type=int, default=50)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--deposits", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "WTF_CSRF_ENABLED": False, "QUERY_COUNTER": False})
+    today = datetime.utcnow().date()
+    with app.app_context():
+        db.create_all()
+        user_id, transactions = seed(args.goals, args.months, args.deposits, today, random.Random(args.seed))
+        goals = FinancialGoal.query.filter_by(user_id=user_id).all()
+        print(f"{len(goals)} goals, {transactions} Smart Saver transactions over {args.months} months")
+
+        results = {"legacy": timed(args.repeat, lambda: legacy(goals, today))}
+
+        def cold():
+            goal_analytics.invalidate(user_id)
+            return goal_analytics.for_user(user_id, goals, today)
+
+        results["cold"] = timed(args.repeat, cold)
+        history = goal_analytics.monthly_history(user_id)
+        results["history"] = timed(args.repeat, lambda: goal_analytics.monthly_history(user_id))
+        results["compute"] = timed(args.repeat, lambda: goal_analytics.compute(goals, history, today))
+        results["cached"] = timed(args.repeat, lambda: goal_analytics.for_user(user_id, goals, today))
+
+        stats = goal_analytics.for_user(user_id, goals, today)
+        on_track = sum(s.on_track for s in stats.values())
+        points = sum(len(s.chart_data) for s in stats.values())
+        print(f"{on_track}/{len(goals)} goals on track, {points} chart points")
+        # the series ends at each goal's balance at today
+        assert all(abs(s.chart_data[s.actual_months - 1] - float(g.smart_saver_balance)) < 0.01
+                   for g, s in ((g, stats[g.id]) for g in goals))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    client.get("/view_goals")
+    results["route"] = timed(args.repeat, lambda: client.get("/view_goals").get_data())
+
+    for name, ms in results.items():
+        print(f"{name:>8}: {ms:8.2f} ms (median of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
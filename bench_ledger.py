@@ -0,0 +1,123 @@
+"""Concurrent stress test for the ledger service.
+
+Usage: python -m app.bench_ledger [--threads 16] [--ops 500] [--accounts 20]
+
+Runs random deposits, withdrawals and transfers from many threads against
+a throwaway SQLite file, then checks that no update was lost: every
+account balance must equal its opening balance plus the sum of its
+transaction legs, and money in the system must equal opening money plus
+deposits minus withdrawals. Exits non-zero on any mismatch.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from app import create_app, db
+from app.models import Account, Transaction, User
+from app.money import Money
+from app import ledger
+
+OPENING_BALANCE = Money.from_rupees(1000)
+
+
+def seed(count):
+    for i in range(count):
+        user = User(email=f"stress{i}@example.com", username=f"stress{i}", name=f"Stress {i}")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Account(user_id=user.id, account_number=f"ST{i:08d}", balance=OPENING_BALANCE))
+    db.session.commit()
+
+
+def worker(app, ops, numbers, seed_value, errors):
+    rng = random.Random(seed_value)
+    with app.app_context():
+        accounts = {a.account_number: a for a in Account.query.all()}
+        for _ in range(ops):
+            account = accounts[rng.choice(numbers)]
+            amount = Money(rng.randint(1, 20000))
+            action = rng.random()
+            try:
+                if action < 0.2:
+                    ledger.deposit(account, amount)
+                elif action < 0.4:
+                    ledger.withdraw(account, amount)
+                else:
+                    target = rng.choice([n for n in numbers if n != account.account_number])
+                    ledger.transfer(account, target, amount)
+            except ledger.InsufficientFunds:
+                pass
+            except Exception as error:
+                errors.append(error)
+
+
+def verify():
+    legs = defaultdict(Money)
+    net_external = Money(0)
+    for txn in Transaction.query.all():
+        sign = -1 if txn.type in ("Withdraw", "Transfer") else 1
+        legs[txn.user_id] += sign * txn.amount
+        if txn.type == "Deposit":
+            net_external += txn.amount
+        elif txn.type == "Withdraw":
+            net_external -= txn.amount
+
+    problems = []
+    accounts = Account.query.all()
+    for account in accounts:
+        expected = OPENING_BALANCE + legs[account.user_id]
+        if account.balance != expected:
+            problems.append(f"{account.account_number}: balance {account.balance} != {expected}")
+        if account.balance < 0:
+            problems.append(f"{account.account_number}: negative balance {account.balance}")
+    total = sum(a.balance for a in accounts)
+    if total != OPENING_BALANCE * len(accounts) + net_external:
+        problems.append(f"money not conserved: {total}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--accounts", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "ledger_stress.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    with app.app_context():
+        db.create_all()
+        seed(args.accounts)
+        numbers = [a.account_number for a in Account.query.all()]
+
+    errors = []
+    threads = [threading.Thread(target=worker, args=(app, args.ops, numbers, i, errors))
+               for i in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        problems = verify()
+        txns = Transaction.query.count()
+    total_ops = args.threads * args.ops
+    print(f"{total_ops} operations, {txns} ledger rows in {elapsed:.1f}s ({total_ops / elapsed:.0f} ops/s)")
+    for error in errors[:10]:
+        print("error:", repr(error))
+    for problem in problems:
+        print("LOST UPDATE:", problem)
+    if errors or problems:
+        sys.exit(1)
+    print("OK: no lost updates")
+
+
+if __name__ == "__main__":
+    main()
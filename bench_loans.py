@@ -0,0 +1,126 @@
+"""Staff loan queue over a large backlog: listing and deciding.
+
+Usage: python -m app.bench_loans [--loans 50000] [--users 2000] [--decide 2000]
+
+Seeds ``--loans`` pending loans spread over ``--users`` customers in a
+throwaway SQLite file, then measures (wall time and SQL statements):
+
+  list legacy   what approve_loans used to do: every pending loan with
+                ``.all()``, then ``loan.user`` lazily loaded per row
+  list page     loan_queue.loan_page: first page, and a page deep in the queue
+  decide legacy ``--decide`` loans through the old one-loan-per-POST path
+                (load, summary.adjust, commit)
+  decide bulk   the next ``--decide`` loans through loan_queue.decide
+
+Finally checks that every customer's pending_loans summary still equals
+their pending loan count.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import event, func, insert, select
+
+from app import create_app, db, loan_queue, summary
+from app.models import DashboardSummary, Loan, User
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def seed(loans, users):
+    db.session.execute(insert(User), [
+        {"email": f"loan{i}@example.com", "username": f"loan{i}", "name": f"Applicant {i}"}
+        for i in range(users)
+    ])
+    user_ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+    db.session.execute(insert(Loan), [
+        {"amount": 10000 + i, "reason": "bench", "status": "Pending", "emi_due": 500,
+         "user_id": user_ids[i % len(user_ids)]}
+        for i in range(loans)
+    ])
+    for user_id in user_ids:
+        summary.rebuild(user_id)
+    db.session.commit()
+
+
+def measure(label, counter, fn):
+    db.session.expunge_all()  # every request starts with an empty session
+    before = counter.count
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{label:>16}: {elapsed:9.1f} ms  {counter.count - before:6d} queries")
+    return result
+
+
+def legacy_list():
+    loans = Loan.query.filter_by(status="Pending").all()
+    return [(loan.user.name, loan.user.email) for loan in loans]
+
+
+def page_list(after=None):
+    page = loan_queue.loan_page("Pending", after=after)
+    return [(loan.user.name, loan.user.email) for loan in page.items]
+
+
+def legacy_decide(loan_ids):
+    for loan_id in loan_ids:
+        loan = db.session.get(Loan, loan_id)
+        if loan.status == "Pending":
+            summary.adjust(loan.user_id, pending_loans=-1)
+        loan.status = "Approved"
+        db.session.commit()
+    return len(loan_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loans", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--decide", type=int, default=2000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "loans_bench.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    with app.app_context():
+        db.create_all()
+        seed(args.loans, args.users)
+        counter = QueryCounter(db.engine)
+        pending = db.session.execute(
+            select(Loan.id).where(Loan.status == "Pending").order_by(Loan.id)
+        ).scalars().all()
+        print(f"{args.loans} pending loans over {args.users} customers")
+
+        rows = measure("list legacy", counter, legacy_list)
+        first = measure("list page", counter, page_list)
+        deep = measure("list deep page", counter, lambda: page_list(after=pending[len(pending) // 2]))
+        print(f"{'':>16}  legacy renders {len(rows)} rows; a page renders {len(first)} ({len(deep)} deep)")
+
+        legacy_ids = pending[:args.decide]
+        bulk_ids = pending[args.decide:2 * args.decide]
+        measure("decide legacy", counter, lambda: legacy_decide(legacy_ids))
+        decided = measure("decide bulk", counter, lambda: loan_queue.decide(bulk_ids, "Approved"))
+        assert decided == len(bulk_ids)
+        assert loan_queue.decide(bulk_ids, "Rejected") == 0  # already decided: skipped
+
+        pending_counts = dict(db.session.execute(
+            select(Loan.user_id, func.count()).where(Loan.status == "Pending").group_by(Loan.user_id)
+        ).all())
+        drift = [
+            user_id for user_id, pending_loans in
+            db.session.execute(select(DashboardSummary.user_id, DashboardSummary.pending_loans)).all()
+            if pending_loans != pending_counts.get(user_id, 0)
+        ]
+        print(f"summary drift: {len(drift)} customer(s)")
+
+
+if __name__ == "__main__":
+    main()
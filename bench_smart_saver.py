@@ -0,0 +1,180 @@
+"""Nightly Smart Saver run over a large number of due goals.
+
+Usage: python -m app.bench_smart_saver [--goals 1000000] [--per-user 4]
+                                       [--batch-size 1000] [--legacy 2000]
+
+Seeds ``--goals`` due goals (daily/weekly/monthly/yearly, ``--per-user``
+per customer; about 5% of customers cannot cover their goals) in a
+throwaway SQLite file, then:
+
+  legacy   debits ``--legacy`` goals one at a time through the ORM and
+           ledger.deposit_to_goal (one commit each), for comparison
+  crash    starts smart_saver.run and kills it halfway (at most 5 batches in)
+  resume   runs again: the unfinished run resumes with its own as_of
+  repeat   runs again with the same as_of: nothing is due, nothing moves
+
+and checks that money moved out of accounts equals money moved into
+goals, the successful transactions and the dashboard summaries.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app import create_app, db, ledger, smart_saver
+from app.models import (Account, DashboardSummary, FinancialGoal, JobCheckpoint, SavingMode,
+                        Transaction, User)
+
+CHUNK = 20000
+MODES = [SavingMode.DAILY, SavingMode.WEEKLY, SavingMode.MONTHLY, SavingMode.YEARLY]
+AMOUNT_COLUMN = {SavingMode.DAILY: "daily_amount", SavingMode.WEEKLY: "weekly_amount",
+                 SavingMode.MONTHLY: "monthly_amount", SavingMode.YEARLY: "yearly_amount"}
+
+
+def seed(goals, per_user, as_of, rng):
+    users = (goals + per_user - 1) // per_user
+    for start in range(0, users, CHUNK):
+        db.session.execute(insert(User), [
+            {"email": f"saver{i}@example.com", "username": f"saver{i}", "name": f"Saver {i}"}
+            for i in range(start, min(users, start + CHUNK))
+        ])
+    user_ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+    for start in range(0, len(user_ids), CHUNK):
+        db.session.execute(insert(Account), [
+            # balances in paise; about 5% cannot cover their goals
+            {"user_id": user_id, "account_number": f"SV{user_id:08d}",
+             "balance": 10 if rng.random() < 0.05 else 10_000_000}
+            for user_id in user_ids[start:start + CHUNK]
+        ])
+        db.session.execute(insert(DashboardSummary), [
+            {"user_id": user_id, "account_number": f"SV{user_id:08d}", "balance": 0,
+             "goal_savings": 0, "pending_loans": 0, "unread_reports": 0}
+            for user_id in user_ids[start:start + CHUNK]
+        ])
+    db.session.execute(Account.__table__.update().values(balance=Account.__table__.c.balance))
+    # summaries start equal to the balances
+    db.session.execute(
+        DashboardSummary.__table__.update().values(
+            balance=select(Account.__table__.c.balance)
+            .where(Account.__table__.c.user_id == DashboardSummary.__table__.c.user_id)
+            .scalar_subquery()
+        )
+    )
+    for start in range(0, goals, CHUNK):
+        rows = []
+        for i in range(start, min(goals, start + CHUNK)):
+            mode = MODES[i % len(MODES)]
+            rows.append({
+                "user_id": user_ids[i // per_user], "name": f"goal {i}", "target_amount": 1_000_000,
+                "saving_mode": mode, AMOUNT_COLUMN[mode]: rng.randint(1, 50) * 100,
+                "smart_saver_balance": 0, "created_at": as_of - timedelta(days=30),
+                "next_run_at": as_of - timedelta(minutes=rng.randint(0, 24 * 60)),
+            })
+        db.session.execute(insert(FinancialGoal), rows)
+    db.session.commit()
+    return len(user_ids)
+
+
+def legacy(count, as_of):
+    """The per-goal ORM loop the scheduler replaces."""
+    goals = db.session.execute(
+        select(FinancialGoal).where(FinancialGoal.next_run_at <= as_of)
+        .order_by(FinancialGoal.next_run_at, FinancialGoal.id).limit(count)
+    ).scalars().all()
+    for goal in goals:
+        account = db.session.execute(select(Account).where(Account.user_id == goal.user_id)).scalar_one()
+        try:
+            ledger.deposit_to_goal(account, goal, smart_saver.period_amount(goal))
+        except ledger.InsufficientFunds:
+            pass
+        goal.next_run_at = smart_saver.next_run(goal.saving_mode, as_of)
+        db.session.commit()
+    return len(goals)
+
+
+class Crash(Exception):
+    pass
+
+
+def totals():
+    accounts = db.session.execute(select(func.sum(Account.balance))).scalar()
+    goals = db.session.execute(select(func.sum(FinancialGoal.smart_saver_balance))).scalar()
+    deposits = db.session.execute(
+        select(func.sum(Transaction.amount))
+        .where(Transaction.type == "Smart Saver Deposit", Transaction.status == "Success")
+    ).scalar()
+    summaries = db.session.execute(
+        select(func.sum(DashboardSummary.balance), func.sum(DashboardSummary.goal_savings))
+    ).one()
+    return accounts, goals, deposits, summaries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goals", type=int, default=1_000_000)
+    parser.add_argument("--per-user", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=smart_saver.BATCH_SIZE)
+    parser.add_argument("--legacy", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "smart_saver_bench.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "DATABASE_PROFILE": "production"})
+    as_of = datetime(2026, 10, 18)
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        users = seed(args.goals, args.per_user, as_of, random.Random(args.seed))
+        print(f"seeded {args.goals} due goals for {users} customers in {time.perf_counter() - start:.0f} s")
+        opening = db.session.execute(select(func.sum(Account.balance))).scalar()
+
+        start = time.perf_counter()
+        done = legacy(args.legacy, as_of)
+        elapsed = time.perf_counter() - start
+        print(f"{'legacy':>7}: {done} goals in {elapsed:.1f} s ({done / elapsed:,.0f} goals/s)")
+
+        def crash_after(batches):
+            def on_batch(checkpoint):
+                if checkpoint.batches >= batches:
+                    raise Crash()
+            return on_batch
+
+        # crash halfway (at most 5 batches in), so the resume has work left
+        batches = -(-(args.goals - done) // args.batch_size)
+        try:
+            smart_saver.run(as_of=as_of, batch_size=args.batch_size, on_batch=crash_after(max(1, min(5, batches // 2))))
+        except Crash:
+            pass
+        checkpoint = db.session.get(JobCheckpoint, smart_saver.JOB)
+        crashed_at = checkpoint.processed
+        print(f"{'crash':>7}: stopped after {checkpoint.batches} batches, {crashed_at} goals, "
+              f"finished_at={checkpoint.finished_at}")
+        assert checkpoint.finished_at is None and crashed_at < args.goals - done, "crash run left nothing to resume: use --goals above 2x --batch-size"
+
+        start = time.perf_counter()
+        checkpoint = smart_saver.run(as_of=as_of + timedelta(hours=5), batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{'resume':>7}: as_of {checkpoint.as_of}, {checkpoint.processed} goals in {checkpoint.batches} "
+              f"batches, {elapsed:.1f} s for this invocation "
+              f"({(checkpoint.processed - crashed_at) / elapsed:,.0f} goals/s); "
+              f"{checkpoint.debited} debited, {checkpoint.skipped} skipped, ₹{checkpoint.amount}")
+
+        checkpoint = smart_saver.run(as_of=as_of, batch_size=args.batch_size)
+        print(f"{'repeat':>7}: {checkpoint.processed} goals, ₹{checkpoint.amount}")
+
+        accounts, goals, deposits, (summary_balance, summary_goals) = totals()
+        print(f"accounts -₹{opening - accounts}, goals +₹{goals}, successful deposits ₹{deposits}")
+        print(f"summaries match: {summary_balance == accounts and summary_goals == goals}")
+        assert opening - accounts == goals == deposits
+        still_due = db.session.execute(
+            select(func.count()).where(FinancialGoal.next_run_at <= as_of)
+        ).scalar()
+        print(f"goals still due at as_of: {still_due}")
+
+
+if __name__ == "__main__":
+    main()
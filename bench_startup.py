@@ -0,0 +1,92 @@
+"""Worker cold start: import time, RSS and which heavy modules load.
+
+Usage: python -m app.bench_startup [--repeat 5] [--top 12]
+                                   [--max-ms N] [--max-rss-mb N] [--forbid numpy,cv2,PIL,googletrans]
+
+Each sample is a fresh ``python -X importtime`` process that imports the
+package and calls create_app(), like a gunicorn worker booting. Reported:
+median wall time of import + create_app, median peak RSS, the slowest
+top-level imports (cumulative, from -X importtime) and whether the
+scientific stack got imported. With any of --max-ms, --max-rss-mb or
+--forbid the script exits 1 when the limit is exceeded, so it can gate
+a deploy.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+HEAVY = ("numpy", "cv2", "PIL", "googletrans", "httpx")
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+from {package} import create_app
+app = create_app({{"SQLALCHEMY_DATABASE_URI": "sqlite://"}})
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+loaded = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"ms": elapsed * 1000, "rss": rss, "loaded": loaded}}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def sample(package, root):
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(package=package, heavy=HEAVY)],
+        capture_output=True, text=True, env=env, cwd=root, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    top_level = {}
+    for match in IMPORT_LINE.finditer(proc.stderr):
+        if not match.group(3).strip(" ") and len(match.group(3)) <= 1:
+            top_level[match.group(4)] = int(match.group(2)) / 1000
+    result["imports"] = top_level
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--max-ms", type=float)
+    parser.add_argument("--max-rss-mb", type=float)
+    parser.add_argument("--forbid", default="", help="Comma-separated modules that must not load at startup.")
+    args = parser.parse_args()
+
+    package = __package__ or "app"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = [sample(package, root) for _ in range(args.repeat)]
+
+    ms = statistics.median(s["ms"] for s in samples)
+    rss = statistics.median(s["rss"] for s in samples)
+    loaded = samples[-1]["loaded"]
+    print(f"import + create_app: median {ms:.0f} ms, peak RSS {rss:.0f} MB over {args.repeat} cold starts")
+    print(f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+    imports = samples[-1]["imports"]
+    print("\nslowest top-level imports (cumulative ms, last run)")
+    for name, cumulative in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative:8.1f}  {name}")
+
+    failures = []
+    if args.max_ms is not None and ms > args.max_ms:
+        failures.append(f"startup {ms:.0f} ms > {args.max_ms:.0f} ms")
+    if args.max_rss_mb is not None and rss > args.max_rss_mb:
+        failures.append(f"RSS {rss:.0f} MB > {args.max_rss_mb:.0f} MB")
+    forbidden = [name for name in args.forbid.split(",") if name and name in loaded]
+    if forbidden:
+        failures.append(f"imported at startup: {', '.join(forbidden)}")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
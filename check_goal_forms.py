@@ -0,0 +1,118 @@
+"""Fail if the goal forms do not store and schedule what was submitted.
+
+Seeds a throwaway in-memory database, submits /set_goal for each
+Smart Saver mode with the amount per period left blank (spread evenly
+until the deadline), 0 (paused) and filled in, then edits one goal
+through the same three, checking the response, the goal's Money
+columns, its period amount and schedule, and the dashboard summary's
+goal savings. Run with ``python -m app.check_goal_forms``.
+"""
+import sys
+from datetime import date, datetime, timedelta
+
+from app import create_app, db, smart_saver, summary
+from app.models import Account, FinancialGoal, User
+from app.money import Money
+
+TARGET = "1200"
+SAVED = "200.50"
+
+# (mode, periodAmount as typed) -> expected period amount, None: spread evenly
+CASES = {
+    ("DAILY", ""): None,
+    ("MONTHLY", ""): None,
+    ("WEEKLY", ""): None,
+    ("DAILY", "0"): Money(0),
+    ("DAILY", "25"): Money.from_rupees(25),
+    ("MONTHLY", "150.75"): Money.from_rupees("150.75"),
+    ("NONE", ""): Money(0),
+}
+# periodAmount typed on /goal/edit, in turn, for the "DAILY 25" goal
+EDITS = {"0": Money(0), "": None, "40": Money.from_rupees(40)}
+
+
+def seed():
+    user = User(email="goals@bank.com", username="goals", name="Goals")
+    user.set_password("x")
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Account(user_id=user.id, account_number="AC1", balance=5000))
+    summary.rebuild(user.id)
+    db.session.commit()
+    return user.id
+
+
+def main():
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "WTF_CSRF_ENABLED": False,
+        "IDENTITY_CACHE_SIZE": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        user_id = seed()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    deadline = date.today() + timedelta(days=400)
+
+    def verify(label, response, name, expected):
+        problems, amount = [], None
+        if response.status_code != 302:
+            problems.append(f"HTTP {response.status_code}")
+        with app.app_context():
+            goal = FinancialGoal.query.filter_by(user_id=user_id, name=name).first()
+            if goal is None:
+                problems.append("goal not stored")
+            else:
+                amount = smart_saver.period_amount(goal)
+                if expected is None:
+                    remaining = Money.from_rupees(TARGET) - Money.from_rupees(SAVED)
+                    periods = smart_saver.periods_until(goal.saving_mode, datetime.utcnow(), deadline)
+                    expected = Money(-(-remaining.paise // periods))
+                if (goal.target_amount, goal.smart_saver_balance) != (Money.from_rupees(TARGET), Money.from_rupees(SAVED)):
+                    problems.append(f"stored {goal.target_amount!r} / {goal.smart_saver_balance!r}")
+                if amount != expected:
+                    problems.append(f"period amount {amount!r}, expected {expected!r}")
+                if (goal.next_run_at is not None) != (expected > 0):
+                    problems.append(f"next_run_at {goal.next_run_at}")
+        print(f"{'FAIL' if problems else 'ok':>4}  {label}: {amount!r}")
+        for problem in problems:
+            print(f"      {problem}")
+        return bool(problems)
+
+    failures = 0
+    names = {}
+    for n, ((mode, typed), expected) in enumerate(CASES.items()):
+        names[mode, typed] = name = f"goal {n}"
+        response = client.post("/set_goal", data={
+            "goalName": name, "goalAmount": TARGET, "currentSavings": SAVED,
+            "deadline": deadline.isoformat(), "savingsMode": mode, "periodAmount": typed,
+        })
+        failures += verify(f"/set_goal {mode}, amount per period {typed or 'blank'}", response, name, expected)
+
+    name = names["DAILY", "25"]
+    with app.app_context():
+        goal_id = FinancialGoal.query.filter_by(user_id=user_id, name=name).one().id
+    for typed, expected in EDITS.items():
+        response = client.post(f"/goal/edit/{goal_id}", data={
+            "goalName": name, "goalAmount": TARGET, "deadline": deadline.isoformat(), "periodAmount": typed,
+        })
+        failures += verify(f"/goal/edit DAILY, amount per period {typed or 'blank'}", response, name, expected)
+
+    with app.app_context():
+        saved = summary.get(user_id).goal_savings
+        if saved != Money.from_rupees(SAVED) * len(CASES):
+            failures += 1
+            print(f"FAIL  summary goal savings {saved!r}")
+
+    print(f"{failures} goal form problem(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Fail if a page loads deferred User columns it does not render.
+
+face_encoding (group 'biometric', up to 80 KB a row) and mobile_number,
+place and profile_image (group 'profile') are deferred on User, so the
+session user and the staff customer and loan lists fetch only the
+columns they show. This seeds a throwaway in-memory database with
+full-size encodings, requests each page, and checks the column list of
+every SELECT (joined user rows included) against the deferred columns
+or groups the page may load.
+Run with ``python -m app.check_loaded_columns``.
+"""
+import re
+import sys
+
+from sqlalchemy import event
+
+from app import create_app, db, summary
+from app.models import Account, Loan, User
+
+ENCODING_BYTES = 80 * 1024
+
+# page -> deferred User groups or columns it may load
+CUSTOMER_PAGES = {
+    "/dashboard": set(),
+    "/customer/dashboard": set(),
+    "/profile": {"profile"},
+}
+STAFF_PAGES = {
+    "/staff/dashboard": set(),
+    # User.LIST_COLUMNS: the lists show the mobile number, nothing else deferred
+    "/staff/customer_list": {"mobile_number"},
+    "/staff/customers": {"mobile_number"},
+    "/staff/approve_loans": set(),
+    "/staff/approved_loans": set(),
+    "/staff/rejected_loans": set(),
+}
+
+
+def deferred_columns():
+    """{column name: group} of User's deferred columns."""
+    return {column.name: attr.group or attr.key
+            for attr in db.inspect(User).column_attrs if attr.deferred
+            for column in attr.columns}
+
+
+def seed():
+    staff = User(email="staff@bank.com", username="staff", name="Staff", is_staff=True,
+                 face_encoding=bytes(ENCODING_BYTES))
+    staff.set_password("x")
+    db.session.add(staff)
+    for n in range(2, 12):
+        user = User(email=f"user{n}@bank.com", username=f"user{n}", name=f"User {n}",
+                    mobile_number="9999999999", place="Chennai", profile_image="p.png",
+                    face_encoding=bytes(ENCODING_BYTES))
+        user.set_password("x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Account(user_id=user.id, account_number=f"AC{n}", balance=1000))
+        for status in ("Pending", "Approved", "Rejected"):
+            db.session.add(Loan(user_id=user.id, amount=500, reason="test", status=status))
+    db.session.flush()
+    for user in User.query.all():
+        summary.rebuild(user.id)
+    db.session.commit()
+
+
+# the select list of a statement, up to its first FROM
+SELECT_LIST = re.compile(r"^SELECT\s(.*?)\sFROM\s", re.S)
+
+
+def user_column(name):
+    """``name`` on the user table or an alias of it (user_1, ...), quoted or not."""
+    return re.compile(rf'"?\buser(?:_\d+)?"?\.{name}\b')
+
+
+def main():
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "WTF_CSRF_ENABLED": False,
+        "IDENTITY_CACHE_SIZE": 0,
+        "PAGE_CACHE": False,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        seed()
+        deferred = deferred_columns()
+        engine = db.engine
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    failures = 0
+    for user_id, pages in ((2, CUSTOMER_PAGES), (1, STAFF_PAGES)):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+        for page, allowed in pages.items():
+            statements.clear()
+            response = client.get(page)
+            response.get_data()
+            loaded = set()
+            for statement in statements:
+                match = SELECT_LIST.match(statement.strip())
+                if match is None:
+                    continue
+                columns = match.group(1)
+                loaded.update(name for name in deferred if user_column(name).search(columns))
+            problems = sorted(name for name in loaded if name not in allowed and deferred[name] not in allowed)
+            if response.status_code != 200:
+                problems.append(f"HTTP {response.status_code}")
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok':>4}  {page}: loads {', '.join(sorted(loaded)) or 'no deferred columns'}")
+            for problem in problems:
+                print(f"      unexpected: {problem}")
+
+    print(f"{failures} page(s) loading deferred columns")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
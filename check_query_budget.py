@@ -0,0 +1,141 @@
+"""Fail if a page's query count grows with its rows or exceeds its budget.
+
+Seeds two throwaway in-memory databases, one with a single row of
+everything per customer and one with ``--rows`` (loans, goals,
+transactions, contacts, spam reports and extra customers), and requests
+each customer and staff page in both. A page passes when it issues the
+same number of statements at both sizes, no more than its budget, and QueryCounter flags no repeated statement. Run with
+``python -m app.check_query_budget [--rows 25]``.
+"""
+import argparse
+import sys
+from datetime import date, datetime
+
+from app import create_app, db, summary
+from app.models import (Account, FinancialGoal, Loan, SavedContact, SpamReport,
+                        Transaction, User)
+
+# page -> most statements one request may issue (session user, summary,
+# page data, counts); unchanged by the number of rows shown
+CUSTOMER_BUDGETS = {
+    "/dashboard": 2,
+    "/customer/dashboard": 2,
+    "/transactions": 2,
+    "/transactions?transaction_type=deposit&start_date=2026-01-01&end_date=2026-12-31": 2,
+    "/transactions?name=test": 2,
+    "/transactions/export": 1,
+    "/my_loans": 2,
+    # + goal_analytics' grouped history aggregate until it is cached
+    "/view_goals": 3,
+    "/goal/1": 3,
+    "/financial_goals": 2,
+    "/customer/contacts": 2,
+    "/customer/transfer": 2,
+    "/profile": 2,
+}
+STAFF_BUDGETS = {
+    "/staff/dashboard": 1,
+    "/staff/approve_loans": 3,
+    "/staff/approved_loans": 2,
+    "/staff/rejected_loans": 2,
+    "/staff/view_reports": 2,
+    "/staff/customer_list": 2,
+    "/staff/customers": 2,
+    "/staff/customer/2/transactions": 3,
+    "/staff/customer/2/transactions/export?type=credit": 2,
+}
+
+
+def seed(rows):
+    staff = User(email="staff@bank.com", username="staff", name="Staff", is_staff=True)
+    staff.set_password("x")
+    db.session.add(staff)
+    users = []
+    for n in range(2, 4 + rows):
+        user = User(email=f"user{n}@bank.com", username=f"user{n}", name=f"User {n}")
+        user.set_password("x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Account(user_id=user.id, account_number=f"AC{n}", balance=1000))
+        users.append(user)
+    for user in users[:2]:
+        for i in range(rows):
+            db.session.add(Loan(user_id=user.id, amount=500 + i, reason="test",
+                                status=("Pending", "Approved", "Rejected")[i % 3]))
+            db.session.add(FinancialGoal(user_id=user.id, name=f"goal {i}", target_amount=500,
+                                         deadline=date(2030, 1, 1)))
+            db.session.add(SavedContact(user_id=user.id, name=f"contact {i}",
+                                        account_number=users[(i + 1) % len(users)].account.account_number))
+            db.session.add(Transaction(user_id=user.id, type="Deposit", amount=10,
+                                       description=f"test deposit {i}",
+                                       timestamp=datetime(2026, 1, 1 + i % 28)))
+    db.session.flush()
+    for i in range(rows):
+        reporter, reported = users[i % len(users)], users[(i + 1) % len(users)]
+        db.session.add(SpamReport(user_id=reporter.id, transaction_id=i + 1,
+                                  reported_user_id=reported.id, reason="test"))
+    for user_id in [staff.id] + [user.id for user in users]:
+        summary.rebuild(user_id)
+    db.session.commit()
+
+
+def counts(rows):
+    """{page: (statements, flagged)} for every page, at ``rows`` rows."""
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "WTF_CSRF_ENABLED": False,
+        "IDENTITY_CACHE_SIZE": 0,
+        "PAGE_CACHE": False,
+        "QUERY_COUNTER": True,
+        "QUERY_COUNTER_RAISE": True,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+
+    result = {}
+    for user_id, budgets in ((2, CUSTOMER_BUDGETS), (1, STAFF_BUDGETS)):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+        for page in budgets:
+            try:
+                response = client.get(page)
+                response.get_data()
+                flagged = None
+                if response.status_code >= 400:
+                    flagged = f"HTTP {response.status_code}"
+            except AssertionError as error:  # QueryCounter found repeated statements
+                response, flagged = None, str(error)
+            result[page] = (int(response.headers["X-Query-Count"]) if response else None, flagged)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=25)
+    args = parser.parse_args()
+
+    small, large = counts(1), counts(args.rows)
+    budgets = {**CUSTOMER_BUDGETS, **STAFF_BUDGETS}
+    failures = 0
+    for page, budget in budgets.items():
+        (one, flagged_one), (many, flagged_many) = small[page], large[page]
+        problems = [flagged for flagged in (flagged_one, flagged_many) if flagged]
+        if not problems and one != many:
+            problems.append(f"{one} queries with 1 row, {many} with {args.rows}")
+        if not problems and many > budget:
+            problems.append(f"{many} queries, budget {budget}")
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':>4}  {page}: {many if many is not None else '-'}/{budget}")
+        for problem in problems:
+            print("      " + problem.replace("\n", "\n      "))
+
+    print(f"{failures} page(s) over budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
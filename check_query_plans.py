@@ -0,0 +1,117 @@
+"""Fail if any page's queries fall back to a full table scan.
+
+Seeds a throwaway in-memory database, requests each customer and staff
+page, and runs EXPLAIN QUERY PLAN on every SELECT they issue. A plan
+step of the form "SCAN <table>" (not "... USING INDEX") means the query
+reads the whole table. Run with ``python -m app.check_query_plans``.
+"""
+import re
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from app import create_app, db, summary
+from app.models import (Account, FinancialGoal, Loan, SavedContact, SpamReport,
+                        Transaction, User)
+
+CUSTOMER_PAGES = [
+    "/dashboard", "/transactions",
+    "/transactions?transaction_type=deposit&start_date=2026-01-01&end_date=2026-12-31",
+    "/transactions?name=test", "/transactions/export?transaction_type=withdraw&name=test",
+    "/my_loans", "/view_goals", "/goal/1", "/customer/contacts", "/customer/transfer",
+    "/transactions/export",
+]
+STAFF_PAGES = [
+    "/staff/dashboard", "/staff/approve_loans", "/staff/approved_loans",
+    "/staff/rejected_loans", "/staff/view_reports", "/staff/customer_list",
+    "/staff/customers", "/staff/customer/2/transactions",
+    "/staff/customer/2/transactions/export?type=credit",
+]
+
+# "SCAN user" but not "SCAN user USING INDEX ..." / "USING COVERING INDEX ..."
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?!.*USING (COVERING )?INDEX)")
+
+
+def seed():
+    staff = User(email="staff@bank.com", username="staff", name="Staff", is_staff=True)
+    staff.set_password("x")
+    db.session.add(staff)
+    for n in (2, 3):
+        user = User(email=f"user{n}@bank.com", username=f"user{n}", name=f"User {n}")
+        user.set_password("x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Account(user_id=user.id, account_number=f"AC{n}", balance=1000))
+        db.session.add(Loan(user_id=user.id, amount=500, reason="test"))
+        db.session.add(FinancialGoal(user_id=user.id, name="goal", target_amount=500,
+                                     deadline=date(2030, 1, 1)))
+        db.session.add(SavedContact(user_id=user.id, name="contact", account_number="AC3"))
+        for day in range(1, 6):
+            db.session.add(Transaction(user_id=user.id, type="Deposit", amount=10,
+                                       timestamp=datetime(2026, 1, day)))
+    db.session.flush()
+    db.session.add(SpamReport(user_id=2, transaction_id=1, reported_user_id=3, reason="test"))
+    for user_id in (1, 2, 3):
+        summary.rebuild(user_id)
+    db.session.commit()
+
+
+def capture(app, user_id, pages):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        for page in pages:
+            start = len(statements)
+            response = client.get(page)
+            response.get_data()  # run streamed bodies too
+            if response.status_code >= 400:
+                print(f"{page}: HTTP {response.status_code}")
+            yield page, statements[start:]
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(statement, parameters):
+    conn = db.session.connection().connection.driver_connection
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in plan if FULL_SCAN.match(row[-1])]
+
+
+def main():
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "WTF_CSRF_ENABLED": False,
+        "IDENTITY_CACHE_SIZE": 0,
+    })
+    with app.app_context():
+        db.create_all()
+        seed()
+
+    failures = 0
+    for user_id, pages in ((2, CUSTOMER_PAGES), (1, STAFF_PAGES)):
+        for page, statements in capture(app, user_id, pages):
+            with app.app_context():
+                for statement, parameters in statements:
+                    for step in full_scans(statement, parameters):
+                        failures += 1
+                        print(f"{page}: {step}\n    {' '.join(statement.split())}")
+
+    print(f"{failures} full table scan(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
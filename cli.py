@@ -0,0 +1,142 @@
+import time
+from importlib import import_module
+
+import click
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import func, select
+
+from . import db
+from .models import Translation
+
+
+# --------------------------
+# Lazily imported command groups
+# --------------------------
+class LazyGroup(AppGroup):
+    """Command group whose subcommands live in a module imported on first use.
+
+    ``commands`` is ``"module:group"``; that group's commands are copied
+    in when the CLI lists or runs them, so create_app never imports the
+    module (and its NumPy / OpenCV dependencies) in web workers.
+    """
+
+    def __init__(self, *args, commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._commands_from = commands
+
+    def _load(self):
+        if self._commands_from:
+            module, _, attr = self._commands_from.partition(":")
+            for command in getattr(import_module(module, __package__), attr).commands.values():
+                self.add_command(command)
+            self._commands_from = None
+
+    def list_commands(self, ctx):
+        self._load()
+        return super().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        self._load()
+        return super().get_command(ctx, name)
+
+
+@click.group("faces", cls=LazyGroup, commands=".face_cli:faces_cli")
+@with_appcontext
+def faces_cli():
+    """Face encoding maintenance commands."""
+    from . import face_service
+    face_service.load()
+
+
+translate_cli = AppGroup("translate", help="Translation cache commands.")
+
+
+def throughput(count, start):
+    elapsed = time.perf_counter() - start
+    return f"{count} in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f}/s)"
+
+
+@translate_cli.command("build")
+@click.option("--lang", "langs", multiple=True, default=["ml"], show_default=True,
+              help="Target language; repeat for several.")
+@click.option("--dry-run", is_flag=True, help="Only list the strings that would be translated.")
+def translate_build(langs, dry_run):
+    """Pre-translate the strings in the templates and flash() calls."""
+    from flask import current_app
+    from .translation import extract_strings, source_hash, translations
+
+    texts = extract_strings(current_app)
+    click.echo(f"{len(texts)} strings in templates and flash messages ({translations.backend_name} backend)")
+    for lang in langs:
+        if dry_run:
+            stored = {h for (h,) in db.session.execute(select(Translation.source_hash).where(Translation.lang == lang))}
+            missing = [text for text in texts if source_hash(text) not in stored]
+            click.echo(f"{lang}: {len(missing)} missing")
+            for text in missing:
+                click.echo(f"  {text}")
+            continue
+        start = time.perf_counter()
+        done = failed = 0
+        for text, translated in translations.build(texts, lang):
+            if translated is None:
+                failed += 1
+            else:
+                done += 1
+        click.echo(f"{lang}: translated {throughput(done, start)}, {failed} failed")
+
+
+@translate_cli.command("stats")
+def translate_stats():
+    """Stored translations per language and backend."""
+    rows = db.session.execute(
+        select(Translation.lang, Translation.backend, func.count())
+        .group_by(Translation.lang, Translation.backend)
+        .order_by(Translation.lang)
+    ).all()
+    if not rows:
+        click.echo("No stored translations.")
+    for lang, backend, count in rows:
+        click.echo(f"  {lang:<6} {backend or '-':<10} {count:>8}")
+
+
+smart_saver_cli = AppGroup("smart-saver", help="Smart Saver auto-debit scheduler.")
+
+
+def _describe(checkpoint):
+    state = "finished" if checkpoint.finished_at else "in progress"
+    return (f"{checkpoint.job} as of {checkpoint.as_of:%Y-%m-%d %H:%M} ({state}): "
+            f"{checkpoint.batches} batches, {checkpoint.processed} goals, {checkpoint.debited} debited, "
+            f"{checkpoint.skipped} skipped, ₹{checkpoint.amount}")
+
+
+@smart_saver_cli.command("run")
+@click.option("--as-of", type=click.DateTime(), help="Due cutoff (UTC); default now.")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@click.option("--max-seconds", type=float, help="Stop between batches after this long; the next run resumes.")
+@click.option("--loop", "interval", type=float, help="Keep running, starting a new run every N seconds.")
+def smart_saver_run(as_of, batch_size, max_seconds, interval):
+    """Debit every Smart Saver goal that is due."""
+    from . import smart_saver
+
+    while True:
+        start = time.perf_counter()
+        checkpoint = smart_saver.run(as_of=as_of, batch_size=batch_size, max_seconds=max_seconds)
+        click.echo(f"{_describe(checkpoint)}; {throughput(checkpoint.processed, start)}")
+        if interval is None:
+            break
+        as_of = None
+        time.sleep(interval)
+
+
+@smart_saver_cli.command("status")
+def smart_saver_status():
+    """The last run's checkpoint and the goals currently due."""
+    from datetime import datetime
+    from .models import FinancialGoal, JobCheckpoint
+
+    checkpoint = db.session.get(JobCheckpoint, "smart_saver")
+    click.echo(_describe(checkpoint) if checkpoint else "No runs yet.")
+    due = db.session.execute(
+        select(func.count()).where(FinancialGoal.next_run_at <= datetime.utcnow())
+    ).scalar()
+    click.echo(f"{due} goal(s) due now")
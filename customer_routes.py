@@ -1,39 +1,32 @@
-import base64
-from io import BytesIO
 import random
-from tkinter import Image
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user, logout_user
 
-from .routes import get_face_encoding
+from .face_pool import face_pool, FacePoolUnavailable
+from .face_service import NoFaceFound
+from .fraud import fraud_scorer
+from . import face_service, ledger, summary
+from .page_cache import cached_page
 from .models import SavedContact, User, Account, Transaction, db
-import numpy as np
-from datetime import datetime
+from .money import Money
 from .forms import RegisterForm, DepositForm, WithdrawForm
 
 customer_bp = Blueprint("customer_bp", __name__)
 
 def get_or_create_account(user):
-    if not user.account:
-        account = Account(user_id=user.id, balance=0.0)
-        db.session.add(account)
-        db.session.commit()
-        return account
-    return user.account
+    return user.get_or_create_account()
 
 @customer_bp.route("/dashboard")
 @login_required
 def dashboard():
-    account = get_or_create_account(current_user)
-    balance = account.balance if account else 0.0
-    account_number = account.account_number if account else None
-    goal_savings = sum(getattr(goal, "smart_saver_balance", 0) for goal in getattr(current_user, "goals", []))
-    usable_balance = balance - goal_savings
+    row = summary.get(current_user.id)
     return render_template("dashboard.html",
                            username = current_user.username,
-                           balance=balance, account_number=account_number,
-                           usable_balance=usable_balance,
-                           goal_savings = goal_savings 
+                           balance=row.balance, account_number=row.account_number,
+                           usable_balance=row.usable_balance,
+                           goal_savings=row.goal_savings,
+                           pending_loans=row.pending_loans,
+                           unread_reports=row.unread_reports,
                            )
 
 
@@ -72,12 +65,17 @@ def register():
         user = User(username=username, email=email, name=full_name,
                     place=place, mobile_number=mobile_number)
 
+        encoding = None
         if face_data:
-            face_data = face_data.split(',')[1]
             try:
-                img = Image.open(BytesIO(base64.b64decode(face_data))).convert("RGB")
-                np_img = np.array(img)
-                user.face_encoding = get_face_encoding(np_img).tobytes()
+                encoding = face_service.encode_data_url(face_data)
+                user.face_encoding = face_service.serialize(encoding)
+            except FacePoolUnavailable:
+                flash("Face capture is busy right now. Please submit again in a moment.", "warning")
+                return render_template("register.html", form=form), 503, {"Retry-After": face_pool.retry_after}
+            except NoFaceFound:
+                flash("No face found in the photo; face login was not set up.", "warning")
+                user.face_encoding = None
             except Exception:
                 flash("Failed to process face image.", "warning")
                 user.face_encoding = None
@@ -85,10 +83,13 @@ def register():
         user.set_password(password)
         db.session.add(user)
         db.session.commit()
+        if encoding is not None:
+            face_service.index(user.id, encoding)
 
         account_number = "SB" + str(random.randint(10000000, 99999999))
         account = Account(user_id=user.id, account_number=account_number, balance=0.0)
         db.session.add(account)
+        summary.rebuild(user.id)
         db.session.commit()
 
         flash("Registered successfully! Please login to continue.", "success")
@@ -100,6 +101,7 @@ def register():
 # ---------------- EMI CALCULATOR ----------------
 @customer_bp.route('/emi_calculator', methods=['GET', 'POST'])
 @login_required
+@cached_page(shared=False)
 def emi_calculator():
     emi = total_payment = total_interest = None
     tenure_display = ""
@@ -145,20 +147,18 @@ def emi_calculator():
 def deposit():
     form = DepositForm()
     if form.validate_on_submit():
-        amount = float(form.amount.data)
+        amount = Money.from_rupees(form.amount.data)
         account = current_user.account
         if not account:
             flash('No account found.', 'danger')
-            return redirect(url_for('customer_bp.dashboardard'))
+            return redirect(url_for('customer_bp.dashboard'))
 
-        if amount <= 0:
+        try:
+            ledger.deposit(account, amount)
+        except ledger.LedgerError:
             flash('Please enter a valid positive amount.', 'danger')
             return render_template('deposit.html', form=form)
 
-        account.balance += amount
-        txn = Transaction(type="Deposit", amount=amount, user_id=current_user.id, timestamp=datetime.utcnow())
-        db.session.add(txn)
-        db.session.commit()
         flash('Deposit successful! Your balance has been updated.', 'success')
         return redirect(url_for('customer_bp.dashboard'))
 
@@ -171,22 +171,20 @@ def deposit():
 def withdraw():
     form = WithdrawForm()
     if form.validate_on_submit():
-        amount = float(form.amount.data)
+        amount = Money.from_rupees(form.amount.data)
         account = current_user.account
         if not account:
             flash("Account not found.", "danger")
             return redirect(url_for('customer_bp.dashboard'))
 
-        if amount <= 0 or amount > account.balance:
+        try:
+            ledger.withdraw(account, amount)
+        except ledger.LedgerError:
             flash("Invalid amount or insufficient funds.", "danger")
             return render_template("withdraw.html", form=form)
 
-        account.balance -= amount
-        txn = Transaction(type="Withdraw", amount=amount, user_id=current_user.id, timestamp=datetime.utcnow())
-        db.session.add(txn)
-        db.session.commit()
         flash("Withdrawal successful!", "success")
-        return redirect(url_for('customer_bp.dashboardard'))
+        return redirect(url_for('customer_bp.dashboard'))
 
     return render_template("withdraw.html", form=form)
 
@@ -202,32 +200,25 @@ def transfer():
         save_contact = request.form.get('save_contact')
 
         try:
-            amount = float(amount_str)
+            amount = Money.from_rupees(amount_str)
         except ValueError:
             flash("Invalid amount entered.", "danger")
-            return redirect(url_for('customer.transfer'))
+            return redirect(url_for('customer_bp.transfer'))
 
-        sender = current_user.account
-        recipient = Account.query.filter_by(account_number=account_number).first()
-
-        if not recipient:
+        try:
+            assessment = ledger.transfer(current_user.account, account_number, amount,
+                                         beneficiary_name=beneficiary_name, sender_name=current_user.name)
+        except ledger.TransferBlocked:
+            flash("This transfer has been held for review. Please contact the bank.", "danger")
+        except ledger.AccountNotFound:
             flash("Recipient not found.", "danger")
-        elif recipient.id == sender.id:
+        except ledger.SameAccount:
             flash("Cannot transfer to your own account.", "warning")
-        elif amount <= 0:
+        except ledger.InvalidAmount:
             flash("Amount must be greater than 0.", "warning")
-        elif sender.balance < amount:
+        except ledger.InsufficientFunds:
             flash("Insufficient funds.", "danger")
         else:
-            sender.balance -= amount
-            recipient.balance += amount
-            txn_sender = Transaction(user_id=current_user.id, type='Transfer', amount=amount,
-                                     recipient_account=account_number, beneficiary_name=beneficiary_name, status="Success")
-            db.session.add(txn_sender)
-            txn_recipient = Transaction(user_id=recipient.user_id, type='Received', amount=amount,
-                                        recipient_account=sender.account_number, beneficiary_name=current_user.name, status="Success")
-            db.session.add(txn_recipient)
-
             if save_contact:
                 exists = SavedContact.query.filter_by(user_id=current_user.id, account_number=account_number).first()
                 if not exists:
@@ -235,7 +226,10 @@ def transfer():
                     db.session.add(new_contact)
 
             db.session.commit()
-            flash("Transfer successful!", "success")
+            if assessment.flagged:
+                flash("Transfer successful. It has been flagged for a routine review.", "warning")
+            else:
+                flash("Transfer successful!", "success")
             return redirect(url_for('customer_bp.dashboard'))
 
     saved_contacts = SavedContact.query.filter_by(user_id=current_user.id).all()
@@ -290,7 +284,10 @@ def report_transaction(transaction_id: int):
 
     tx.reported = True
     db.session.add(report)
+    summary.adjust(current_user.id, unread_reports=1)
     db.session.commit()
+    if reported_user_id:
+        fraud_scorer.reported(reported_user_id)
 
     flash("Thank you. The transaction has been reported and will be reviewed by staff.", "success")
     return redirect(url_for('main.transactions'))
@@ -305,6 +302,8 @@ def delete_account():
         db.session.delete(account)
     db.session.delete(user)
     db.session.commit()
+    face_service.forget(user.id)
+    fraud_scorer.forget(user.id)
     logout_user()
     flash("Your account has been deleted.", "success")
     return redirect(url_for('main.login'))
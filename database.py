@@ -0,0 +1,94 @@
+import os
+from sqlalchemy import event
+
+# --------------------------
+# Engine profiles
+# --------------------------
+# Selected with DATABASE_PROFILE (or the DATABASE_PROFILE config key).
+#
+#   default     SQLite with driver defaults, as before.
+#   production  SQLite in WAL mode so readers never wait for the writer,
+#               with a busy timeout instead of failing with "database is
+#               locked", a larger page cache and memory-mapped reads.
+#   postgres    DATABASE_URL, with pre-ping and connection recycling.
+#
+# Pool sizes are per process, so a gunicorn worker holds at most
+# DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW connections.
+PROFILES = {
+    "default": {
+        "pragmas": {},
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,           # ms
+            "cache_size": -64000,           # KiB, i.e. 64 MB
+            "mmap_size": 256 * 1024 * 1024,
+            "temp_store": "MEMORY",
+        },
+        "connect_args": {"timeout": 5},
+        "pool_size": 5,
+        "max_overflow": 5,
+    },
+    "postgres": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    },
+}
+
+
+def _database_url():
+    """DATABASE_URL, pinned to the psycopg2 driver from requirements.txt."""
+    url = os.environ.get("DATABASE_URL")
+    for prefix in ("postgres://", "postgresql://"):  # postgres:// is the Heroku spelling
+        if url and url.startswith(prefix):
+            return "postgresql+psycopg2://" + url[len(prefix):]
+    return url
+
+
+def configure(app):
+    """Fill in SQLALCHEMY_* settings for the selected profile.
+
+    Must run before ``db.init_app``. Explicit SQLALCHEMY_ENGINE_OPTIONS
+    entries win over the profile.
+    """
+    name = app.config.get("DATABASE_PROFILE") or os.environ.get("DATABASE_PROFILE", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown database profile '{name}'")
+    profile = PROFILES[name]
+    app.config["DATABASE_PROFILE"] = name
+
+    if name == "postgres":
+        url = _database_url()
+        if not url:
+            raise ValueError("The postgres database profile needs DATABASE_URL")
+        app.config["SQLALCHEMY_DATABASE_URI"] = url
+
+    options = {key: value for key, value in profile.items() if key != "pragmas"}
+    for key in ("pool_size", "max_overflow"):
+        setting = f"DATABASE_{key.upper()}"
+        value = app.config.get(setting, os.environ.get(setting))
+        if value is not None:
+            options[key] = int(value)
+    if app.config["SQLALCHEMY_DATABASE_URI"] in ("sqlite://", "sqlite:///:memory:"):
+        options.pop("pool_size", None)   # in-memory SQLite uses a single static connection
+        options.pop("max_overflow", None)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**options, **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+    app.config["SQLITE_PRAGMAS"] = dict(profile.get("pragmas", {}))
+
+
+def install_pragmas(app, engine):
+    """Apply the profile's PRAGMAs to every new SQLite connection."""
+    pragmas = app.config.get("SQLITE_PRAGMAS")
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
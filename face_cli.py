@@ -0,0 +1,315 @@
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update
+
+from . import db
+from .cli import throughput
+from .models import User, invalidate_identities
+from .face_codec import face_codec, DTYPE_FLOAT16, DTYPE_INT8, HEADER_SIZES, LEGACY_SIZE, RAW_DIM
+from .face_index import face_index
+
+# Loaded by cli.faces_cli on first use, after face_service.load().
+faces_cli = AppGroup("faces")
+
+
+def iter_encodings(batch_size):
+    """Yield (user_id, blob) pages in primary-key order."""
+    last_id = 0
+    while True:
+        rows = User.face_encoding_rows(after_id=last_id, limit=batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def check_encoding(blob):
+    """Classify a stored blob as "current", "stale" (readable, old format) or "broken".
+
+    A blob projected with a different PCA fit than the current one is
+    broken: it cannot be compared with the others.
+    """
+    try:
+        vec = face_codec.decode(blob)
+    except ValueError:
+        return "broken"
+    if not np.isfinite(vec).all():
+        return "broken"
+    return "current" if face_codec.is_current(blob) else "stale"
+
+
+@faces_cli.command("build-index")
+@click.option("--path", default=None, help="Snapshot file to write (defaults to FACE_INDEX_PATH).")
+def build_index(path):
+    """Rebuild the face index from the database and save a snapshot."""
+    start = time.perf_counter()
+    face_index.rebuild()
+    saved = face_index.save(path)
+    elapsed = time.perf_counter() - start
+    click.echo(f"Indexed {len(face_index)} encodings ({face_index.backend_name}) in {elapsed:.1f}s -> {saved}")
+
+
+@faces_cli.command("fit-pca")
+@click.option("--dims", default=256, show_default=True, help="Number of PCA components to keep.")
+@click.option("--sample", default=2000, show_default=True, help="Maximum number of encodings to fit on.")
+@click.option("--force", is_flag=True, help="Replace an existing projection.")
+@click.option("--batch-size", default=500, show_default=True)
+def fit_pca(dims, sample, force, batch_size):
+    """Fit the PCA projection used for compact face encodings.
+
+    Only full-size encodings can be used, so run this before `compact`.
+    With --force an existing projection is replaced, and rows already
+    projected with it are re-encoded into the new one through their PCA
+    reconstruction in the same run (encodings stamp the projection they
+    are in, so rows left in the old one would be refused, not misread).
+    """
+    if face_codec.projected and not force:
+        raise click.ClickException(f"A projection already exists at {face_codec.path}; pass --force to replace it.")
+    refit = face_codec.projected
+    vectors = []
+    for rows in iter_encodings(500):
+        for _, blob in rows:
+            try:
+                vec = face_codec.decode_raw(blob)
+            except ValueError:
+                continue
+            if vec.shape[0] == RAW_DIM and face_codec.pipeline_of(blob) == face_codec.pipeline:
+                vectors.append(vec)
+        if len(vectors) >= sample:
+            break
+    if len(vectors) < 2:
+        raise click.ClickException("Not enough full-size encodings to fit a projection.")
+    db.session.rollback()
+    if refit:
+        # read every projected row while the old fit is still loaded
+        projected = {}
+        for rows in iter_encodings(batch_size):
+            for user_id, blob in rows:
+                try:
+                    vec = face_codec.decode(blob)
+                except ValueError:
+                    continue
+                if vec is not None and face_codec.projection_of(blob) == face_codec.projection_id:
+                    projected[user_id] = face_codec.unproject(vec)
+            db.session.rollback()
+    face_codec.fit(vectors[:sample], dims)
+    saved = face_codec.save()
+    click.echo(f"Fitted {face_codec.dim} components on {min(len(vectors), sample)} encodings -> {saved}")
+    threshold = current_app.config["FACE_MATCH_THRESHOLD"]
+    click.echo(f"FACE_MATCH_THRESHOLD {threshold} on raw encodings is {face_codec.threshold(threshold):.3f} "
+               "in this projection (same false accept rate)")
+    if refit:
+        ids = list(projected)
+        for i in range(0, len(ids), batch_size):
+            changed_at = datetime.utcnow()
+            changes = [{"id": user_id, "face_encoding": face_codec.encode(projected[user_id]),
+                        "face_updated_at": changed_at}
+                       for user_id in ids[i:i + batch_size]]
+            db.session.execute(update(User), changes)
+            invalidate_identities(change["id"] for change in changes)
+            db.session.commit()
+        click.echo(f"Re-encoded {len(ids)} projected encodings into the new projection")
+        click.echo("Run `flask faces build-index` to refresh the index snapshot.")
+
+
+@faces_cli.command("compact")
+@click.option("--batch-size", default=500, show_default=True)
+def compact(batch_size):
+    """Re-encode stored face encodings into the current compact format."""
+    start = time.perf_counter()
+    seen = rewritten = before = after = 0
+    for rows in iter_encodings(batch_size):
+        changes = []
+        for user_id, blob in rows:
+            seen += 1
+            if face_codec.is_current(blob):
+                continue
+            try:
+                packed = face_codec.encode(face_codec.decode(blob))
+            except ValueError:  # unreadable, or in another projection: see `verify`
+                continue
+            changes.append({"id": user_id, "face_encoding": packed, "face_updated_at": datetime.utcnow()})
+            before += len(blob)
+            after += len(packed)
+        if changes:
+            db.session.execute(update(User), changes)
+            invalidate_identities(change["id"] for change in changes)
+            db.session.commit()
+            rewritten += len(changes)
+    elapsed = time.perf_counter() - start
+    click.echo(f"Rewrote {rewritten} of {seen} encodings in {elapsed:.1f}s ({before} -> {after} bytes)")
+    if rewritten and face_index.path and os.path.exists(face_index.path):
+        click.echo("Run `flask faces build-index` to refresh the index snapshot.")
+
+
+@faces_cli.command("verify")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--show", default=20, show_default=True, help="How many broken user ids to list.")
+def verify(batch_size, show):
+    """Check every stored encoding against the current storage format."""
+    start = time.perf_counter()
+    counts, broken = Counter(), []
+    for rows in iter_encodings(batch_size):
+        for user_id, blob in rows:
+            status = check_encoding(blob)
+            counts[status] += 1
+            if status == "broken":
+                broken.append(user_id)
+        db.session.rollback()  # end the read between batches
+    total = sum(counts.values())
+    click.echo(f"Checked {throughput(total, start)}: {counts['current']} current, "
+               f"{counts['stale']} stale, {counts['broken']} broken")
+    if broken:
+        click.echo(f"Broken: {', '.join(map(str, broken[:show]))}{' ...' if len(broken) > show else ''}")
+        click.echo("Run `flask faces reencode` or `flask faces purge` to fix them.")
+    if counts["stale"]:
+        click.echo("Run `flask faces compact` to rewrite stale encodings.")
+
+
+@faces_cli.command("purge")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--yes", is_flag=True, help="Do not ask for confirmation.")
+def purge(batch_size, yes):
+    """Clear encodings that cannot be read. The users themselves are kept."""
+    start = time.perf_counter()
+    broken = []
+    for rows in iter_encodings(batch_size):
+        broken.extend(user_id for user_id, blob in rows if check_encoding(blob) == "broken")
+        db.session.rollback()
+    if not broken:
+        click.echo("No broken encodings.")
+        return
+    if not yes:
+        click.confirm(f"Clear {len(broken)} broken face encodings?", abort=True)
+    for i in range(0, len(broken), batch_size):
+        ids = broken[i:i + batch_size]
+        db.session.execute(
+            update(User).where(User.id.in_(ids)).values(face_encoding=None, face_updated_at=datetime.utcnow())
+        )
+        invalidate_identities(ids)
+        db.session.commit()
+        for user_id in ids:
+            face_index.remove(user_id)
+    click.echo(f"Cleared {throughput(len(broken), start)}")
+
+
+def source_images(directory):
+    """Map username -> sample paths for face_capture's <username>_<n>.jpg files."""
+    images = defaultdict(list)
+    for entry in os.scandir(directory):
+        stem, ext = os.path.splitext(entry.name)
+        username, _, count = stem.rpartition("_")
+        if entry.is_file() and ext.lower() in (".jpg", ".jpeg", ".png") and username and count.isdigit():
+            images[username].append(entry.path)
+    return images
+
+
+def encode_images(job):
+    """Worker: average the raw encodings of one user's sample images.
+
+    face_capture.py saves the detector's crop, so a sample in which no
+    face is found again is encoded as an existing crop.
+    """
+    import cv2
+    from .face_detect import face_detector, NoFaceFound
+
+    user_id, paths = job
+    vectors = []
+    for path in sorted(paths):
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        try:
+            vectors.append(face_detector.encode(gray))
+        except NoFaceFound:
+            vectors.append(face_detector.encode(gray, cropped=True))
+    return user_id, np.mean(vectors, axis=0) if vectors else None
+
+
+@faces_cli.command("reencode")
+@click.option("--source", default="faces", show_default=True, type=click.Path(exists=True, file_okay=False),
+              help="Directory of <username>_<n>.jpg captures (face_capture.py).")
+@click.option("--workers", default=os.cpu_count(), show_default=True)
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--only-broken", is_flag=True, help="Skip users whose stored encoding is readable.")
+def reencode(source, workers, batch_size, only_broken):
+    """Rebuild encodings from source images in parallel, committing per batch."""
+    images = source_images(source)
+    start = time.perf_counter()
+    done = missing = 0
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            users = db.session.execute(
+                select(User.id, User.username).where(User.id > last_id).order_by(User.id).limit(batch_size)
+            ).all()
+            if not users:
+                break
+            last_id = users[-1].id
+            jobs = [(u.id, images[u.username]) for u in users if u.username in images]
+            if only_broken and jobs:
+                blobs = dict(db.session.execute(
+                    select(User.id, User.face_encoding).where(User.id.in_([j[0] for j in jobs]))
+                ).all())
+                jobs = [j for j in jobs if not blobs.get(j[0]) or check_encoding(blobs[j[0]]) == "broken"]
+            db.session.rollback()
+
+            changes = []
+            for user_id, vec in pool.map(encode_images, jobs, chunksize=max(1, len(jobs) // (4 * workers))):
+                if vec is None:
+                    missing += 1
+                    continue
+                changes.append({"id": user_id, "face_encoding": face_codec.encode(vec),
+                                "face_updated_at": datetime.utcnow()})
+            if changes:
+                db.session.execute(update(User), changes)
+                invalidate_identities(change["id"] for change in changes)
+                db.session.commit()
+                done += len(changes)
+                click.echo(f"  {throughput(done, start)}")
+    click.echo(f"Re-encoded {throughput(done, start)}; {missing} users had no readable images")
+    if done:
+        click.echo("Run `flask faces build-index` to refresh the index snapshot.")
+
+
+@faces_cli.command("stats")
+def stats():
+    """Summarise stored encodings by format without reading the blobs."""
+    length = func.length(User.face_encoding)
+    header = func.substr(User.face_encoding, 1, 1)
+    rows = db.session.execute(
+        select(length, header, func.count())
+        .where(User.face_encoding.isnot(None))
+        .group_by(length, header)
+    ).all()
+    total = sum(n for _, _, n in rows)
+    size = sum(l * n for l, _, n in rows)
+    click.echo(f"{total} encodings, {size / 1024 / 1024:.1f} MB"
+               + (f", {size / total:,.0f} bytes average" if total else ""))
+    formats = Counter()
+    for nbytes, head, count in rows:
+        code = head[0] & 0x0F if head else None
+        header = HEADER_SIZES.get(head[0] >> 4, 1) if head else 1
+        if nbytes == LEGACY_SIZE:  # no header; the first byte is payload
+            label = f"legacy float64 x {RAW_DIM}"
+        elif code == DTYPE_FLOAT16:
+            label = f"float16 x {(nbytes - header) // 2}"
+        elif code == DTYPE_INT8:
+            label = f"int8 x {nbytes - header - 4}"
+        else:
+            label = "unreadable"
+        formats[f"{label} ({nbytes} bytes)"] += count
+    for label, count in formats.most_common():
+        click.echo(f"  {count:>8}  {label}")
+    face_index.refresh()  # the snapshot plus anything stored since, as a login would see it
+    click.echo(f"Index: {len(face_index)} vectors ({face_index.backend_name}), "
+               f"codec stores {face_codec.dtype} x {face_codec.dim}"
+               + (f" (projection {face_codec.projection_id:08x})" if face_codec.projected else ""))
@@ -0,0 +1,249 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+# get_face_encoding: 100x100 grayscale, flattened
+RAW_DIM = 100 * 100
+LEGACY_SIZE = RAW_DIM * 8  # raw float64 .tobytes(), no header
+
+FORMAT_VERSION = 3
+PROJECTION_VERSION = 2  # projection id, no pipeline; still readable
+UNSTAMPED_VERSION = 1   # no projection id; still readable
+HEADER_SIZES = {FORMAT_VERSION: 6, PROJECTION_VERSION: 5, UNSTAMPED_VERSION: 1}
+RAW_PROJECTION = 0      # projection id of unprojected (RAW_DIM) payloads
+
+# How the 100x100 image behind an encoding was made (face_detect).
+# Encodings from different pipelines are not comparable.
+PIPELINE_FULL_FRAME = 0  # whole frame resized; everything before version 3
+PIPELINE_FACE_CROP = 1   # detected face, eye-aligned, histogram equalised
+PIPELINE_NAMES = {PIPELINE_FULL_FRAME: "full frame", PIPELINE_FACE_CROP: "face crop"}
+DTYPE_FLOAT16 = 1
+DTYPE_INT8 = 2
+DTYPES = {"float16": DTYPE_FLOAT16, "int8": DTYPE_INT8}
+
+# Threshold calibration recorded with a fitted projection
+CALIBRATION_SAMPLE = 1000   # encodings, so about 500k pairs
+CALIBRATION_POINTS = 1001   # quantiles kept per space
+
+
+# --------------------------
+# Face encoding codec
+# --------------------------
+class FaceCodec:
+    """Versioned, compact storage format for User.face_encoding.
+
+    Every blob starts with one header byte: the format version in the
+    high nibble and the payload dtype in the low nibble, then the
+    little-endian uint32 id of the projection the payload is in
+    (RAW_PROJECTION for the full 10,000 values), then one byte naming the
+    image pipeline it was computed with. float16 payloads follow
+    directly; int8 payloads are preceded by a little-endian float32
+    scale. When a PCA projection has been fitted (``flask faces
+    fit-pca``) encodings are projected to its few hundred dimensions
+    before they are stored; its id is a checksum of the fitted arrays,
+    so a blob projected with another fit is refused instead of being
+    compared in the wrong basis. Projection also moves cosines between
+    different people (the mean face is subtracted), so a fit records
+    how they are distributed before and after, and ``threshold`` maps
+    FACE_MATCH_THRESHOLD into the projected space.
+
+    An encoding computed with another pipeline than the one in use
+    (``pipeline``, set from FACE_DETECTION) is refused too: until
+    ``flask faces reencode`` rebuilds them from the users' images, old
+    full-frame encodings would be compared with face-crop queries.
+
+    Version 2 blobs (no pipeline) and version 1 blobs (no projection id)
+    were computed from the full frame; they and blobs written before this
+    format existed (raw float64, 80 KB) are still readable, and
+    ``flask faces compact`` rewrites them.
+    """
+
+    def __init__(self):
+        self.dtype = "int8"
+        self.path = None
+        self.mean = None
+        self.components = None
+        self.projection_id = RAW_PROJECTION
+        self.calibration = None
+        self.pipeline = PIPELINE_FULL_FRAME
+
+    def init_app(self, app):
+        app.config.setdefault("FACE_PCA_PATH", os.path.join(app.root_path, "face_pca.npz"))
+        app.config.setdefault("FACE_ENCODING_DTYPE", "int8")
+        if app.config["FACE_ENCODING_DTYPE"] not in DTYPES:
+            raise ValueError(f"Unknown face encoding dtype '{app.config['FACE_ENCODING_DTYPE']}'")
+        self.dtype = app.config["FACE_ENCODING_DTYPE"]
+        self.path = app.config["FACE_PCA_PATH"]
+        self.mean = self.components = self.calibration = None
+        self.projection_id = RAW_PROJECTION
+        if self.path and os.path.exists(self.path):
+            self.load(self.path)
+            if self.calibration is None:
+                app.logger.warning("%s has no threshold calibration, so FACE_MATCH_THRESHOLD is used unchanged "
+                                   "on projected encodings; refit it with `flask faces fit-pca --force`.", self.path)
+
+    @property
+    def projected(self):
+        return self.components is not None
+
+    @property
+    def dim(self):
+        return self.components.shape[0] if self.projected else RAW_DIM
+
+    # --- Projection ---
+    def project(self, vector):
+        """Map a raw encoding into the space the index compares in."""
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+        if self.projected and vec.shape[0] == RAW_DIM:
+            return self.components @ (vec - self.mean)
+        return vec
+
+    def unproject(self, vector):
+        """Approximate raw encoding of a projected one (its PCA reconstruction)."""
+        return self.components.T @ np.asarray(vector, dtype=np.float32) + self.mean
+
+    def fit(self, vectors, dims):
+        """Fit a PCA projection to ``dims`` components on raw encodings."""
+        data = np.asarray(vectors, dtype=np.float32)
+        dims = min(dims, *data.shape)
+        mean = data.mean(axis=0)
+        _, _, vt = np.linalg.svd(data - mean, full_matrices=False)
+        self.mean = mean
+        self.components = np.ascontiguousarray(vt[:dims], dtype=np.float32)
+        self.projection_id = self._checksum()
+        self.calibration = self._calibrate(data)
+
+    def _calibrate(self, data):
+        """Quantiles of the cosine between different people, raw and projected.
+
+        Stored encodings are one per user, so every pair in the sample
+        is two different people.
+        """
+        sample = data[:CALIBRATION_SAMPLE]
+        raw = sample / np.maximum(np.linalg.norm(sample, axis=1, keepdims=True), 1e-12)
+        projected = (sample - self.mean) @ self.components.T
+        projected /= np.maximum(np.linalg.norm(projected, axis=1, keepdims=True), 1e-12)
+        pairs = np.triu_indices(len(sample), 1)
+        quantiles = np.linspace(0, 1, CALIBRATION_POINTS)
+        return np.stack([np.quantile((raw @ raw.T)[pairs], quantiles),
+                         np.quantile((projected @ projected.T)[pairs], quantiles)]).astype(np.float32)
+
+    def threshold(self, raw):
+        """The cosine threshold to compare encodings with, for a raw-tuned ``raw``.
+
+        With a calibrated projection this is the projected cosine that
+        different people exceed as often as they exceed ``raw`` on raw
+        encodings, which keeps the false accept rate the same. Beyond
+        the pairs sampled it is interpolated towards -1 and 1, which
+        both spaces share, rather than held at the most extreme pair.
+        """
+        if not self.projected or self.calibration is None:
+            return raw
+        return float(np.interp(raw, [-1, *self.calibration[0], 1], [-1, *self.calibration[1], 1]))
+
+    def _checksum(self):
+        # never RAW_PROJECTION
+        return zlib.crc32(self.components.tobytes(), zlib.crc32(self.mean.tobytes())) or 1
+
+    def save(self, path=None):
+        path = path or self.path
+        np.savez(path, mean=self.mean, components=self.components, calibration=self.calibration)
+        return path
+
+    def load(self, path=None):
+        with np.load(path or self.path, allow_pickle=False) as data:
+            self.mean = data["mean"].astype(np.float32)
+            self.components = np.ascontiguousarray(data["components"], dtype=np.float32)
+            self.calibration = data["calibration"] if "calibration" in data.files else None
+        self.projection_id = self._checksum()
+
+    # --- Storage ---
+    def encode(self, vector):
+        """Project and quantise an encoding into its stored bytes."""
+        vec = self.project(vector)
+        code = DTYPES[self.dtype]
+        projection = self.projection_id if vec.shape[0] != RAW_DIM else RAW_PROJECTION
+        header = bytes([(FORMAT_VERSION << 4) | code]) + struct.pack("<IB", projection, self.pipeline)
+        if code == DTYPE_FLOAT16:
+            return header + vec.astype("<f2").tobytes()
+        peak = float(np.abs(vec).max())
+        scale = peak / 127 if peak else 1.0
+        quantised = np.clip(np.rint(vec / scale), -127, 127).astype(np.int8)
+        return header + struct.pack("<f", scale) + quantised.tobytes()
+
+    @staticmethod
+    def _header_size(blob):
+        version = blob[0] >> 4
+        if version not in HEADER_SIZES:
+            raise ValueError(f"Unsupported face encoding version {version}")
+        return HEADER_SIZES[version]
+
+    def decode_raw(self, blob):
+        """Read a stored blob back as stored, without projecting it."""
+        if not blob:
+            return None
+        if len(blob) == LEGACY_SIZE:
+            return np.frombuffer(blob, dtype=np.float64).astype(np.float32)
+        offset, code = self._header_size(blob), blob[0] & 0x0F
+        if code == DTYPE_FLOAT16:
+            return np.frombuffer(blob, dtype="<f2", offset=offset).astype(np.float32)
+        if code == DTYPE_INT8:
+            (scale,) = struct.unpack_from("<f", blob, offset)
+            return np.frombuffer(blob, dtype=np.int8, offset=offset + 4).astype(np.float32) * scale
+        raise ValueError(f"Unknown face encoding dtype code {code}")
+
+    def projection_of(self, blob, vec=None):
+        """Id of the projection a blob's payload is in.
+
+        Version 1 blobs carry none: full-size ones are RAW_PROJECTION and
+        projected ones are taken to be in the current projection, the
+        only one that existed before ids were stored (``compact`` stamps
+        them).
+        """
+        if len(blob) == LEGACY_SIZE:
+            return RAW_PROJECTION
+        if blob[0] >> 4 in (FORMAT_VERSION, PROJECTION_VERSION):
+            return struct.unpack_from("<I", blob, 1)[0]
+        vec = self.decode_raw(blob) if vec is None else vec
+        return RAW_PROJECTION if vec.shape[0] == RAW_DIM else self.projection_id
+
+    @staticmethod
+    def pipeline_of(blob):
+        """The image pipeline a blob was computed with."""
+        if len(blob) != LEGACY_SIZE and blob[0] >> 4 == FORMAT_VERSION:
+            return blob[5]
+        return PIPELINE_FULL_FRAME
+
+    def decode(self, blob):
+        """Read a stored blob into the comparison space.
+
+        Raises ValueError for a payload projected with a different fit
+        or computed with another image pipeline.
+        """
+        vec = self.decode_raw(blob)
+        if vec is None:
+            return None
+        pipeline = self.pipeline_of(blob)
+        if pipeline != self.pipeline:
+            raise ValueError(f"Face encoding was computed from the {PIPELINE_NAMES.get(pipeline, pipeline)}, "
+                             f"not the {PIPELINE_NAMES[self.pipeline]}")
+        projection = self.projection_of(blob, vec)
+        if projection == RAW_PROJECTION:
+            if vec.shape[0] != RAW_DIM:
+                raise ValueError(f"Unprojected face encoding has {vec.shape[0]} values")
+            return self.project(vec)
+        if projection != self.projection_id or vec.shape[0] != self.dim:
+            raise ValueError(f"Face encoding is in projection {projection:08x}, not {self.projection_id:08x}")
+        return vec
+
+    def is_current(self, blob):
+        """True when a blob already uses the configured dtype, projection and pipeline."""
+        if not blob or len(blob) == LEGACY_SIZE:
+            return False
+        if blob[0] != (FORMAT_VERSION << 4) | DTYPES[self.dtype] or self.pipeline_of(blob) != self.pipeline:
+            return False
+        return self.projection_of(blob) == self.projection_id and self.decode_raw(blob).shape[0] == self.dim
+
+
+face_codec = FaceCodec()
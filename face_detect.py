@@ -0,0 +1,127 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+from .face_service import NoFaceFound
+
+ENCODING_SIZE = (100, 100)
+
+
+# --------------------------
+# Face detector
+# --------------------------
+class FaceDetector:
+    """Haar-cascade face detection, crop and eye alignment.
+
+    The cascades are loaded when the app starts, so a bad path fails
+    there, and then once per thread on first use: a CascadeClassifier
+    should not be shared between the face_pool threads.
+
+    The tiny_face_detector weights next to this file are a TensorFlow.js
+    model for the browser; the server uses OpenCV's bundled cascade. OpenCV
+    5 builds without the objdetect cascades turn detection off with a
+    warning and encode the whole frame, as before.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.face_path = self.eye_path = None
+        self.min_size = 60
+        self.margin = 0.15
+        self._local = threading.local()
+
+    def init_app(self, app):
+        cascades = getattr(getattr(cv2, "data", None), "haarcascades", "")
+        supported = hasattr(cv2, "CascadeClassifier")
+        app.config.setdefault("FACE_DETECTION", supported)
+        app.config.setdefault("FACE_CASCADE_PATH", os.path.join(cascades, "haarcascade_frontalface_default.xml"))
+        app.config.setdefault("EYE_CASCADE_PATH", os.path.join(cascades, "haarcascade_eye.xml"))
+        app.config.setdefault("FACE_MIN_SIZE", 60)
+        app.config.setdefault("FACE_CROP_MARGIN", 0.15)
+        self.configure(
+            enabled=app.config["FACE_DETECTION"],
+            face_path=app.config["FACE_CASCADE_PATH"],
+            eye_path=app.config["EYE_CASCADE_PATH"],
+            min_size=app.config["FACE_MIN_SIZE"],
+            margin=app.config["FACE_CROP_MARGIN"],
+        )
+        if not supported:
+            app.logger.warning("OpenCV %s has no CascadeClassifier; face detection is off", cv2.__version__)
+
+    def configure(self, enabled=True, face_path=None, eye_path=None, min_size=60, margin=0.15):
+        self.enabled = enabled
+        self.face_path, self.eye_path = face_path, eye_path
+        self.min_size, self.margin = min_size, margin
+        self._local = threading.local()
+        if enabled:
+            self._classifiers()  # fail at startup, not on the first login
+
+    def _classifiers(self):
+        local = self._local
+        if not hasattr(local, "face"):
+            if not hasattr(cv2, "CascadeClassifier"):
+                raise RuntimeError(f"OpenCV {cv2.__version__} has no CascadeClassifier")
+            local.face = cv2.CascadeClassifier(self.face_path)
+            if local.face.empty():
+                raise RuntimeError(f"Could not load face cascade {self.face_path}")
+            local.eyes = cv2.CascadeClassifier(self.eye_path) if self.eye_path else None
+            if local.eyes is not None and local.eyes.empty():
+                local.eyes = None
+        return local.face, local.eyes
+
+    # --- Detection ---
+    def detect(self, gray):
+        """Bounding box (x, y, w, h) of the largest face, or None."""
+        face_cascade, _ = self._classifiers()
+        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                              minSize=(self.min_size, self.min_size))
+        if len(faces) == 0:
+            return None
+        return max(faces, key=lambda box: box[2] * box[3])
+
+    def _align(self, face):
+        """Rotate a face crop so the eyes are level, when both are found."""
+        _, eye_cascade = self._classifiers()
+        if eye_cascade is None:
+            return face
+        h, w = face.shape
+        eyes = eye_cascade.detectMultiScale(face[: h // 2], scaleFactor=1.1, minNeighbors=5,
+                                            minSize=(w // 8, w // 8))
+        if len(eyes) < 2:
+            return face
+        eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+        (lx, ly), (rx, ry) = sorted((x + ew / 2, y + eh / 2) for x, y, ew, eh in eyes)
+        angle = np.degrees(np.arctan2(ry - ly, rx - lx))
+        if abs(angle) < 2 or abs(angle) > 30:
+            return face
+        rotation = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        return cv2.warpAffine(face, rotation, (w, h), borderMode=cv2.BORDER_REPLICATE)
+
+    def crop(self, gray):
+        """Square, aligned crop of the largest face in a grayscale frame."""
+        box = self.detect(gray)
+        if box is None:
+            raise NoFaceFound("No face found in the image")
+        x, y, w, h = box
+        pad = int(max(w, h) * self.margin)
+        side = max(w, h) + 2 * pad
+        cx, cy = x + w // 2, y + h // 2
+        x0, y0 = max(0, cx - side // 2), max(0, cy - side // 2)
+        face = gray[y0:y0 + side, x0:x0 + side]
+        return self._align(face)
+
+    # --- Encoding ---
+    def encode(self, gray, cropped=False):
+        """Encoding of a grayscale frame, resized to 100x100 and scaled to [0, 1].
+
+        With detection on, the face is cropped out first (pass
+        ``cropped=True`` for images that already are a face crop) and
+        its histogram equalised. Raises NoFaceFound.
+        """
+        if self.enabled:
+            gray = cv2.equalizeHist(gray if cropped else self.crop(gray))
+        return cv2.resize(gray, ENCODING_SIZE).ravel() / 255.0
+
+
+face_detector = FaceDetector()
@@ -0,0 +1,49 @@
+import base64
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .face_detect import face_detector
+
+
+# --------------------------
+# Image decoding + encoding
+# --------------------------
+# Imported through face_service on the first face request; every
+# function here runs on face_pool threads.
+def get_face_encoding(image_array):
+    gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+    return face_detector.encode(gray)
+
+
+def encode_face_data_url(data_url):
+    """Decode a base64 image data URL and encode it."""
+    header, encoded = data_url.split(",", 1)
+    img = Image.open(BytesIO(base64.b64decode(encoded))).convert("RGB")
+    return get_face_encoding(np.array(img))
+
+
+def encode_face_bytes(buffer):
+    """Encode raw JPEG/PNG bytes (any buffer, e.g. a memoryview).
+
+    OpenCV decodes straight from the buffer into a single grayscale
+    plane, skipping the base64, PIL and RGB copies of the data URL path.
+    """
+    try:
+        gray = cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_GRAYSCALE)
+    except cv2.error:
+        gray = None
+    if gray is None:
+        raise ValueError("Unreadable image")
+    return face_detector.encode(gray)
+
+
+def encode_base64_image(data_url):
+    """Encode a data URL or bare base64 string via the OpenCV decoder."""
+    if ',' in data_url:
+        _, encoded = data_url.split(',', 1)
+    else:
+        encoded = data_url
+    return encode_face_bytes(base64.b64decode(encoded))
@@ -0,0 +1,446 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from . import db
+from .models import User
+from .face_codec import face_codec
+
+INDEX_FORMAT_VERSION = 3
+# Changes are re-read this far behind the newest one seen, so an update
+# stamped just before another worker's refresh but committed after it is
+# not missed.
+CHANGE_OVERLAP = timedelta(seconds=5)
+EPOCH = datetime(1970, 1, 1)
+
+
+# --------------------------
+# Vector helpers
+# --------------------------
+def normalize(vector):
+    vec = np.ascontiguousarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        return None
+    return vec / norm
+
+
+def top_k(scores, k):
+    """Indices of the ``k`` largest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+# --------------------------
+# Backends
+# --------------------------
+class FlatBackend:
+    """Exact search over one contiguous float32 matrix.
+
+    Rows are unit vectors, so cosine similarity for every stored user is
+    a single matrix-vector product. ``ids`` holds the user id per row.
+    """
+
+    def __init__(self):
+        self.matrix = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.size = 0
+        self.rows = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def dim(self):
+        return None if self.matrix is None else self.matrix.shape[1]
+
+    def _grow(self, dim):
+        capacity = max(16, 2 * len(self.ids))
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        if self.matrix is not None:
+            matrix[:self.size] = self.matrix[:self.size]
+            ids[:self.size] = self.ids[:self.size]
+        self.matrix, self.ids = matrix, ids
+
+    def add(self, user_id, vec):
+        row = self.rows.get(user_id)
+        if row is None:
+            if self.matrix is None or self.size == len(self.ids):
+                self._grow(vec.shape[0])
+            row = self.size
+            self.size += 1
+            self.rows[user_id] = row
+            self.ids[row] = user_id
+        self.matrix[row] = vec
+
+    def remove(self, user_id):
+        """Drop a user, moving the last row into the freed slot."""
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            moved = int(self.ids[last])
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+        self.size = last
+
+    def vectors(self):
+        if self.matrix is None:
+            return self.ids[:0], np.empty((0, 0), dtype=np.float32)
+        return self.ids[:self.size], self.matrix[:self.size]
+
+    def search(self, query, k):
+        if self.size == 0:
+            return []
+        scores = self.matrix[:self.size] @ query
+        return [(int(self.ids[i]), float(scores[i])) for i in top_k(scores, k)]
+
+    def to_arrays(self):
+        ids, vectors = self.vectors()
+        return {"ids": ids, "vectors": vectors}
+
+    @classmethod
+    def from_arrays(cls, arrays, **options):
+        backend = cls()
+        ids = np.asarray(arrays["ids"], dtype=np.int64)
+        if len(ids):
+            backend.matrix = np.array(arrays["vectors"], dtype=np.float32, order="C")
+            backend.ids = ids.copy()
+            backend.size = len(ids)
+            backend.rows = {int(user_id): row for row, user_id in enumerate(ids)}
+        return backend
+
+
+class IVFBackend:
+    """Inverted-file index: k-means centroids, one flat list per centroid.
+
+    A query is scored against the centroids first and only the
+    ``nprobe`` closest lists are scanned, so the work per login grows
+    with ``nprobe * n / nlist`` rather than ``n``. Raising ``nprobe``
+    trades latency for recall; ``nprobe == nlist`` is an exact search.
+    Training is an offline step (``flask faces build-index``); until then
+    everything lives in a single list and search is exact.
+    """
+
+    def __init__(self, nlist=256, nprobe=8, iterations=10):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.centroids = None
+        self.lists = [FlatBackend()]
+        self.assignment = {}
+
+    def __len__(self):
+        return len(self.assignment)
+
+    @property
+    def dim(self):
+        for posting in self.lists:
+            if posting.dim is not None:
+                return posting.dim
+        return None
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def _nearest_list(self, vec):
+        if not self.trained:
+            return 0
+        return int(np.argmax(self.centroids @ vec))
+
+    def add(self, user_id, vec):
+        target = self._nearest_list(vec)
+        current = self.assignment.get(user_id)
+        if current is not None and current != target:
+            self.lists[current].remove(user_id)
+        self.lists[target].add(user_id, vec)
+        self.assignment[user_id] = target
+
+    def remove(self, user_id):
+        current = self.assignment.pop(user_id, None)
+        if current is not None:
+            self.lists[current].remove(user_id)
+
+    def vectors(self):
+        parts = [posting.vectors() for posting in self.lists if len(posting)]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.concatenate([p[0] for p in parts]), np.vstack([p[1] for p in parts])
+
+    def train(self, seed=0):
+        """Run spherical k-means over the stored vectors and re-bucket them."""
+        ids, vectors = self.vectors()
+        if len(ids) == 0:
+            return
+        nlist = min(self.nlist, len(ids))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(ids), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            norms = np.linalg.norm(sums, axis=1)
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+        self._rebucket(ids, vectors, centroids)
+
+    def _rebucket(self, ids, vectors, centroids):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        labels = np.argmax(vectors @ self.centroids.T, axis=1) if len(ids) else np.empty(0, dtype=np.int64)
+        self.lists = [
+            FlatBackend.from_arrays({"ids": ids[labels == c], "vectors": vectors[labels == c]})
+            for c in range(len(self.centroids))
+        ]
+        self.assignment = {int(user_id): int(label) for user_id, label in zip(ids, labels)}
+
+    def search(self, query, k, nprobe=None):
+        if not self.trained:
+            return self.lists[0].search(query, k)
+        probes = top_k(self.centroids @ query, nprobe or self.nprobe)
+        hits = []
+        for c in probes:
+            hits.extend(self.lists[c].search(query, k))
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
+
+    def to_arrays(self):
+        ids, vectors = self.vectors()
+        arrays = {"ids": ids, "vectors": vectors}
+        if self.trained:
+            arrays["centroids"] = self.centroids
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, **options):
+        backend = cls(**options)
+        if "centroids" in arrays:
+            backend._rebucket(arrays["ids"], arrays["vectors"], arrays["centroids"])
+        else:
+            for user_id, vec in zip(arrays["ids"], arrays["vectors"]):
+                backend.add(int(user_id), vec)
+        return backend
+
+
+BACKENDS = {
+    "flat": FlatBackend,
+    "ivf": IVFBackend,
+}
+
+
+# --------------------------
+# Face embedding index
+# --------------------------
+class FaceIndex:
+    """Process-wide face index used by customer and staff face login.
+
+    The storage backend is picked from ``FACE_INDEX_BACKEND`` ("flat" or
+    "ivf"). The index starts from the snapshot at ``FACE_INDEX_PATH`` if
+    one exists, then only fetches users with an id above the last one
+    seen, which also picks up users registered by other workers, and
+    users whose ``face_updated_at`` is past the newest change seen, which
+    picks up encodings re-registered, re-encoded or cleared elsewhere.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.backend_name = "flat"
+        self.options = {}
+        self.path = None
+        self.backend = FlatBackend()
+        self._last_id = 0
+        self._changed_at = None
+        self._loaded = False
+
+    def init_app(self, app):
+        app.config.setdefault("FACE_INDEX_BACKEND", "flat")
+        app.config.setdefault("FACE_INDEX_PATH", os.path.join(app.root_path, "face_index.npz"))
+        app.config.setdefault("FACE_INDEX_NLIST", 256)
+        app.config.setdefault("FACE_INDEX_NPROBE", 8)
+        self.configure(
+            app.config["FACE_INDEX_BACKEND"],
+            path=app.config["FACE_INDEX_PATH"],
+            nlist=app.config["FACE_INDEX_NLIST"],
+            nprobe=app.config["FACE_INDEX_NPROBE"],
+        )
+
+    def configure(self, backend="flat", path=None, **options):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown face index backend '{backend}'")
+        with self._lock:
+            self.backend_name = backend
+            self.options = options if backend == "ivf" else {}
+            self.path = path
+            self.clear()
+
+    def __len__(self):
+        return len(self.backend)
+
+    def clear(self):
+        with self._lock:
+            self.backend = BACKENDS[self.backend_name](**self.options)
+            self._last_id = 0
+            self._changed_at = None
+            self._loaded = False
+
+    def upsert(self, user_id, vector):
+        """Add or replace the encoding stored for ``user_id``."""
+        vec = normalize(face_codec.project(vector))
+        with self._lock:
+            if vec is None or (self.backend.dim is not None and vec.shape[0] != self.backend.dim):
+                self.backend.remove(user_id)
+            else:
+                self.backend.add(user_id, vec)
+
+    def remove(self, user_id):
+        with self._lock:
+            self.backend.remove(user_id)
+
+    # --- Persistence ---
+    def save(self, path=None):
+        """Write the index to an uncompressed .npz snapshot."""
+        path = path or self.path
+        with self._lock:
+            arrays = self.backend.to_arrays()
+            np.savez(path, format_version=INDEX_FORMAT_VERSION, backend=self.backend_name,
+                     projection=face_codec.projection_id, pipeline=face_codec.pipeline, last_id=self._last_id,
+                     changed_at=(self._changed_at or EPOCH).isoformat(), **arrays)
+        return path
+
+    def load(self, path=None):
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != INDEX_FORMAT_VERSION or str(data["backend"]) != self.backend_name:
+                return False
+            # vectors in another PCA basis or from another image pipeline
+            # cannot be compared with queries
+            if int(data["projection"]) != face_codec.projection_id or int(data["pipeline"]) != face_codec.pipeline:
+                return False
+            arrays = {name: data[name] for name in data.files}
+        if arrays["vectors"].shape[0] and arrays["vectors"].shape[1] != face_codec.dim:
+            return False
+        with self._lock:
+            self.backend = BACKENDS[self.backend_name].from_arrays(arrays, **self.options)
+            self._last_id = int(arrays["last_id"])
+            self._changed_at = datetime.fromisoformat(str(arrays["changed_at"]))
+        return True
+
+    def rebuild(self):
+        """Reload every stored encoding from the database and retrain."""
+        with self._lock:
+            self.clear()
+            self._loaded = True
+            self.refresh()
+            if isinstance(self.backend, IVFBackend):
+                self.backend.train()
+
+    # --- Queries ---
+    def refresh(self):
+        """Load encodings added or changed since the last refresh."""
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                self.load()
+            unreadable = 0
+            if self._changed_at is None:
+                # Built from scratch: the id scan below reads everything
+                # stored so far, so only later changes are needed.
+                self._changed_at = User.last_face_change() or EPOCH
+            else:
+                for user_id, blob, changed_at in User.face_encoding_changes(self._changed_at - CHANGE_OVERLAP):
+                    if user_id <= self._last_id:  # newer users come in through the id scan
+                        unreadable += not self._apply(user_id, blob)
+                    self._changed_at = max(self._changed_at, changed_at)
+            for user_id, blob in User.face_encoding_rows(after_id=self._last_id):
+                unreadable += not self._apply(user_id, blob)
+                self._last_id = max(self._last_id, user_id)
+        if unreadable:
+            current_app.logger.warning(
+                "%d stored face encodings cannot be compared with this projection or image pipeline and "
+                "were left out of the face index; run `flask faces verify` and `flask faces reencode`.",
+                unreadable)
+
+    def _apply(self, user_id, blob):
+        """Index or drop one stored blob; False if it is stored but unreadable."""
+        try:
+            vector = face_codec.decode(blob) if blob is not None else None
+        except ValueError:
+            self.remove(user_id)
+            return False
+        if vector is None:
+            self.remove(user_id)
+        else:
+            self.upsert(user_id, vector)
+        return True
+
+    def search(self, vector, k=1):
+        """Return up to ``k`` (user_id, similarity) pairs, best first."""
+        self.refresh()
+        query = normalize(face_codec.project(vector))
+        with self._lock:
+            if query is None or len(self.backend) == 0 or query.shape[0] != self.backend.dim:
+                return []
+            return self.backend.search(query, k)
+
+    def best_match(self, vector, threshold, k=5, staff_only=False):
+        """Return the best matching User above ``threshold``.
+
+        Candidates whose user row has gone away are dropped from the
+        index and the next best one is tried. If all ``k`` candidates
+        are above the threshold but none qualifies (with ``staff_only``,
+        a crowd of look-alike customers), the search is widened to twice
+        as many until one does or the candidates fall below it.
+        """
+        seen = set()
+        while True:
+            candidates = self.search(vector, k=k)
+            for user_id, score in candidates:
+                if score <= threshold:
+                    return None
+                if user_id in seen:
+                    continue
+                seen.add(user_id)
+                user = db.session.get(User, user_id)
+                if user is None:
+                    self.remove(user_id)
+                    continue
+                if staff_only and not user.is_staff:
+                    continue
+                return user
+            if len(candidates) < k:
+                return None
+            k *= 2
+
+    def verify(self, user, vector, threshold):
+        """1:1 check of ``vector`` against ``user``'s stored encoding.
+
+        Reads the one blob from the database instead of searching the
+        index, so the cost does not grow with the number of users.
+        """
+        if user is None or user.face_encoding is None:
+            return False
+        try:
+            stored = face_codec.decode(user.face_encoding)
+        except ValueError:
+            return False
+        if stored is None:
+            return False
+        query = normalize(face_codec.project(vector))
+        target = normalize(stored)
+        if query is None or target is None or query.shape != target.shape:
+            return False
+        return float(target @ query) > threshold
+
+
+face_index = FaceIndex()
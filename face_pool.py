@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+# --------------------------
+# Errors
+# --------------------------
+class FacePoolUnavailable(Exception):
+    """The image could not be processed in time; answer 503."""
+
+
+class FacePoolBusy(FacePoolUnavailable):
+    pass
+
+
+class FacePoolTimeout(FacePoolUnavailable):
+    pass
+
+
+# --------------------------
+# Bounded face-processing pool
+# --------------------------
+class FacePool:
+    """Small thread pool for decoding and encoding face images.
+
+    Image decoding, colour conversion and resizing run in OpenCV / PIL /
+    NumPy code that releases the GIL, so a few threads per worker process
+    take the CPU work off the request threads. At most ``workers +
+    queue_size`` images are accepted at once; beyond that ``run`` fails
+    immediately with FacePoolBusy instead of queueing, and a caller that
+    waits longer than ``timeout`` gets FacePoolTimeout. Queue depth and
+    wait/service times are exposed through ``stats`` for /staff/metrics.
+    """
+
+    def __init__(self, workers=2, queue_size=8, timeout=5.0):
+        self._lock = threading.Lock()
+        self._executor = None
+        self.configure(workers, queue_size, timeout)
+
+    def init_app(self, app):
+        app.config.setdefault("FACE_POOL_WORKERS", 2)
+        app.config.setdefault("FACE_POOL_QUEUE", 8)
+        app.config.setdefault("FACE_POOL_TIMEOUT", 5.0)
+        self.configure(app.config["FACE_POOL_WORKERS"], app.config["FACE_POOL_QUEUE"],
+                       app.config["FACE_POOL_TIMEOUT"])
+
+    def configure(self, workers, queue_size, timeout):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self.workers = workers
+            self.queue_size = queue_size
+            self.timeout = timeout
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="face-pool")
+            self._slots = threading.BoundedSemaphore(workers + queue_size)
+            self.submitted = self.completed = self.errors = self.rejected = self.timeouts = 0
+            self._in_flight = self._running = 0
+            self._wait_times = deque(maxlen=512)
+            self._service_times = deque(maxlen=512)
+
+    @property
+    def retry_after(self):
+        """Seconds for a Retry-After header on a 503."""
+        return max(1, round(self.timeout))
+
+    # --- Execution ---
+    def run(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the pool and return its result."""
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise FacePoolBusy("Face processing is at capacity")
+        with self._lock:
+            self.submitted += 1
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(self._call, fn, args, time.perf_counter())
+        except RuntimeError:
+            self._finished(slots)
+            raise FacePoolBusy("Face processing pool is shut down") from None
+        future.add_done_callback(lambda _: self._finished(slots))
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            future.cancel()  # drops it if it has not started yet
+            with self._lock:
+                self.timeouts += 1
+            raise FacePoolTimeout("Face processing timed out") from None
+
+    def _call(self, fn, args, queued_at):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_times.append(started - queued_at)
+        try:
+            return fn(*args)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self._service_times.append(time.perf_counter() - started)
+
+    def _finished(self, slots):
+        slots.release()
+        with self._lock:
+            self._in_flight -= 1
+
+    # --- Metrics ---
+    @staticmethod
+    def _ms(samples, q):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+    def stats(self):
+        with self._lock:
+            wait, service = list(self._wait_times), list(self._service_times)
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_size,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "wait_ms_p50": self._ms(wait, 0.5),
+                "wait_ms_p95": self._ms(wait, 0.95),
+                "service_ms_p50": self._ms(service, 0.5),
+                "service_ms_p95": self._ms(service, 0.95),
+            }
+
+
+face_pool = FacePool()
@@ -0,0 +1,126 @@
+import threading
+from flask import current_app
+
+from .face_pool import face_pool
+
+FACE_MATCH_THRESHOLD = 0.6  # default for the FACE_MATCH_THRESHOLD config key
+
+_lock = threading.Lock()
+
+
+class NoFaceFound(ValueError):
+    pass
+
+
+# --------------------------
+# Lazy loading
+# --------------------------
+# NumPy, OpenCV and PIL take most of a worker's import time and memory,
+# and only face login and registration need them. Routes call into this
+# module, which imports and configures face_codec, face_detect,
+# face_index and face_images on first use (once per app). Set
+# FACE_PRELOAD to pay that at startup instead, e.g. with gunicorn
+# --preload so forked workers share the pages.
+def init_app(app):
+    app.config.setdefault("FACE_PRELOAD", False)
+    # Cosine similarity a face must exceed to match. Tuned per pipeline:
+    # check it with bench_face_detect on a labeled set after changing
+    # FACE_DETECTION. It is set for raw encodings; with a PCA projection
+    # face_codec.threshold maps it (see bench_face_threshold).
+    app.config.setdefault("FACE_MATCH_THRESHOLD", FACE_MATCH_THRESHOLD)
+    app.extensions["face_service"] = False
+    if app.config["FACE_PRELOAD"]:
+        load(app)
+
+
+def load(app=None):
+    """Import and configure the face modules for ``app`` (default: current_app)."""
+    app = app or current_app._get_current_object()
+    if app.extensions.get("face_service"):
+        return
+    with _lock:
+        if app.extensions.get("face_service"):
+            return
+        from .face_codec import face_codec, PIPELINE_FACE_CROP, PIPELINE_FULL_FRAME
+        from .face_detect import face_detector
+        from .face_index import face_index
+        from . import face_images  # noqa: F401
+        face_codec.init_app(app)
+        face_detector.init_app(app)
+        face_codec.pipeline = PIPELINE_FACE_CROP if face_detector.enabled else PIPELINE_FULL_FRAME
+        face_index.init_app(app)
+        app.extensions["face_service"] = True
+
+
+def loaded(app=None):
+    return bool((app or current_app).extensions.get("face_service"))
+
+
+# --------------------------
+# Encoding (runs on face_pool)
+# --------------------------
+def encode_data_url(data_url):
+    """Encoding of a base64 data URL. Raises FacePoolUnavailable, NoFaceFound, ValueError."""
+    load()
+    from .face_images import encode_face_data_url
+    return face_pool.run(encode_face_data_url, data_url)
+
+
+def encode_bytes(buffer):
+    """Encoding of raw JPEG/PNG bytes. Raises FacePoolUnavailable, NoFaceFound, ValueError."""
+    load()
+    from .face_images import encode_face_bytes
+    return face_pool.run(encode_face_bytes, buffer)
+
+
+def encode_base64(data_url):
+    """Encoding of a data URL decoded with OpenCV (the staff login path)."""
+    load()
+    from .face_images import encode_base64_image
+    return face_pool.run(encode_base64_image, data_url)
+
+
+# --------------------------
+# Storage and matching
+# --------------------------
+def serialize(encoding):
+    """Blob for User.face_encoding."""
+    load()
+    from .face_codec import face_codec
+    return face_codec.encode(encoding)
+
+
+def index(user_id, encoding):
+    load()
+    from .face_index import face_index
+    face_index.upsert(user_id, encoding)
+
+
+def forget(user_id):
+    if not loaded():
+        return  # nothing in memory yet; best_match drops deleted users
+    from .face_index import face_index
+    face_index.remove(user_id)
+
+
+def match(encoding, identity=None, staff_only=False, claimed=None):
+    """User matching ``encoding``, or None.
+
+    With a claimed identity only that user's encoding is compared (1:1);
+    without one the whole index is searched (1:N), unless
+    FACE_LOGIN_REQUIRE_IDENTITY is set. ``claimed`` is the User the
+    identity names, if the caller has already looked it up.
+    """
+    load()
+    from .face_codec import face_codec
+    from .face_index import face_index
+    from .models import User
+    threshold = face_codec.threshold(current_app.config["FACE_MATCH_THRESHOLD"])
+    if identity:
+        user = claimed or User.find_by_identity(identity)
+        if user is None or (staff_only and not user.is_staff):
+            return None
+        return user if face_index.verify(user, encoding, threshold) else None
+    if current_app.config.get("FACE_LOGIN_REQUIRE_IDENTITY"):
+        return None
+    return face_index.best_match(encoding, threshold, staff_only=staff_only)
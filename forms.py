@@ -88,4 +88,5 @@ class SetGoalForm(FlaskForm):
         default="NONE",
         validators=[DataRequired()]
     )
+    periodAmount = FloatField("Amount per Period", validators=[Optional(), NumberRange(min=0)])
     submit = SubmitField("Save Goal")
@@ -0,0 +1,265 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import timezone
+
+from flask import has_app_context
+from sqlalchemy import func, select
+
+from . import db
+from .cache import TTLCache
+
+WINDOWS = (60, 3600)  # seconds: transfers per minute and per hour
+MIN_HISTORY = 5       # transfers before the amount z-score counts
+
+WEIGHTS = {
+    "velocity": 0.30,           # share of the per-window limit used
+    "amount": 0.45,             # z-score of the amount, 2 -> 0, 6+ -> 1
+    "new_beneficiary": 0.20,    # never paid this account before
+    "recipient_reports": 0.45,  # spam reports against the recipient, 3+ -> 1
+}
+
+
+@dataclass
+class Assessment:
+    score: float = 0.0
+    reasons: list = field(default_factory=list)
+    flagged: bool = False
+    blocked: bool = False
+
+    @property
+    def status(self):
+        return "Blocked" if self.blocked else "Flagged" if self.flagged else "Success"
+
+
+def _epoch(timestamp):
+    """Seconds since the epoch for a naive UTC datetime (Transaction.timestamp)."""
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _paise(amount):
+    return float(getattr(amount, "paise", amount))
+
+
+# --------------------------
+# Rolling features
+# --------------------------
+class AccountFeatures:
+    """Rolling transfer features for one sender, each updated in O(1).
+
+    Velocity keeps one deque of timestamps per window, trimmed from the
+    left as entries age out (amortised O(1)). Amount mean and variance
+    are Welford running sums. Beneficiaries are the account numbers this
+    sender has paid, capped so a scripted account cannot grow it forever.
+    """
+
+    __slots__ = ("windows", "count", "mean", "m2", "beneficiaries")
+
+    MAX_BENEFICIARIES = 1000
+
+    def __init__(self):
+        self.windows = tuple(deque() for _ in WINDOWS)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.beneficiaries = set()
+
+    def velocity(self, now):
+        """Transfers inside each window, trimming expired timestamps."""
+        counts = []
+        for seconds, stamps in zip(WINDOWS, self.windows):
+            while stamps and stamps[0] <= now - seconds:
+                stamps.popleft()
+            counts.append(len(stamps))
+        return counts
+
+    def zscore(self, amount):
+        if self.count < MIN_HISTORY:
+            return 0.0
+        std = math.sqrt(self.m2 / (self.count - 1))
+        # A sender who always pays the same amount has std 0; measure
+        # against a tenth of the mean (at least one rupee) instead.
+        return (amount - self.mean) / max(std, 0.1 * abs(self.mean), 100.0)
+
+    def observe(self, now, amount, beneficiary, blocked=False):
+        for stamps in self.windows:
+            stamps.append(now)
+        if blocked:
+            return  # attempts count towards velocity, not towards "normal"
+        self.count += 1
+        delta = amount - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (amount - self.mean)
+        if beneficiary and len(self.beneficiaries) < self.MAX_BENEFICIARIES:
+            self.beneficiaries.add(beneficiary)
+
+
+# --------------------------
+# Scorer
+# --------------------------
+class FraudScorer:
+    """Scores each transfer before ledger.transfer commits it.
+
+    Features are kept per sending customer (one account each) in a
+    bounded LRU, warmed on first sight from their last FRAUD_HISTORY
+    transfers; spam report counts per recipient come from a TTL cache.
+    The score is a weighted sum of the features in WEIGHTS, capped at 1.
+    At FRAUD_FLAG_SCORE both legs are recorded with ``is_fraud`` and
+    status "Flagged" for staff review; at FRAUD_BLOCK_SCORE no money
+    moves and a "Blocked" attempt is recorded instead.
+
+    State is per process, like the other in-memory caches: each gunicorn
+    worker learns from the transfers it sees plus the warm-up read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._accounts = OrderedDict()
+        self.enabled = True
+        self.warm_start = True
+        self.history = 200
+        self.max_accounts = 100_000
+        self.flag_score = 0.5
+        self.block_score = 0.85
+        self.limits = (5, 30)  # transfers per window in WINDOWS
+        self.reports = TTLCache(maxsize=100_000, ttl=300)
+        self.scored = 0
+        self.outcomes = Counter()
+        self.reasons = Counter()
+
+    def init_app(self, app):
+        app.config.setdefault("FRAUD_SCORING", True)
+        app.config.setdefault("FRAUD_FLAG_SCORE", 0.5)
+        app.config.setdefault("FRAUD_BLOCK_SCORE", 0.85)
+        app.config.setdefault("FRAUD_VELOCITY_LIMITS", (5, 30))
+        app.config.setdefault("FRAUD_HISTORY", 200)
+        app.config.setdefault("FRAUD_MAX_ACCOUNTS", 100_000)
+        app.config.setdefault("FRAUD_REPORTS_TTL", 300)
+        self.configure(
+            enabled=app.config["FRAUD_SCORING"],
+            flag_score=app.config["FRAUD_FLAG_SCORE"],
+            block_score=app.config["FRAUD_BLOCK_SCORE"],
+            limits=tuple(app.config["FRAUD_VELOCITY_LIMITS"]),
+            history=app.config["FRAUD_HISTORY"],
+            max_accounts=app.config["FRAUD_MAX_ACCOUNTS"],
+            reports_ttl=app.config["FRAUD_REPORTS_TTL"],
+        )
+
+    def configure(self, enabled=True, flag_score=0.5, block_score=0.85, limits=(5, 30),
+                  history=200, max_accounts=100_000, reports_ttl=300, warm_start=True):
+        with self._lock:
+            self.enabled = enabled
+            self.flag_score = flag_score
+            self.block_score = block_score
+            self.limits = limits
+            self.history = history
+            self.max_accounts = max_accounts
+            self.warm_start = warm_start
+            self._accounts.clear()
+        self.reports.configure(maxsize=max_accounts, ttl=reports_ttl)
+
+    # --- State ---
+    def _load(self, user_id):
+        """Features rebuilt from the customer's latest transfers."""
+        features = AccountFeatures()
+        if not (self.warm_start and has_app_context()):
+            return features
+        from .models import Transaction
+        rows = db.session.execute(
+            select(Transaction.timestamp, Transaction.amount, Transaction.recipient_account, Transaction.status)
+            .where(Transaction.user_id == user_id, Transaction.type == "Transfer")
+            .order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+            .limit(self.history)
+        ).all()
+        for timestamp, amount, beneficiary, status in reversed(rows):
+            features.observe(_epoch(timestamp), _paise(amount), beneficiary, blocked=status == "Blocked")
+        return features
+
+    def _features(self, user_id):
+        with self._lock:
+            features = self._accounts.get(user_id)
+            if features is not None:
+                self._accounts.move_to_end(user_id)
+                return features
+        features = self._load(user_id)
+        with self._lock:
+            features = self._accounts.setdefault(user_id, features)
+            while len(self._accounts) > self.max_accounts:
+                self._accounts.popitem(last=False)
+        return features
+
+    def recipient_reports(self, user_id):
+        """Spam reports filed against ``user_id`` (cached for FRAUD_REPORTS_TTL)."""
+        count = self.reports.get(user_id)
+        if count is None:
+            count = 0
+            if has_app_context():
+                from .models import SpamReport
+                count = db.session.execute(
+                    select(func.count()).where(SpamReport.reported_user_id == user_id)
+                ).scalar()
+            self.reports.set(user_id, count)
+        return count
+
+    def reported(self, user_id):
+        """A new spam report against ``user_id``; counts at once in this worker."""
+        count = self.reports.get(user_id)
+        if count is not None:
+            self.reports.set(user_id, count + 1)
+
+    # --- Scoring ---
+    def assess(self, user_id, beneficiary, recipient_user_id, amount, now=None):
+        """Score a transfer of ``amount`` from ``user_id`` to account ``beneficiary``."""
+        if not self.enabled:
+            return Assessment()
+        now = time.time() if now is None else now
+        amount = _paise(amount)
+        features = self._features(user_id)
+        reports = self.recipient_reports(recipient_user_id) if recipient_user_id else 0
+        with self._lock:
+            counts = features.velocity(now)
+            values = {
+                "velocity": min(1.0, max((count + 1) / limit for count, limit in zip(counts, self.limits))),
+                "amount": min(1.0, max(0.0, (features.zscore(amount) - 2) / 4)),
+                "new_beneficiary": float(beneficiary not in features.beneficiaries),
+                "recipient_reports": min(1.0, reports / 3),
+            }
+        score = min(1.0, sum(WEIGHTS[name] * value for name, value in values.items()))
+        reasons = [name for name, value in values.items() if value >= 1.0]
+        assessment = Assessment(score=score, reasons=reasons,
+                                flagged=score >= self.flag_score, blocked=score >= self.block_score)
+        with self._lock:
+            self.scored += 1
+            self.outcomes[assessment.status] += 1
+            if assessment.flagged:
+                self.reasons.update(reasons)
+        return assessment
+
+    def observe(self, user_id, beneficiary, amount, blocked=False, now=None):
+        """Fold a recorded transfer (or blocked attempt) into the sender's features."""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        features = self._features(user_id)
+        with self._lock:
+            features.observe(now, _paise(amount), beneficiary, blocked=blocked)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._accounts.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "accounts": len(self._accounts),
+                "scored": self.scored,
+                "outcomes": dict(self.outcomes),
+                "flag_reasons": dict(self.reasons),
+                "recipient_reports": self.reports.stats(),
+            }
+
+
+fraud_scorer = FraudScorer()
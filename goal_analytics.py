@@ -0,0 +1,200 @@
+from calendar import month_abbr
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from sqlalchemy import case, func, select
+
+from . import db
+from .cache import TTLCache
+from .models import SavingMode, Transaction
+from .money import Money
+from .smart_saver import period_amount
+
+# Per-user analytics, dropped by ledger on every goal deposit/withdrawal.
+# Entries also carry a fingerprint of the goals they were computed from,
+# so changes made elsewhere (the Smart Saver worker, another gunicorn
+# worker) are picked up on the next read instead of after the TTL.
+analytics_cache = TTLCache(maxsize=1024, ttl=300)
+
+GOAL_TYPES = ("Smart Saver Deposit", "Smart Saver Withdrawal")
+# ledger.deposit_to_goal / withdraw_from_goal and smart_saver write these;
+# Transaction has no goal_id, so history is matched on the goal's name.
+DESCRIPTIONS = ("Deposited to goal '{}'", "Auto-saved to goal '{}'", "Withdrawn from goal '{}'")
+
+# Projections further out than this are reported as "not saving".
+HORIZON_DAYS = 100 * 365
+
+PERIOD_DAYS = {
+    SavingMode.DAILY: 1.0,
+    SavingMode.WEEKLY: 7.0,
+    SavingMode.MONTHLY: 365.25 / 12,
+    SavingMode.YEARLY: 365.25,
+}
+
+
+@dataclass
+class GoalStats:
+    days_left: int
+    remaining: Money
+    required: dict                  # SavingMode -> Money per period to finish on time
+    projected: date = None          # at the current saving rate; None if not saving
+    on_track: bool = False
+    chart_labels: list = field(default_factory=list)
+    chart_data: list = field(default_factory=list)   # cumulative rupees per month
+    actual_months: int = 0          # leading chart points that are history, not projection
+
+
+# --------------------------
+# Queries
+# --------------------------
+def _month(column):
+    """'YYYY-MM' of a timestamp, in the dialect in use."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def monthly_history(user_id):
+    """{(description, 'YYYY-MM'): net paise} of a user's Smart Saver movements.
+
+    One grouped aggregate over the (user_id, timestamp, id) index.
+    """
+    month = _month(Transaction.timestamp)
+    signed = case((Transaction.type == "Smart Saver Withdrawal", -Transaction.amount), else_=Transaction.amount)
+    rows = db.session.execute(
+        select(Transaction.description, month, func.sum(signed))
+        .where(Transaction.user_id == user_id, Transaction.type.in_(GOAL_TYPES), Transaction.status == "Success")
+        .group_by(Transaction.description, month)
+    ).all()
+    return {(description, period): (total or Money(0)).paise for description, period, total in rows}
+
+
+# --------------------------
+# Projections
+# --------------------------
+def fingerprint(goals, today):
+    return (today,) + tuple(
+        (g.id, g.name, (g.smart_saver_balance or Money(0)).paise, (g.target_amount or Money(0)).paise,
+         g.deadline, g.saving_mode, period_amount(g).paise, g.created_at)
+        for g in goals
+    )
+
+
+def compute(goals, history, today):
+    """GoalStats for every goal, computed together with NumPy.
+
+    Scalars (days left, remaining, required per mode, saving rate,
+    projected date) are one array operation across all goals. The chart
+    is a goals x months matrix on a shared month axis: history is
+    scattered into it with ``np.add.at`` and summed cumulatively, the
+    months after this one are filled from the saving rate, and each goal
+    then takes its slice from its first month to its deadline.
+    """
+    import numpy as np
+
+    if not goals:
+        return {}
+    n = len(goals)
+    day = np.datetime64(today, "D")
+    this_month = day.astype("datetime64[M]")
+
+    deadline = np.array([g.deadline for g in goals], dtype="datetime64[D]")
+    created = np.array([(g.created_at or datetime.combine(today, datetime.min.time())).date() for g in goals],
+                       dtype="datetime64[D]")
+    saved = np.array([(g.smart_saver_balance or Money(0)).paise for g in goals], dtype=np.int64)
+    target = np.array([(g.target_amount or Money(0)).paise for g in goals], dtype=np.int64)
+    per_period = np.array([period_amount(g).paise for g in goals], dtype=np.float64)
+    period_days = np.array([PERIOD_DAYS.get(g.saving_mode, np.inf) for g in goals])
+
+    days_left = (deadline - day).astype(np.int64)
+    remaining = np.maximum(target - saved, 0)
+    span = np.maximum(days_left, 1)
+    months_left = np.maximum((deadline.astype("datetime64[M]") - this_month).astype(np.int64), 1)
+    periods = {
+        SavingMode.DAILY: span,
+        SavingMode.WEEKLY: np.ceil(span / 7),
+        SavingMode.MONTHLY: months_left,
+        SavingMode.YEARLY: np.ceil(months_left / 12),
+    }
+    required = {mode: np.ceil(remaining / count).astype(np.int64) for mode, count in periods.items()}
+
+    # Saving rate (paise per day): the scheduled amount, or what has been
+    # saved per day since the goal was created if that is higher.
+    age = np.maximum((day - created).astype(np.int64), 1)
+    rate = np.maximum(per_period / period_days, saved / age)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        to_go = np.where(rate > 0, np.ceil(remaining / rate), np.inf)
+    projected_ok = to_go <= HORIZON_DAYS
+    projected = day + np.where(projected_ok, to_go, 0).astype(np.int64).astype("timedelta64[D]")
+
+    # Month axis shared by every goal: earliest history/creation month to latest deadline.
+    periods_seen = {period: np.datetime64(period, "M") for period in {period for _, period in history}}
+    first = min([created.min().astype("datetime64[M]")] + list(periods_seen.values()))
+    last = max(deadline.max().astype("datetime64[M]"), this_month)
+    axis = np.arange(first, last + 1, dtype="datetime64[M]")
+    now_index = int((this_month - first).astype(np.int64))
+
+    flows = np.zeros((n, len(axis)), dtype=np.int64)
+    if history:
+        owner = {}
+        for i, goal in enumerate(goals):
+            for pattern in DESCRIPTIONS:
+                owner.setdefault(pattern.format(goal.name), []).append(i)
+        column = {period: int((month - first).astype(np.int64)) for period, month in periods_seen.items()}
+        entries = [(i, column[period], total) for (description, period), total in history.items()
+                   for i in owner.get(description, ())]
+        if entries:
+            rows, cols, amounts = np.array(entries, dtype=np.int64).T
+            np.add.at(flows, (rows, cols), amounts)
+    # Savings that never went through a transaction (the opening amount of
+    # set_goal) sit at the start so the curve ends at today's balance.
+    opening = saved - flows[:, :now_index + 1].sum(axis=1)
+    actual = np.cumsum(flows, axis=1) + opening[:, None]
+
+    # Future months: today's balance plus the rate up to each month's end.
+    month_end = (axis + 1).astype("datetime64[D]") - np.timedelta64(1, "D")
+    ahead = np.maximum((month_end - day).astype(np.int64), 0)
+    future = np.minimum(saved[:, None] + rate[:, None] * ahead[None, :], np.maximum(target, saved)[:, None])
+    series = np.round(np.where(np.arange(len(axis))[None, :] <= now_index, actual, future) / 100, 2)
+
+    names = np.array(month_abbr[1:])
+    labels = names[(axis.astype(np.int64) % 12)]
+    # Each goal's chart starts at its creation or first movement, whichever is earlier.
+    moved = flows[:, :now_index + 1] != 0
+    first_flow = np.where(moved.any(axis=1), moved.argmax(axis=1), now_index)
+    start = np.minimum((created.astype("datetime64[M]") - first).astype(np.int64), first_flow)
+    stop = (deadline.astype("datetime64[M]") - first).astype(np.int64)
+
+    stats = {}
+    for i, goal in enumerate(goals):
+        lo, hi = int(start[i]), max(int(stop[i]), now_index)
+        stats[goal.id] = GoalStats(
+            days_left=int(days_left[i]),
+            remaining=Money(int(remaining[i])),
+            required={mode: Money(int(values[i])) for mode, values in required.items()},
+            projected=projected[i].astype(object) if projected_ok[i] and remaining[i] else None,
+            on_track=bool(remaining[i] == 0 or (projected_ok[i] and projected[i] <= deadline[i])),
+            chart_labels=labels[lo:hi + 1].tolist(),
+            chart_data=series[i, lo:hi + 1].tolist(),
+            actual_months=now_index - lo + 1,
+        )
+    return stats
+
+
+# --------------------------
+# Cached entry point
+# --------------------------
+def for_user(user_id, goals, today=None):
+    """{goal_id: GoalStats} for ``goals`` (all of one user's goals, or a subset)."""
+    today = today or datetime.utcnow().date()
+    key = fingerprint(goals, today)
+    entry = analytics_cache.get(user_id)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    stats = compute(goals, monthly_history(user_id), today)
+    analytics_cache.set(user_id, (key, stats))
+    return stats
+
+
+def invalidate(user_id):
+    analytics_cache.invalidate(user_id)
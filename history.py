@@ -0,0 +1,187 @@
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, tuple_
+
+from . import db
+from .models import Transaction
+
+PAGE_SIZE = 25
+EXPORT_BATCH_SIZE = 2000
+
+CREDIT_TYPES = ("Deposit", "Received", "Smart Saver Withdrawal")
+DEBIT_TYPES = ("Withdraw", "Transfer", "Smart Saver Deposit")
+
+DATE_RANGES = {
+    "3days": timedelta(days=3),
+    "7days": timedelta(days=7),
+    "30days": timedelta(days=30),
+    "3months": timedelta(days=90),
+}
+
+
+# --------------------------
+# Cursors
+# --------------------------
+def encode_cursor(txn):
+    return f"{txn.timestamp:%Y%m%d%H%M%S%f}-{txn.id}"
+
+
+def decode_cursor(value):
+    """Return (timestamp, id) for a cursor, or None if it is malformed."""
+    try:
+        stamp, txn_id = value.split("-", 1)
+        return datetime.strptime(stamp, "%Y%m%d%H%M%S%f"), int(txn_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def range_start(name, now=None):
+    """Start of a named date range ("7days", "thisyear", ...), or None."""
+    now = now or datetime.utcnow()
+    if name == "thisyear":
+        return datetime(now.year, 1, 1)
+    if name in DATE_RANGES:
+        return now - DATE_RANGES[name]
+    return None
+
+
+# --------------------------
+# Filters
+# --------------------------
+def _filtered(stmt, user_id, types=None, since=None, until=None, search=None):
+    # Pages are keyed on (timestamp, id): a row without a timestamp has no
+    # place in that order and cannot be made into a cursor.
+    stmt = stmt.where(Transaction.user_id == user_id, Transaction.timestamp.isnot(None))
+    if types:
+        stmt = stmt.where(Transaction.type.in_(types))
+    if since:
+        stmt = stmt.where(Transaction.timestamp >= since)
+    if until:
+        stmt = stmt.where(Transaction.timestamp < until)
+    if search:
+        pattern = f"%{search}%"
+        stmt = stmt.where(
+            Transaction.description.ilike(pattern)
+            | Transaction.beneficiary_name.ilike(pattern)
+            | Transaction.recipient_account.ilike(pattern)
+        )
+    return stmt
+
+
+# --------------------------
+# Keyset pagination
+# --------------------------
+@dataclass
+class TransactionPage:
+    items: list = field(default_factory=list)
+    next_cursor: str = None  # older rows
+    prev_cursor: str = None  # newer rows
+
+
+def transaction_page(user_id, after=None, before=None, per_page=PAGE_SIZE,
+                     types=None, since=None, until=None, search=None):
+    """One page of a user's history, newest first.
+
+    Rows are ordered by (timestamp, id) and the page boundary is carried
+    in a cursor rather than an OFFSET, so every page is a range read on
+    the (user_id, timestamp, id) index no matter how deep it is. Pass
+    ``after`` (a next_cursor) to go older and ``before`` (a prev_cursor)
+    to go newer.
+    """
+    key = tuple_(Transaction.timestamp, Transaction.id)
+    stmt = _filtered(select(Transaction), user_id, types, since, until, search)
+
+    after, before = decode_cursor(after), decode_cursor(before)
+    backwards = before is not None and after is None
+    if backwards:
+        stmt = stmt.where(key > before).order_by(Transaction.timestamp.asc(), Transaction.id.asc())
+    else:
+        if after is not None:
+            stmt = stmt.where(key < after)
+        stmt = stmt.order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+
+    rows = db.session.execute(stmt.limit(per_page + 1)).scalars().all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    page = TransactionPage(items=rows)
+    if rows:
+        if more or backwards:
+            page.next_cursor = encode_cursor(rows[-1])
+        if after is not None or (backwards and more):
+            page.prev_cursor = encode_cursor(rows[0])
+    return page
+
+
+# --------------------------
+# Statement export
+# --------------------------
+EXPORT_COLUMNS = (
+    ("Reference", Transaction.id),
+    ("Date", Transaction.timestamp),
+    ("Type", Transaction.type),
+    ("Description", Transaction.description),
+    ("Beneficiary", Transaction.beneficiary_name),
+    ("Account", Transaction.recipient_account),
+    ("Amount", Transaction.amount),
+    ("Status", Transaction.status),
+)
+
+
+def statement_batches(user_id, batch_size=None, types=None, since=None, until=None, search=None):
+    """Yield a user's transactions oldest first, ``batch_size`` rows at a time.
+
+    Each batch is a separate keyset read that ends its transaction before
+    the rows are handed on, so a slow download neither holds the whole
+    statement in memory nor keeps a SQLite read lock open.
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    key = tuple_(Transaction.timestamp, Transaction.id)
+    columns = [column for _, column in EXPORT_COLUMNS]
+    stmt = _filtered(select(*columns), user_id, types, since, until, search)
+    stmt = stmt.order_by(Transaction.timestamp.asc(), Transaction.id.asc()).limit(batch_size)
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(key > last)
+        rows = db.session.execute(page).all()
+        db.session.rollback()  # read-only; release the connection between batches
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last = (rows[-1].timestamp, rows[-1].id)
+
+
+# Spreadsheets run a cell starting with one of these as a formula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_cell(value):
+    """``value`` with a leading ' if a spreadsheet would read it as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def statement_csv(user_id, **filters):
+    """Generate a CSV statement as text chunks, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([label for label, _ in EXPORT_COLUMNS])
+    for rows in statement_batches(user_id, **filters):
+        for row in rows:
+            writer.writerow([
+                row.id, f"{row.timestamp:%Y-%m-%d %H:%M:%S}", csv_cell(row.type), csv_cell(row.description),
+                csv_cell(row.beneficiary_name), csv_cell(row.recipient_account), row.amount, csv_cell(row.status),
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,227 @@
+import time
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+from . import db, goal_analytics, summary
+from .fraud import fraud_scorer
+from .models import Account, FinancialGoal, Transaction
+
+MAX_RETRIES = 5
+RETRY_DELAY = 0.05  # seconds, doubled on every attempt
+
+
+# --------------------------
+# Errors
+# --------------------------
+class LedgerError(Exception):
+    """Base class for balance changes that were refused."""
+
+
+class InvalidAmount(LedgerError):
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+class AccountNotFound(LedgerError):
+    pass
+
+
+class SameAccount(LedgerError):
+    pass
+
+
+class TransferBlocked(LedgerError):
+    """The fraud score was too high; the attempt is recorded, no money moved."""
+
+    def __init__(self, message, assessment):
+        super().__init__(message)
+        self.assessment = assessment
+
+
+# --------------------------
+# Internals
+# --------------------------
+def _is_busy(error):
+    message = str(error.orig).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def _atomic(work):
+    """Run ``work`` and commit it as one transaction.
+
+    SQLite reports "database is locked" when another worker holds the
+    write lock past the driver timeout; those attempts are rolled back
+    and retried with exponential backoff.
+    """
+    delay = RETRY_DELAY
+    for attempt in range(MAX_RETRIES):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as error:
+            db.session.rollback()
+            if not _is_busy(error) or attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(delay)
+            delay *= 2
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def _check_amount(amount):
+    if amount is None or amount <= 0:
+        raise InvalidAmount("Amount must be greater than 0.")
+
+
+def _credit(account_id, amount):
+    db.session.execute(
+        update(Account)
+        .where(Account.id == account_id)
+        .values(balance=Account.balance + amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _debit(account_id, amount):
+    """Take ``amount`` off an account only if the balance covers it."""
+    result = db.session.execute(
+        update(Account)
+        .where(Account.id == account_id, Account.balance >= amount)
+        .values(balance=Account.balance - amount)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise InsufficientFunds("Insufficient funds.")
+
+
+def _record(user_id, txn_type, amount, **fields):
+    fields.setdefault("description", txn_type)
+    fields.setdefault("status", "Success")
+    db.session.add(Transaction(user_id=user_id, type=txn_type, amount=amount, **fields))
+
+
+# --------------------------
+# Balance changes
+# --------------------------
+def deposit(account, amount, description=None):
+    _check_amount(amount)
+    account_id, user_id = account.id, account.user_id
+
+    def work():
+        _credit(account_id, amount)
+        summary.adjust(user_id, balance=amount)
+        _record(user_id, "Deposit", amount, description=description or "Deposit")
+
+    _atomic(work)
+
+
+def withdraw(account, amount, description=None):
+    _check_amount(amount)
+    account_id, user_id = account.id, account.user_id
+
+    def work():
+        _debit(account_id, amount)
+        summary.adjust(user_id, balance=-amount)
+        _record(user_id, "Withdraw", amount, description=description or "Withdraw")
+
+    _atomic(work)
+
+
+def transfer(sender, recipient_account_number, amount, beneficiary_name=None, sender_name=None):
+    """Move money between accounts and record both legs.
+
+    The transfer is scored by fraud_scorer first. Returns the
+    Assessment; a flagged transfer goes through with both legs marked
+    ``is_fraud`` and status "Flagged". A blocked one raises
+    TransferBlocked after recording the attempt.
+    """
+    _check_amount(amount)
+    sender_id, sender_user_id, sender_number = sender.id, sender.user_id, sender.account_number
+    recipient = db.session.execute(
+        select(Account.id, Account.user_id).where(Account.account_number == recipient_account_number)
+    ).first()
+    if recipient is None:
+        raise AccountNotFound("Recipient not found.")
+    if recipient.id == sender_id:
+        raise SameAccount("Cannot transfer to your own account.")
+
+    assessment = fraud_scorer.assess(sender_user_id, recipient_account_number, recipient.user_id, amount)
+    flags = dict(is_fraud=assessment.flagged, status=assessment.status)
+
+    if assessment.blocked:
+        _atomic(lambda: _record(sender_user_id, "Transfer", amount, recipient_account=recipient_account_number,
+                                beneficiary_name=beneficiary_name, **flags))
+        fraud_scorer.observe(sender_user_id, recipient_account_number, amount, blocked=True)
+        raise TransferBlocked("Transfer held for review.", assessment)
+
+    def work():
+        _debit(sender_id, amount)
+        _credit(recipient.id, amount)
+        summary.adjust(sender_user_id, balance=-amount)
+        summary.adjust(recipient.user_id, balance=amount)
+        _record(sender_user_id, "Transfer", amount,
+                recipient_account=recipient_account_number, beneficiary_name=beneficiary_name, **flags)
+        _record(recipient.user_id, "Received", amount,
+                recipient_account=sender_number, beneficiary_name=sender_name, **flags)
+
+    _atomic(work)
+    fraud_scorer.observe(sender_user_id, recipient_account_number, amount)
+    return assessment
+
+
+def deposit_to_goal(account, goal, amount):
+    """Move money from the account into a goal's Smart Saver balance."""
+    _check_amount(amount)
+    account_id, user_id, goal_id, goal_name = account.id, account.user_id, goal.id, goal.name
+
+    def work():
+        _debit(account_id, amount)
+        db.session.execute(
+            update(FinancialGoal)
+            .where(FinancialGoal.id == goal_id)
+            .values(smart_saver_balance=FinancialGoal.smart_saver_balance + amount)
+            .execution_options(synchronize_session=False)
+        )
+        summary.adjust(user_id, balance=-amount, goal_savings=amount)
+        _record(user_id, "Smart Saver Deposit", amount, description=f"Deposited to goal '{goal_name}'")
+
+    _atomic(work)
+    goal_analytics.invalidate(user_id)
+
+
+def withdraw_from_goal(account, goal):
+    """Empty a goal's Smart Saver balance back into the account.
+
+    Returns the amount moved. The goal is only zeroed if its balance is
+    still the one that was read, so two concurrent withdrawals cannot
+    both pay out.
+    """
+    account_id, user_id, goal_id, goal_name = account.id, account.user_id, goal.id, goal.name
+
+    def work():
+        amount = db.session.execute(
+            select(FinancialGoal.smart_saver_balance).where(FinancialGoal.id == goal_id)
+        ).scalar()
+        if not amount or amount <= 0:
+            raise InsufficientFunds("Nothing to withdraw.")
+        result = db.session.execute(
+            update(FinancialGoal)
+            .where(FinancialGoal.id == goal_id, FinancialGoal.smart_saver_balance == amount)
+            .values(smart_saver_balance=0)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise InsufficientFunds("Nothing to withdraw.")
+        _credit(account_id, amount)
+        summary.adjust(user_id, balance=amount, goal_savings=-amount)
+        _record(user_id, "Smart Saver Withdrawal", amount, description=f"Withdrawn from goal '{goal_name}'")
+        return amount
+
+    amount = _atomic(work)
+    goal_analytics.invalidate(user_id)
+    return amount
@@ -0,0 +1,94 @@
+from collections import Counter
+from dataclasses import dataclass, field
+
+from sqlalchemy import func, select, update
+
+from . import db, summary
+from .models import Loan, User
+
+PAGE_SIZE = 50
+DECISION_BATCH_SIZE = 1000
+DECISIONS = ("Approved", "Rejected")
+
+
+# --------------------------
+# Paginated status views
+# --------------------------
+@dataclass
+class LoanPage:
+    items: list = field(default_factory=list)
+    next_cursor: int = None
+    prev_cursor: int = None
+
+
+def loan_page(status, after=None, before=None, per_page=PAGE_SIZE):
+    """One page of loans in ``status`` with their applicants, oldest first.
+
+    Keyset pagination on loan id over the (status, id) index, so every
+    page is a range read. The applicant's id, name and email come from
+    the same query (joined eager load) instead of one lazy load per row.
+    Pass ``after`` (next_cursor) for later loans and ``before``
+    (prev_cursor) for earlier ones.
+    """
+    stmt = (
+        select(Loan)
+        .where(Loan.status == status)
+        .options(db.joinedload(Loan.user).load_only(User.id, User.name, User.email))
+    )
+    backwards = before is not None and after is None
+    if backwards:
+        stmt = stmt.where(Loan.id < before).order_by(Loan.id.desc())
+    else:
+        if after is not None:
+            stmt = stmt.where(Loan.id > after)
+        stmt = stmt.order_by(Loan.id.asc())
+
+    rows = db.session.execute(stmt.limit(per_page + 1)).scalars().all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    page = LoanPage(items=rows)
+    if rows:
+        if more or backwards:
+            page.next_cursor = rows[-1].id
+        if after is not None or (backwards and more):
+            page.prev_cursor = rows[0].id
+    return page
+
+
+def status_counts():
+    """{status: number of loans}, read from the (status, id) index."""
+    return dict(db.session.execute(select(Loan.status, func.count()).group_by(Loan.status)).all())
+
+
+# --------------------------
+# Decisions
+# --------------------------
+def decide(loan_ids, status):
+    """Move pending loans in ``loan_ids`` to ``status`` in bulk.
+
+    Each chunk of DECISION_BATCH_SIZE ids is one
+    ``UPDATE loan SET status = ... WHERE id IN (...) AND status = 'Pending'
+    RETURNING user_id``, so loans another staff member decided meanwhile
+    are skipped and each applicant's pending_loans summary drops by
+    exactly the loans that changed. Commits once; returns the count.
+    """
+    if status not in DECISIONS:
+        raise ValueError(f"Invalid loan decision '{status}'")
+    ids = sorted({int(loan_id) for loan_id in loan_ids})
+    decided = Counter()
+    for i in range(0, len(ids), DECISION_BATCH_SIZE):
+        chunk = ids[i:i + DECISION_BATCH_SIZE]
+        result = db.session.execute(
+            update(Loan)
+            .where(Loan.id.in_(chunk), Loan.status == "Pending")
+            .values(status=status)
+            .returning(Loan.user_id)
+            .execution_options(synchronize_session=False)
+        )
+        decided.update(result.scalars())
+    summary.adjust_many("pending_loans", {user_id: -count for user_id, count in decided.items()})
+    db.session.commit()
+    return sum(decided.values())
@@ -1,18 +1,37 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 from . import db, login_manager
+from .cache import TTLCache
+from .money import Money, MoneyType
 from datetime import datetime
 import random
 from werkzeug.security import generate_password_hash, check_password_hash
 import enum
-import numpy as np
 
 # --------------------------
 # Flask-Login user loader
 # --------------------------
+# Snapshots of the non-deferred User columns, keyed by user id. A hit is
+# turned back into a session-bound User with merge(load=False), so the
+# request never touches the database unless it uses a relationship or a
+# deferred column. Entries are dropped when a change to the user commits.
+identity_cache = TTLCache(maxsize=1024, ttl=30)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    snapshot = identity_cache.get(user_id)
+    if snapshot is not None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        identity_cache.set(user_id, {key: getattr(user, key) for key in User.identity_columns()})
+    return user
 
 # --------------------------
 # Enum for Saving Modes
@@ -39,19 +58,28 @@ def generate_account_number():
 # --------------------------
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
+    __table_args__ = (
+        db.Index('ix_user_face_updated_at', 'face_updated_at'),  # face index refresh
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=True)
     password_hash = db.Column(db.String(255), nullable=True)
     name = db.Column(db.String(150))
     email = db.Column(db.String(100), unique=True, nullable=False)
-    mobile_number = db.Column(db.String(20), nullable=True)
-    place = db.Column(db.String(150), nullable=True)
-    profile_image = db.Column(db.String(200), nullable=True)
-    is_staff = db.Column(db.Boolean, default=False)
+    is_staff = db.Column(db.Boolean, default=False, index=True)
     is_admin = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
-    face_encoding = db.Column(db.LargeBinary, nullable=True)
+
+    # Not needed to authenticate a request, so they are only fetched on
+    # first access (one query per group) instead of on every load_user.
+    mobile_number = db.deferred(db.Column(db.String(20), nullable=True), group='profile')
+    place = db.deferred(db.Column(db.String(150), nullable=True), group='profile')
+    profile_image = db.deferred(db.Column(db.String(200), nullable=True), group='profile')
+    face_encoding = db.deferred(db.Column(db.LargeBinary, nullable=True), group='biometric')
+    # Set whenever face_encoding is written or cleared, so every worker's
+    # face index picks up re-registered and re-encoded faces, not just new users.
+    face_updated_at = db.Column(db.DateTime, nullable=True)
 
     # Relationships
     account = db.relationship('Account', backref='user', uselist=False)
@@ -62,6 +90,61 @@ class User(UserMixin, db.Model):
     spam_reports_sent = db.relationship(
         'SpamReport', backref='reporter_user', foreign_keys='SpamReport.user_id', lazy=True
     )
+    summary = db.relationship('DashboardSummary', uselist=False, cascade='all, delete-orphan')
+
+    @classmethod
+    def identity_columns(cls):
+        return [attr.key for attr in db.inspect(cls).column_attrs if not attr.deferred]
+
+    # Face encodings are only read by the face-matching code paths,
+    # as (id, blob) rows rather than full User objects.
+    @classmethod
+    def face_encoding_rows(cls, after_id=0, limit=None):
+        stmt = (
+            db.select(cls.id, cls.face_encoding)
+            .where(cls.id > after_id, cls.face_encoding.isnot(None))
+            .order_by(cls.id)
+        )
+        if limit:
+            stmt = stmt.limit(limit)
+        return db.session.execute(stmt)
+
+    @classmethod
+    def face_encoding_changes(cls, since):
+        """(id, blob, face_updated_at) rows changed at or after ``since``; blob is None if cleared."""
+        return db.session.execute(
+            db.select(cls.id, cls.face_encoding, cls.face_updated_at)
+            .where(cls.face_updated_at >= since)
+            .order_by(cls.face_updated_at, cls.id)
+        )
+
+    @classmethod
+    def last_face_change(cls):
+        return db.session.scalar(db.select(db.func.max(cls.face_updated_at)))
+
+    # Face login in 1:1 mode: the user claims an identity and only that
+    # user's encoding is compared.
+    @classmethod
+    def find_by_identity(cls, identity):
+        """User by email, username or account number, or None."""
+        identity = (identity or '').strip()
+        if not identity:
+            return None
+        stmt = (
+            db.select(cls)
+            .outerjoin(Account, Account.user_id == cls.id)
+            .where(db.or_(cls.email == identity, cls.username == identity,
+                          Account.account_number == identity))
+            .limit(1)
+        )
+        return db.session.scalars(stmt).first()
+
+    # Columns rendered by the staff customer lists
+    LIST_COLUMNS = ('id', 'username', 'name', 'email', 'mobile_number')
+
+    @classmethod
+    def list_options(cls):
+        return db.load_only(*(getattr(cls, name) for name in cls.LIST_COLUMNS))
 
     # Password methods
     def set_password(self, password):
@@ -73,8 +156,10 @@ class User(UserMixin, db.Model):
     # Ensure account exists
     def get_or_create_account(self):
         if not self.account:
-            account = Account(user_id=self.id, account_number=generate_account_number(), balance=0.0)
+            from . import summary
+            account = Account(user_id=self.id, account_number=generate_account_number(), balance=Money(0))
             db.session.add(account)
+            summary.rebuild(self.id)
             db.session.commit()
             return account
         return self.account
@@ -90,6 +175,39 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f"<User {self.email}>"
 
+
+@event.listens_for(User.face_encoding, "set")
+def stamp_face_encoding(target, value, oldvalue, initiator):
+    target.face_updated_at = datetime.utcnow()
+
+
+def invalidate_identities(user_ids, session=None):
+    """Drop the cached identities of ``user_ids`` once the session commits.
+
+    Dropping them at flush would let another request cache the old row
+    again before the commit. Bulk ``update(User)`` statements bypass the
+    mapper events below and must call this themselves.
+    """
+    session = session or db.session()
+    session.info.setdefault('identity_invalidations', set()).update(user_ids)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_identity(mapper, connection, target):
+    invalidate_identities([target.id], object_session(target))
+
+
+@event.listens_for(Session, "after_commit")
+def drop_invalidated_identities(session):
+    for user_id in session.info.pop('identity_invalidations', ()):
+        identity_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def keep_identities(session):
+    session.info.pop('identity_invalidations', None)
+
 # --------------------------
 # Account Model
 # --------------------------
@@ -98,8 +216,8 @@ class Account(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     account_number = db.Column(db.String(20), unique=True, nullable=False)
-    balance = db.Column(db.Float, default=0.0)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    balance = db.Column(MoneyType, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
 
     def __repr__(self):
         return f"<Account {self.account_number} - Balance {self.balance}>"
@@ -109,10 +227,14 @@ class Account(db.Model):
 # -- Transaction Model --
 class Transaction(db.Model):
     __tablename__ = 'transaction'
+    __table_args__ = (
+        # Keyset pagination of a user's history (history.transaction_page)
+        db.Index('ix_transaction_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(20))
-    amount = db.Column(db.Float)
+    amount = db.Column(MoneyType)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     recipient_account = db.Column(db.String(20), nullable=True)
@@ -129,12 +251,16 @@ class Transaction(db.Model):
 # -- Loan Model --
 class Loan(db.Model):
     __tablename__ = 'loan'
+    __table_args__ = (
+        db.Index('ix_loan_status_id', 'status', 'id'),    # staff loan queues
+        db.Index('ix_loan_user_id_id', 'user_id', 'id'),  # my_loans
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float)
+    amount = db.Column(MoneyType)
     reason = db.Column(db.String(255))
     status = db.Column(db.String(20), default='Pending')
-    emi_due = db.Column(db.Float, default=0.0)
+    emi_due = db.Column(MoneyType, default=0)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
     def __repr__(self):
@@ -144,20 +270,24 @@ class Loan(db.Model):
 # -- Financial Goal Model --
 class FinancialGoal(db.Model):
     __tablename__ = "financial_goal"
+    __table_args__ = (
+        db.Index('ix_financial_goal_next_run_id', 'next_run_at', 'id'),  # Smart Saver scheduler
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     name = db.Column(db.String(150), nullable=False)
-    target_amount = db.Column(db.Float)
+    target_amount = db.Column(MoneyType)
     deadline = db.Column(db.Date)
     saving_mode = db.Column(db.Enum(SavingMode), default=SavingMode.NONE, nullable=False)
-    daily_amount = db.Column(db.Float, default=0.0)
-    weekly_amount = db.Column(db.Float, default=0.0)
-    monthly_amount = db.Column(db.Float, default=0.0)
-    yearly_amount = db.Column(db.Float, default=0.0)
+    daily_amount = db.Column(MoneyType, default=0)
+    weekly_amount = db.Column(MoneyType, default=0)
+    monthly_amount = db.Column(MoneyType, default=0)
+    yearly_amount = db.Column(MoneyType, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    smart_saver_balance = db.Column(db.Float, default=0.0)
+    smart_saver_balance = db.Column(MoneyType, default=0)
     last_saved_at = db.Column(db.DateTime, nullable=True)
+    next_run_at = db.Column(db.DateTime, nullable=True)  # next Smart Saver auto-debit; None = not scheduled
 
     @property
     def amount_saved(self):
@@ -170,13 +300,17 @@ class FinancialGoal(db.Model):
 # -- Spam Report Model --
 class SpamReport(db.Model):
     __tablename__ = "spam_report"
+    __table_args__ = (
+        db.Index('ix_spam_report_user_status', 'user_id', 'status'),  # dashboard summary
+        db.Index('ix_spam_report_reported_user', 'reported_user_id'),  # fraud scoring
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'))
     reported_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     reason = db.Column(db.String(255))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     status = db.Column(db.String(20), default='Pending')  # Pending / Reviewed / Resolved
 
     reporter = db.relationship('User', foreign_keys=[user_id])
@@ -190,6 +324,9 @@ class SpamReport(db.Model):
 # -- Saved Contact Model --
 class SavedContact(db.Model):
     __tablename__ = "saved_contact"
+    __table_args__ = (
+        db.Index('ix_saved_contact_user_account', 'user_id', 'account_number'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -199,3 +336,78 @@ class SavedContact(db.Model):
 
     def __repr__(self):
         return f"<Contact {self.name} - {self.account_number}>"
+
+
+# -- Dashboard Summary Model --
+class DashboardSummary(db.Model):
+    """Per-user dashboard figures, one row per user.
+
+    Maintained by ``summary.adjust`` in the same transaction as the
+    change it reflects, so the dashboard is a single primary-key read.
+    """
+    __tablename__ = "dashboard_summary"
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    account_number = db.Column(db.String(20))
+    balance = db.Column(MoneyType, nullable=False, default=0)
+    goal_savings = db.Column(MoneyType, nullable=False, default=0)
+    pending_loans = db.Column(db.Integer, nullable=False, default=0)
+    unread_reports = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def usable_balance(self):
+        return self.balance - self.goal_savings
+
+    def __repr__(self):
+        return f"<DashboardSummary user {self.user_id} - Balance {self.balance}>"
+
+
+# --------------------------
+# Translation cache
+# --------------------------
+class Translation(db.Model):
+    """One translated UI string, keyed by language and SHA-1 of the source text.
+
+    Filled by ``translation.translations`` in the background or by
+    ``flask translate build``; read once per language per worker.
+    """
+    __tablename__ = "translation"
+
+    lang = db.Column(db.String(10), primary_key=True)
+    source_hash = db.Column(db.String(40), primary_key=True)
+    source = db.Column(db.Text, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    backend = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Translation {self.lang} {self.source[:30]!r}>"
+
+
+# --------------------------
+# Background job checkpoints
+# --------------------------
+class JobCheckpoint(db.Model):
+    """Progress of a batch job run, committed with every batch.
+
+    A run that stops before ``finished_at`` is set (crash, deploy,
+    --max-seconds) is resumed with the same ``as_of`` cutoff by the next
+    invocation. See ``smart_saver.run``.
+    """
+    __tablename__ = "job_checkpoint"
+
+    job = db.Column(db.String(50), primary_key=True)
+    as_of = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    batches = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    debited = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(MoneyType, nullable=False, default=0)
+    last_goal_id = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<JobCheckpoint {self.job} as of {self.as_of}>"
@@ -0,0 +1,163 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+_PAISE = Decimal(1)
+
+
+# --------------------------
+# Money value type
+# --------------------------
+class Money:
+    """An exact rupee amount held as an integer number of paise.
+
+    Arithmetic and comparisons are plain integer operations. Plain
+    numbers (int, float, Decimal, str) on the other side are read as
+    rupees, so ``Money(150) == 1.5`` and ``balance - 10`` take ten rupees
+    off. ``float()``, ``str()`` and ``format()`` give rupees, which is
+    what the templates' ``"%.2f"|format(...)`` and ``"{:,.2f}"`` expect.
+    """
+
+    __slots__ = ("paise",)
+
+    def __init__(self, paise=0):
+        object.__setattr__(self, "paise", int(paise))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Money is immutable")
+
+    @classmethod
+    def from_rupees(cls, value):
+        """Parse a rupee amount, rounding half-up to the nearest paisa.
+
+        Raises ValueError for anything that is not a finite number.
+        """
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool):
+            return cls(value * 100)
+        try:
+            amount = Decimal(str(value).strip()) if isinstance(value, (str, float)) else Decimal(value)
+            if not amount.is_finite():
+                raise ValueError(f"Invalid amount: {value!r}")
+            return cls(int(amount.scaleb(2).quantize(_PAISE, rounding=ROUND_HALF_UP)))
+        except (InvalidOperation, TypeError):
+            raise ValueError(f"Invalid amount: {value!r}") from None
+
+    @property
+    def rupees(self):
+        return Decimal(self.paise).scaleb(-2)
+
+    # --- Conversions ---
+    def __float__(self):
+        return self.paise / 100
+
+    def __bool__(self):
+        return self.paise != 0
+
+    def __hash__(self):
+        # Equal to the hash of the same rupee amount as an int, Decimal or
+        # exactly representable float, since those compare equal too.
+        return hash(self.rupees)
+
+    def __str__(self):
+        sign = "-" if self.paise < 0 else ""
+        whole, frac = divmod(abs(self.paise), 100)
+        return f"{sign}{whole}.{frac:02d}"
+
+    def __repr__(self):
+        return f"Money({str(self)})"
+
+    def __format__(self, spec):
+        return format(self.rupees, spec) if spec else str(self)
+
+    def __round__(self, ndigits=None):
+        if ndigits is not None and ndigits >= 2:
+            return self
+        quantum = Decimal(1).scaleb(-(ndigits or 0))
+        return Money.from_rupees(self.rupees.quantize(quantum, rounding=ROUND_HALF_UP))
+
+    # --- Arithmetic ---
+    @staticmethod
+    def _paise(other):
+        try:
+            return Money.from_rupees(other).paise
+        except ValueError:
+            return None
+
+    def __add__(self, other):
+        paise = self._paise(other)
+        return NotImplemented if paise is None else Money(self.paise + paise)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        paise = self._paise(other)
+        return NotImplemented if paise is None else Money(self.paise - paise)
+
+    def __rsub__(self, other):
+        paise = self._paise(other)
+        return NotImplemented if paise is None else Money(paise - self.paise)
+
+    def __neg__(self):
+        return Money(-self.paise)
+
+    def __abs__(self):
+        return Money(abs(self.paise))
+
+    def __mul__(self, factor):
+        if isinstance(factor, Money):
+            return NotImplemented
+        return Money.from_rupees(self.rupees * Decimal(str(factor)))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Money):
+            return self.paise / other.paise
+        return Money.from_rupees(self.rupees / Decimal(str(other)))
+
+    # --- Comparisons ---
+    def _compare(self, other, op):
+        paise = self._paise(other)
+        return NotImplemented if paise is None else op(self.paise, paise)
+
+    def __eq__(self, other):
+        return self._compare(other, int.__eq__)
+
+    def __lt__(self, other):
+        return self._compare(other, int.__lt__)
+
+    def __le__(self, other):
+        return self._compare(other, int.__le__)
+
+    def __gt__(self, other):
+        return self._compare(other, int.__gt__)
+
+    def __ge__(self, other):
+        return self._compare(other, int.__ge__)
+
+
+# --------------------------
+# Column type
+# --------------------------
+class MoneyType(TypeDecorator):
+    """Stores Money as an integer number of paise (BIGINT).
+
+    Bound values that are not already Money are read as rupees, so
+    ``Account.balance >= 10`` and ``Account.balance - amount`` compare
+    and subtract exact paise inside SQL, and SUM() stays an integer.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return Money.from_rupees(value).paise
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return Money(value)
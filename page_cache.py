@@ -0,0 +1,148 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, make_response, render_template, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+from .cache import TTLCache
+
+
+def nocache(view):
+    """Per-user page: never stored by the browser or any proxy."""
+    @wraps(view)
+    def no_cache(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        response.headers["Cache-Control"] = "private, no-store, no-cache, must-revalidate, max-age=0"
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = "0"
+        return response
+    return no_cache
+
+
+def template_fingerprint(folder):
+    """(hash, newest mtime) over every template file; changes with each deploy."""
+    digest, newest = hashlib.sha1(), 0.0
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f"{os.path.relpath(os.path.join(root, name), folder)}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+            newest = max(newest, stat.st_mtime)
+    return digest.hexdigest()[:12], datetime.fromtimestamp(int(newest), timezone.utc)
+
+
+# --------------------------
+# Page and fragment cache
+# --------------------------
+class PageCache:
+    """Rendered output that does not depend on who is asking.
+
+    Whole pages (``cached_page``) are kept per endpoint and URL and served
+    with an ETag and Last-Modified, so repeat visits revalidate to a 304.
+    Template fragments (the ``fragment()`` Jinja global, used for the
+    sidebars) are kept per name and active endpoint. Every key starts
+    with the deploy ID (DEPLOY_ID, or a fingerprint of the templates), so
+    a deploy never serves output rendered by the previous release.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.deploy_id = None
+        self.last_modified = None
+        self.max_age = 3600
+        self.pages = TTLCache(maxsize=256, ttl=3600)
+        self.fragments = TTLCache(maxsize=256, ttl=3600)
+
+    def init_app(self, app):
+        app.config.setdefault("PAGE_CACHE", not (app.debug or app.config.get("TEMPLATES_AUTO_RELOAD")))
+        app.config.setdefault("PAGE_CACHE_MAX_AGE", 3600)
+        app.config.setdefault("DEPLOY_ID", os.environ.get("DEPLOY_ID"))
+        fingerprint, last_modified = template_fingerprint(os.path.join(app.root_path, app.template_folder))
+        self.configure(
+            enabled=app.config["PAGE_CACHE"],
+            deploy_id=app.config["DEPLOY_ID"] or fingerprint,
+            last_modified=last_modified,
+            max_age=app.config["PAGE_CACHE_MAX_AGE"],
+        )
+        app.jinja_env.globals["fragment"] = self.fragment
+
+    def configure(self, enabled=True, deploy_id=None, last_modified=None, max_age=3600):
+        self.enabled = enabled
+        self.deploy_id = deploy_id
+        self.last_modified = last_modified
+        self.max_age = max_age
+        self.pages.configure(ttl=max_age)
+        self.fragments.configure(ttl=max_age)
+
+    def clear(self):
+        self.pages.clear()
+        self.fragments.clear()
+
+    # --- Fragments ---
+    def fragment(self, name, *vary):
+        """Render ``name`` once per deploy and ``vary`` values (e.g. request.endpoint)."""
+        if not self.enabled:
+            return Markup(render_template(name))
+        key = (self.deploy_id, name) + vary
+        html = self.fragments.get(key)
+        if html is None:
+            html = Markup(render_template(name))
+            self.fragments.set(key, html)
+        return html
+
+    # --- Pages ---
+    def cached_page(self, view=None, *, shared=True):
+        """Cache a GET view whose output is the same for every visitor.
+
+        ``shared=True`` pages (home) may also be stored by proxies, but
+        only for anonymous visitors; a signed-in visitor gets a fresh
+        ``no-store`` render because the page greets them. ``shared=False``
+        is for pages behind login_required that render no user data:
+        cached server-side and by the browser (``private``), never by proxies.
+        Requests with pending flash messages always render.
+        """
+        if view is None:
+            return lambda v: self.cached_page(v, shared=shared)
+
+        personal_view = nocache(view)
+
+        @wraps(view)
+        def cached(*args, **kwargs):
+            if (not self.enabled or request.method != "GET" or "_flashes" in session
+                    or (shared and current_user.is_authenticated)):
+                return personal_view(*args, **kwargs)
+            key = (self.deploy_id, request.endpoint, request.full_path)
+            entry = self.pages.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                entry = (body, response.mimetype, hashlib.sha1(self.deploy_id.encode() + body).hexdigest())
+                self.pages.set(key, entry)
+            body, mimetype, etag = entry
+            response = Response(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.last_modified = self.last_modified
+            response.cache_control.max_age = self.max_age
+            if shared:
+                response.cache_control.public = True
+            else:
+                response.cache_control.private = True
+            response.vary.add("Cookie")
+            return response.make_conditional(request)
+        return cached
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "deploy_id": self.deploy_id,
+            "pages": self.pages.stats(),
+            "fragments": self.fragments.stats(),
+        }
+
+
+page_cache = PageCache()
+cached_page = page_cache.cached_page
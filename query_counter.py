@@ -0,0 +1,78 @@
+import threading
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from . import db
+
+
+# --------------------------
+# Per-request query counter
+# --------------------------
+class QueryCounter:
+    """Counts the SQL statements each request issues (development mode).
+
+    Hooked on the engine's ``before_cursor_execute``. After every request
+    the count goes into an ``X-Query-Count`` header, and any statement
+    whose SQL text ran more than QUERY_REPEAT_LIMIT times is logged as a
+    likely N+1 (a lazy load or lookup per row, differing only in its
+    parameters). With QUERY_COUNTER_RAISE the request fails instead,
+    which is what check_query_budget uses.
+
+    On by default when the app runs in debug mode (QUERY_COUNTER).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.flagged = Counter()   # endpoint -> requests with repeated statements
+        self.most = {}             # endpoint -> highest statement count seen
+
+    def init_app(self, app):
+        app.config.setdefault("QUERY_COUNTER", app.debug)
+        app.config.setdefault("QUERY_REPEAT_LIMIT", 2)
+        app.config.setdefault("QUERY_COUNTER_RAISE", False)
+        if not app.config["QUERY_COUNTER"]:
+            return
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._record)
+        app.after_request(self._report)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.setdefault("sql_statements", []).append(statement)
+
+    @staticmethod
+    def repeats(statements, limit):
+        """{statement: times} for statements run more than ``limit`` times."""
+        return {sql: n for sql, n in Counter(statements).items() if n > limit}
+
+    def _report(self, response):
+        statements = g.pop("sql_statements", [])
+        endpoint = request.endpoint or request.path
+        repeated = self.repeats(statements, current_app.config["QUERY_REPEAT_LIMIT"])
+        with self._lock:
+            self.requests += 1
+            self.most[endpoint] = max(self.most.get(endpoint, 0), len(statements))
+            if repeated:
+                self.flagged[endpoint] += 1
+        response.headers["X-Query-Count"] = str(len(statements))
+        if repeated:
+            lines = "\n".join(f"  {n}x {' '.join(sql.split())[:200]}" for sql, n in repeated.items())
+            message = f"{endpoint}: {len(statements)} queries, repeated statements (N+1?):\n{lines}"
+            if current_app.config["QUERY_COUNTER_RAISE"]:
+                raise AssertionError(message)
+            current_app.logger.warning(message)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "flagged": dict(self.flagged),
+                "most_queries": dict(self.most),
+            }
+
+
+query_counter = QueryCounter()
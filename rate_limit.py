@@ -0,0 +1,196 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# --------------------------
+# Errors
+# --------------------------
+class RateLimited(Exception):
+    """Too many attempts for one key; answer 429 with ``retry_after``."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# --------------------------
+# Token bucket stores
+# --------------------------
+def refill(tokens, updated, now, capacity, rate):
+    """Take one token from a bucket last seen at ``updated``.
+
+    Returns ``(tokens_left, wait)``; ``wait`` is 0 when the token was
+    taken, otherwise the seconds until one is available.
+    """
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+    """Per-process buckets in a bounded LRU dict.
+
+    Each gunicorn worker keeps its own buckets, so the effective limit is
+    ``workers`` times the configured one. Use the sqlite store to share
+    them between workers on one host.
+    """
+
+    def __init__(self, maxsize=10000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def take(self, key, capacity, rate):
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._data.get(key, (capacity, now))
+            tokens, wait = refill(tokens, updated, now, capacity, rate)
+            self._data[key] = (tokens, now)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteBuckets:
+    """Buckets in a small SQLite file shared by every worker on the host.
+
+    Kept out of the application database so login attempts never
+    contend with ledger writes. One connection per thread; each take is
+    a single BEGIN IMMEDIATE transaction.
+    """
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+        self._connection().execute(self.SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connection().execute("SELECT count(*) FROM bucket").fetchone()[0]
+
+    def take(self, key, capacity, rate):
+        conn = self._connection()
+        now = self._clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens, wait = refill(*(row or (capacity, now)), now, capacity, rate)
+            conn.execute("INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def clear(self):
+        self._connection().execute("DELETE FROM bucket")
+
+
+# --------------------------
+# Face login rate limiter
+# --------------------------
+class RateLimiter:
+    """Token buckets in front of face login, keyed by client IP and by
+    the user the claimed identity resolves to.
+
+    ``burst`` attempts are allowed at once, refilled at ``per_minute``.
+    The identity bucket caps guesses against one account from many
+    addresses, whichever of its email, username or account number they
+    claim; the IP bucket caps the CPU one client can spend on face
+    encoding. Checked before the image is decoded.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.backend_name = "memory"
+        self.limits = {"ip": (10, 10), "identity": (5, 5)}
+        self.store = MemoryBuckets()
+        self.allowed = self.limited = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault("FACE_LOGIN_RATE_LIMIT", True)
+        app.config.setdefault("FACE_LOGIN_RATE_BACKEND", "memory")
+        app.config.setdefault("FACE_LOGIN_RATE_PATH", os.path.join(app.root_path, "rate_limit.db"))
+        app.config.setdefault("FACE_LOGIN_IP_BURST", 10)
+        app.config.setdefault("FACE_LOGIN_IP_PER_MINUTE", 10)
+        app.config.setdefault("FACE_LOGIN_IDENTITY_BURST", 5)
+        app.config.setdefault("FACE_LOGIN_IDENTITY_PER_MINUTE", 5)
+        self.configure(
+            enabled=app.config["FACE_LOGIN_RATE_LIMIT"],
+            backend=app.config["FACE_LOGIN_RATE_BACKEND"],
+            path=app.config["FACE_LOGIN_RATE_PATH"],
+            ip=(app.config["FACE_LOGIN_IP_BURST"], app.config["FACE_LOGIN_IP_PER_MINUTE"]),
+            identity=(app.config["FACE_LOGIN_IDENTITY_BURST"], app.config["FACE_LOGIN_IDENTITY_PER_MINUTE"]),
+        )
+
+    def configure(self, enabled=True, backend="memory", path=None, ip=(10, 10), identity=(5, 5)):
+        if backend not in ("memory", "sqlite"):
+            raise ValueError(f"Unknown rate limit backend '{backend}'")
+        self.enabled = enabled
+        self.backend_name = backend
+        self.limits = {"ip": ip, "identity": identity}
+        self.store = SQLiteBuckets(path) if backend == "sqlite" else MemoryBuckets()
+        self.allowed = self.limited = 0
+
+    def hit(self, ip=None, user_id=None):
+        """Spend one attempt from the bucket of ``ip`` and of the claimed
+        ``user_id``, whichever are given; raises RateLimited.
+
+        Login routes spend the IP attempt first and the user's once the
+        claim is looked up. A claim that names nobody has no account to
+        protect and only spends from the IP bucket.
+        """
+        if not self.enabled:
+            return
+        keys = []
+        if ip is not None or user_id is None:
+            keys.append(("ip", ip or "unknown"))
+        if user_id is not None:
+            keys.append(("identity", user_id))
+        for kind, value in keys:
+            burst, per_minute = self.limits[kind]
+            wait = self.store.take(f"{kind}:{value}", burst, per_minute / 60.0)
+            if wait:
+                with self._lock:
+                    self.limited += 1
+                raise RateLimited("Too many face login attempts", retry_after=max(1, round(wait)))
+        with self._lock:
+            self.allowed += 1
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend_name,
+            "buckets": len(self.store),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+face_login_limiter = RateLimiter()
@@ -1,49 +1,97 @@
-from calendar import month_abbr
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app
+from flask import (Blueprint, Response, render_template, redirect, url_for, request, flash, current_app,
+                   jsonify, stream_with_context)
 from flask_login import login_user, logout_user, login_required, current_user
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 from .staff_form import ForgotPasswordForm
-from .models import FinancialGoal, Loan, SavingMode, Transaction, User, Account, db
+from .models import FinancialGoal, Loan, SavingMode, User, db
+from .money import Money
 from .forms import LoginForm, DepositForm, SetGoalForm, WithdrawForm, TransferForm, ProfileForm
-import base64, numpy as np
-from io import BytesIO
-from PIL import Image
-import cv2
+from .face_pool import face_pool, FacePoolUnavailable
+from .face_service import NoFaceFound
+from .rate_limit import face_login_limiter, RateLimited
+from . import face_service, goal_analytics, history, ledger, smart_saver, summary
+from .page_cache import cached_page, nocache
 
 main = Blueprint("main", __name__)
 
-from functools import wraps
-from flask import make_response
-
-def nocache(view):
-    @wraps(view)
-    def no_cache(*args, **kwargs):
-        response = make_response(view(*args, **kwargs))
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "-1"
-        return response
-    return no_cache
 
 # ---------------------- Utilities ---------------------- #
-def get_face_encoding(image_array):
-    gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-    resized = cv2.resize(gray, (100, 100))
-    return resized.flatten() / 255.0
+FACE_UPLOAD_TYPES = ("application/octet-stream", "image/jpeg", "image/png")
+
+def read_face_upload():
+    """The uploaded image of a binary face request as a buffer, or None.
+
+    Accepts a raw body (application/octet-stream or image/*) or a
+    multipart file field named ``face_image``. A raw body is read once,
+    straight into a buffer of Content-Length bytes; a declared length over
+    MAX_CONTENT_LENGTH is refused (413) before anything is allocated.
+    """
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get("face_image")
+        return memoryview(upload.read()) if upload else None
+    if request.mimetype not in FACE_UPLOAD_TYPES or not request.content_length:
+        return None
+    limit = current_app.config.get("MAX_CONTENT_LENGTH")
+    if limit is not None and request.content_length > limit:
+        raise RequestEntityTooLarge()
+    view = memoryview(bytearray(request.content_length))
+    size = 0
+    while size < len(view):
+        count = request.stream.readinto(view[size:])
+        if not count:
+            break
+        size += count
+    return view[:size]
+
+def face_login_claim():
+    """(identity, user) for the email, username or account number a face
+    login claims; user is None if it names nobody, both are None without
+    a claim.
+
+    Spends the client's IP attempt before looking the claim up, so a
+    rate-limited flood never reaches the database, then the claimed
+    user's attempt. Raises RateLimited.
+    """
+    face_login_limiter.hit(ip=request.remote_addr)
+    identity = request.values.get("identity", "").strip() or None
+    claimed = User.find_by_identity(identity) if identity else None
+    if claimed is not None:
+        face_login_limiter.hit(user_id=claimed.id)
+    return identity, claimed
+
+def binary_face_login(staff_only, next_url):
+    """JSON face login for fetch() clients posting raw image bytes."""
+    try:
+        identity, claimed = face_login_claim()
+    except RateLimited as e:
+        return jsonify(error="Too many attempts. Try again later."), 429, {"Retry-After": e.retry_after}
+    buffer = read_face_upload()
+    if buffer is None or not len(buffer):
+        return jsonify(error="Send a JPEG or PNG image."), 400
+    try:
+        encoding = face_service.encode_bytes(buffer)
+    except FacePoolUnavailable:
+        return jsonify(error="Face login is busy. Try again shortly."), 503, {"Retry-After": face_pool.retry_after}
+    except NoFaceFound:
+        return jsonify(error="No face found. Face the camera and try again."), 400
+    except ValueError:
+        return jsonify(error="Unreadable image."), 400
+    user = face_service.match(encoding, identity, staff_only=staff_only, claimed=claimed)
+    if user is None:
+        return jsonify(error="No matching user found."), 401
+    login_user(user)
+    return jsonify(redirect=next_url)
 
 def get_or_create_account(user):
-    if hasattr(user, "account") and user.account:
-        return user.account
-    account = Account(user_id=user.id, balance=0.0)
-    db.session.add(account)
-    db.session.commit()
-    return account
+    return user.get_or_create_account()
 
 # ---------------------- Root ---------------------- #
 @main.route("/")
+@cached_page
 def home():
     return render_template("home.html")
 
@@ -79,29 +127,36 @@ def face_login():
         flash("Face image not received", "danger")
         return redirect(url_for("main.login"))
     try:
-        header, encoded = face_data_url.split(",", 1)
-        img_bytes = base64.b64decode(encoded)
-        img = Image.open(BytesIO(img_bytes)).convert("RGB")
-        img_np = np.array(img)
-        login_encoding = get_face_encoding(img_np)
-
-        users = User.query.all()
-        for user in users:
-            if user.face_encoding:
-                saved_encoding = np.frombuffer(user.face_encoding, dtype=np.float32)
-                sim = np.dot(saved_encoding, login_encoding) / (np.linalg.norm(saved_encoding) * np.linalg.norm(login_encoding))
-                if sim > 0.6:
-                    login_user(user)
-                    flash("Face login successful!", "success")
-                    return redirect(url_for("main.dashboard"))
+        identity, claimed = face_login_claim()
+    except RateLimited as e:
+        flash("Too many face login attempts. Please wait a minute and try again.", "warning")
+        return render_template("login.html", form=LoginForm()), 429, {"Retry-After": e.retry_after}
+    try:
+        login_encoding = face_service.encode_data_url(face_data_url)
+
+        user = face_service.match(login_encoding, identity, claimed=claimed)
+        if user:
+            login_user(user)
+            flash("Face login successful!", "success")
+            return redirect(url_for("main.dashboard"))
 
         flash("No matching user found", "danger")
         return redirect(url_for("main.login"))
+    except FacePoolUnavailable:
+        flash("Face login is busy right now. Please try again in a moment.", "warning")
+        return render_template("login.html", form=LoginForm()), 503, {"Retry-After": face_pool.retry_after}
+    except NoFaceFound:
+        flash("No face found. Face the camera and try again.", "danger")
+        return redirect(url_for("main.login"))
     except Exception as e:
         flash("Face login failed", "danger")
         print("Face login error:", str(e))
         return redirect(url_for("main.login"))
 
+@main.route("/face_login/raw", methods=["POST"])
+def face_login_raw():
+    return binary_face_login(staff_only=False, next_url=url_for("main.dashboard"))
+
 @main.route("/logout")
 @login_required
 def logout():
@@ -113,18 +168,15 @@ def logout():
 @main.route("/dashboard")
 @login_required
 def dashboard():
-    account = get_or_create_account(current_user)
-    balance = account.balance if account else 0.0
-    account_number = account.account_number if account else None
-    goal_savings = sum(getattr(goal, "smart_saver_balance", 0) for goal in getattr(current_user, "goals", []))
-    usable_balance = balance - goal_savings
-
+    row = summary.get(current_user.id)
     return render_template("dashboard.html",
                            username=current_user.username,
-                           account_number=account_number,
-                           balance=balance,
-                           usable_balance=usable_balance,
-                           goal_savings=goal_savings)
+                           account_number=row.account_number,
+                           balance=row.balance,
+                           usable_balance=row.usable_balance,
+                           goal_savings=row.goal_savings,
+                           pending_loans=row.pending_loans,
+                           unread_reports=row.unread_reports)
     
 # ---------------------- Password ---------------------- #
 @main.route("/forgot_password", methods=["GET", "POST"])
@@ -142,28 +194,17 @@ def forgot_password():
     return render_template("forgot_password.html", form=form)
 
 # ---------------------- Transactions ---------------------- #
-def process_transaction(user, txn_type, amount, recipient_account=None, description=None):
-    txn = Transaction(user_id=user.id,
-                      type=txn_type,
-                      amount=amount,
-                      recipient_account=recipient_account,
-                      description=description or txn_type,
-                      status="Success")
-    db.session.add(txn)
-    db.session.commit()
-
 @main.route('/deposit', methods=['GET', 'POST'])
 @login_required
 def deposit():
     form = DepositForm()
     if form.validate_on_submit():
-        amount = float(form.amount.data)
-        if amount <= 0:
+        amount = Money.from_rupees(form.amount.data)
+        try:
+            ledger.deposit(get_or_create_account(current_user), amount)
+        except ledger.LedgerError:
             flash("Enter a valid amount", "danger")
         else:
-            account = get_or_create_account(current_user)
-            account.balance += amount
-            process_transaction(current_user, "Deposit", amount)
             flash("Deposit successful!", "success")
             return redirect(url_for('main.dashboard'))
     return render_template('deposit.html', form=form)
@@ -173,13 +214,12 @@ def deposit():
 def withdraw():
     form = WithdrawForm()
     if form.validate_on_submit():
-        amount = float(form.amount.data)
-        account = get_or_create_account(current_user)
-        if amount <= 0 or amount > account.balance:
+        amount = Money.from_rupees(form.amount.data)
+        try:
+            ledger.withdraw(get_or_create_account(current_user), amount)
+        except ledger.LedgerError:
             flash("Invalid withdrawal amount", "danger")
         else:
-            account.balance -= amount
-            process_transaction(current_user, "Withdraw", amount)
             flash("Withdrawal successful!", "success")
             return redirect(url_for('main.dashboard'))
     return render_template('withdraw.html', form=form)
@@ -189,22 +229,24 @@ def withdraw():
 def transfer():
     form = TransferForm()
     if form.validate_on_submit():
-        amount = float(form.amount.data)
+        amount = Money.from_rupees(form.amount.data)
         recipient_acc = form.recipient_account.data
-        sender = get_or_create_account(current_user)
-        recipient = Account.query.filter_by(account_number=recipient_acc).first()
-
-        if not recipient:
+        try:
+            assessment = ledger.transfer(get_or_create_account(current_user), recipient_acc, amount,
+                                         sender_name=current_user.name)
+        except ledger.TransferBlocked:
+            flash("This transfer has been held for review. Please contact the bank.", "danger")
+        except ledger.AccountNotFound:
             flash("Recipient not found", "danger")
-        elif recipient.id == sender.id:
+        except ledger.SameAccount:
             flash("Cannot transfer to yourself", "warning")
-        elif amount <= 0 or amount > sender.balance:
+        except ledger.LedgerError:
             flash("Invalid transfer amount", "danger")
         else:
-            sender.balance -= amount
-            recipient.balance += amount
-            process_transaction(current_user, "Transfer", amount, recipient_account=recipient_acc)
-            flash("Transfer successful!", "success")
+            if assessment.flagged:
+                flash("Transfer successful. It has been flagged for a routine review.", "warning")
+            else:
+                flash("Transfer successful!", "success")
             return redirect(url_for('main.dashboard'))
     return render_template('transfer.html', form=form)
 
@@ -251,11 +293,12 @@ def loan():
         amount = request.form.get("amount")
         reason = request.form.get("reason")
         try:
-            amount_float = float(amount)
-            if not amount or not reason or amount_float <= 0:
+            loan_amount = Money.from_rupees(amount)
+            if not reason or loan_amount <= 0:
                 raise ValueError
-            new_loan = Loan(user_id=current_user.id, amount=amount_float, reason=reason)
+            new_loan = Loan(user_id=current_user.id, amount=loan_amount, reason=reason)
             db.session.add(new_loan)
+            summary.adjust(current_user.id, pending_loans=1)
             db.session.commit()
             flash("Loan application submitted successfully!", "success")
             return redirect(url_for("main.dashboard"))
@@ -280,6 +323,7 @@ def financial_goals_landing():
 
 @main.route("/goal_calculator")
 @login_required
+@cached_page(shared=False)
 def goal_calculator():
     return render_template("goal_calculator.html")
 
@@ -288,25 +332,15 @@ def goal_calculator():
 @login_required
 def view_goals():
     goals = FinancialGoal.query.filter_by(user_id=current_user.id).all()
+    stats = goal_analytics.for_user(current_user.id, goals)
     warnings = []
 
     for goal in goals:
-        start = datetime.utcnow().date()
-        end = goal.deadline
-        labels = []
-        current = start
-        while current <= end:
-            labels.append(month_abbr[current.month])
-            current = current.replace(year=current.year + (current.month // 12), month=(current.month % 12) + 1)
-
-        monthly_value = goal.smart_saver_balance / max(1, len(labels))
-        goal.chart_labels = labels
-        goal.chart_data = [round(monthly_value, 2)] * len(labels)
-
-        days_left = (goal.deadline - datetime.utcnow().date()).days
-        if days_left <= 5 and goal.smart_saver_balance < goal.target_amount:
-            remaining = goal.target_amount - goal.smart_saver_balance
-            warnings.append(f"⚠️ Goal '{goal.name}' is nearing deadline! ₹{remaining:.0f} left to save.")
+        goal.stats = stats[goal.id]
+        goal.chart_labels = goal.stats.chart_labels
+        goal.chart_data = goal.stats.chart_data
+        if goal.stats.days_left <= 5 and goal.stats.remaining > 0:
+            warnings.append(f"⚠️ Goal '{goal.name}' is nearing deadline! ₹{goal.stats.remaining:.0f} left to save.")
 
     return render_template("view_goal.html", goals=goals, warnings=warnings)
 
@@ -314,12 +348,16 @@ def view_goals():
 @main.route("/goal/<int:goal_id>")
 @login_required
 def view_single_goal(goal_id):
+    # All of the user's goals, so this shares the analytics cache entry
+    # with view_goals; their own goal then comes from the identity map.
+    goals = FinancialGoal.query.filter_by(user_id=current_user.id).all()
     goal = FinancialGoal.query.get_or_404(goal_id)
     if goal.user_id != current_user.id:
         flash("Unauthorized access.", "danger")
         return redirect(url_for("main.view_goals"))
-    goal.chart_labels = ["Jan", "Feb", "Mar", "Apr"]
-    goal.chart_data = [1000, 2500, 3000, int(goal.smart_saver_balance)]
+    goal.stats = goal_analytics.for_user(current_user.id, goals)[goal.id]
+    goal.chart_labels = goal.stats.chart_labels
+    goal.chart_data = goal.stats.chart_data
     return render_template("single_goal.html", goal=goal)
 
 # ---------------------- Edit / Delete / Deposit ---------------------- #
@@ -332,12 +370,19 @@ def edit_goal(goal_id):
         return redirect(url_for("main.view_goals"))
     if request.method == "POST":
         goal.name = request.form.get("goalName")
-        goal.target_amount = float(request.form.get("goalAmount") or 0)
+        goal.target_amount = Money.from_rupees(request.form.get("goalAmount") or 0)
         goal.deadline = datetime.strptime(request.form.get("deadline"), "%Y-%m-%d").date()
+        period_amount = (request.form.get("periodAmount") or "").strip()
+        try:
+            smart_saver.plan(goal, Money.from_rupees(period_amount) if period_amount else None)
+        except ValueError:
+            db.session.rollback()
+            flash("Invalid amount per period.", "danger")
+            return redirect(url_for("main.edit_goal", goal_id=goal.id))
         db.session.commit()
         flash("Goal updated successfully.", "success")
         return redirect(url_for("main.view_goals"))
-    return render_template("edit_goal.html", goal=goal)
+    return render_template("edit_goal.html", goal=goal, period_amount=smart_saver.period_amount(goal))
 
 @main.route("/goal/delete/<int:goal_id>", methods=["POST"])
 @login_required
@@ -346,6 +391,7 @@ def delete_goal(goal_id):
     if goal.user_id != current_user.id:
         flash("Unauthorized", "danger")
         return redirect(url_for("main.view_goals"))
+    summary.adjust(current_user.id, goal_savings=-(goal.smart_saver_balance or Money(0)))
     db.session.delete(goal)
     db.session.commit()
     flash("Goal deleted successfully.", "info")
@@ -359,13 +405,16 @@ def set_goal():
         goal = FinancialGoal(
             user_id=current_user.id,
             name=form.goalName.data,
-            target_amount=form.goalAmount.data,
+            target_amount=Money.from_rupees(form.goalAmount.data),
             deadline=form.deadline.data,
             saving_mode=SavingMode[form.savingsMode.data],
-            smart_saver_balance=form.currentSavings.data or 0.0,
+            smart_saver_balance=Money.from_rupees(form.currentSavings.data or 0),
             last_saved_at=datetime.utcnow(),
         )
+        period_amount = form.periodAmount.data
+        smart_saver.plan(goal, Money.from_rupees(period_amount) if period_amount is not None else None)
         db.session.add(goal)
+        summary.adjust(current_user.id, goal_savings=goal.smart_saver_balance)
         db.session.commit()
         flash("Goal set successfully.", "success")
         return redirect(url_for("main.view_goals"))
@@ -381,7 +430,7 @@ def deposit_to_goal(goal_id):
 
     if request.method == "POST":
         try:
-            amount = float(request.form.get("amount") or 0)
+            amount = Money.from_rupees(request.form.get("amount") or 0)
         except ValueError:
             flash("Invalid input. Enter a numeric value.", "warning")
             return redirect(url_for("main.deposit_to_goal", goal_id=goal.id))
@@ -390,14 +439,12 @@ def deposit_to_goal(goal_id):
             flash("Enter a valid amount.", "warning")
             return redirect(url_for("main.deposit_to_goal", goal_id=goal.id))
 
-        account = get_or_create_account(current_user)
-        if account.balance < amount:
+        try:
+            ledger.deposit_to_goal(get_or_create_account(current_user), goal, amount)
+        except ledger.InsufficientFunds:
             flash("Insufficient balance.", "danger")
             return redirect(url_for("main.deposit_to_goal", goal_id=goal.id))
 
-        goal.smart_saver_balance += amount
-        account.balance -= amount
-        process_transaction(current_user, "Smart Saver Deposit", amount, description=f"Deposited to goal '{goal.name}'")
         flash(f"₹{amount} deposited to your goal.", "success")
         return redirect(url_for("main.view_goals"))
 
@@ -411,26 +458,54 @@ def withdraw_from_smart_saver(goal_id):
         flash("Unauthorized", "danger")
         return redirect(url_for("main.view_goals"))
 
-    if goal.smart_saver_balance <= 0:
+    try:
+        amount = ledger.withdraw_from_goal(get_or_create_account(current_user), goal)
+    except ledger.InsufficientFunds:
         flash("Nothing to withdraw.", "warning")
         return redirect(url_for("main.view_goals"))
 
-    account = get_or_create_account(current_user)
-    amount = round(goal.smart_saver_balance, 2)
-    account.balance += amount
-    goal.smart_saver_balance = 0.0
-    process_transaction(current_user, "Smart Saver Withdrawal", amount, description=f"Withdrawn from goal '{goal.name}'")
     flash(f"₹{amount} withdrawn from Smart Saver.", "success")
     return redirect(url_for("main.view_goals"))
 
 # Route: Transaction History
+TRANSACTION_TYPE_FILTERS = {"deposit": ("Deposit",), "withdraw": ("Withdraw",)}
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+def transaction_filters(args):
+    end_date = parse_date(args.get("end_date"))
+    return dict(
+        types=TRANSACTION_TYPE_FILTERS.get(args.get("transaction_type")),
+        since=parse_date(args.get("start_date")),
+        until=end_date + timedelta(days=1) if end_date else None,
+        search=args.get("name", "").strip() or None,
+    )
+
 @main.route("/transactions")
 @login_required
 @nocache
 def transactions():
-    transactions = (
-        Transaction.query.filter_by(user_id=current_user.id)
-        .order_by(Transaction.id.desc())
-        .all()
+    page = history.transaction_page(
+        current_user.id,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        **transaction_filters(request.args),
     )
-    return render_template("transactions.html", transactions=transactions)
\ No newline at end of file
+    filters = {key: request.args[key] for key in ("name", "start_date", "end_date", "transaction_type")
+               if request.args.get(key)}
+    reported_ids = {tx.id for tx in page.items if tx.reported}
+    return render_template("transactions.html", transactions=page.items, page=page,
+                           filters=filters, reported_ids=reported_ids)
+
+@main.route("/transactions/export")
+@login_required
+def export_transactions():
+    """Download the filtered history as a CSV statement, streamed in batches."""
+    filename = f"statement-{current_user.username}-{datetime.utcnow():%Y%m%d}.csv"
+    rows = history.statement_csv(current_user.id, **transaction_filters(request.args))
+    return Response(stream_with_context(rows), mimetype="text/csv",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
@@ -0,0 +1,289 @@
+import calendar
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, func, insert, literal, or_, select, tuple_, type_coerce, update
+
+from . import db, summary
+from .models import Account, FinancialGoal, JobCheckpoint, SavingMode, Transaction
+from .money import Money, MoneyType
+
+JOB = "smart_saver"
+BATCH_SIZE = 1000
+
+
+# --------------------------
+# Schedule
+# --------------------------
+def add_months(moment, months):
+    """``moment`` plus whole months, clamped to the last day (31 Jan + 1 = 28/29 Feb)."""
+    month = moment.month - 1 + months
+    year, month = moment.year + month // 12, month % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+def next_run(mode, after):
+    """When a goal in ``mode`` is next due, one period after ``after``."""
+    if mode == SavingMode.DAILY:
+        return after + timedelta(days=1)
+    if mode == SavingMode.WEEKLY:
+        return after + timedelta(weeks=1)
+    if mode == SavingMode.MONTHLY:
+        return add_months(after, 1)
+    if mode == SavingMode.YEARLY:
+        return add_months(after, 12)
+    return None
+
+
+AMOUNT_COLUMNS = {
+    SavingMode.DAILY: "daily_amount",
+    SavingMode.WEEKLY: "weekly_amount",
+    SavingMode.MONTHLY: "monthly_amount",
+    SavingMode.YEARLY: "yearly_amount",
+}
+
+
+def period_amount(goal):
+    """The amount a goal saves per period in its mode (Money, possibly zero)."""
+    column = AMOUNT_COLUMNS.get(goal.saving_mode)
+    return (getattr(goal, column) if column else None) or Money(0)
+
+
+def periods_until(mode, after, deadline):
+    """How many runs in ``mode`` fall after ``after`` and on or before ``deadline`` (at least 1)."""
+    if deadline is None:
+        return 1
+    count, moment = 0, next_run(mode, after)
+    while moment is not None and moment.date() <= deadline:
+        count += 1
+        moment = next_run(mode, moment)
+    return max(count, 1)
+
+
+def plan(goal, amount=None, now=None):
+    """Set the goal's per-period amount in its mode, then schedule it.
+
+    ``amount`` is what the customer asked to save per period, and 0
+    pauses saving; without one (the field left blank), what is still
+    needed is spread evenly over the runs left before the deadline.
+    """
+    if amount is not None and amount < 0:
+        raise ValueError("The amount per period cannot be negative.")
+    now = now or datetime.utcnow()
+    column = AMOUNT_COLUMNS.get(goal.saving_mode)
+    if column is not None:
+        if amount is None:
+            remaining = (goal.target_amount or Money(0)) - (goal.smart_saver_balance or Money(0))
+            periods = periods_until(goal.saving_mode, now, goal.deadline)
+            amount = Money(max(-(-remaining.paise // periods), 0))
+        setattr(goal, column, amount)
+    schedule(goal, now)
+
+
+def schedule(goal, now=None):
+    """Set ``goal.next_run_at`` from its mode and amounts (None: not scheduled).
+
+    A goal that is already scheduled keeps its next run. Goals that save
+    nothing per period, are fully funded, or whose next run would fall
+    after the deadline are not scheduled.
+    """
+    now = now or datetime.utcnow()
+    funded = goal.target_amount is not None and (goal.smart_saver_balance or Money(0)) >= goal.target_amount
+    moment = None if period_amount(goal) <= 0 or funded else goal.next_run_at or next_run(goal.saving_mode, now)
+    if moment is not None and goal.deadline is not None and moment.date() > goal.deadline:
+        moment = None
+    goal.next_run_at = moment
+
+
+# SQL versions of period_amount / next_run for whole batches
+PERIOD_AMOUNT = case(
+    (FinancialGoal.saving_mode == SavingMode.DAILY, FinancialGoal.daily_amount),
+    (FinancialGoal.saving_mode == SavingMode.WEEKLY, FinancialGoal.weekly_amount),
+    (FinancialGoal.saving_mode == SavingMode.MONTHLY, FinancialGoal.monthly_amount),
+    (FinancialGoal.saving_mode == SavingMode.YEARLY, FinancialGoal.yearly_amount),
+    else_=literal(0),
+)
+REMAINING = FinancialGoal.target_amount - func.coalesce(FinancialGoal.smart_saver_balance, 0)
+# What a run actually saves: the period amount, capped at what the target still needs
+SAVE_AMOUNT = type_coerce(case(
+    (FinancialGoal.target_amount.is_(None), PERIOD_AMOUNT),
+    (REMAINING < PERIOD_AMOUNT, REMAINING),
+    else_=PERIOD_AMOUNT,
+), MoneyType)
+
+
+def _next_run_expr(as_of):
+    """next_run(mode, as_of) per row, as schedule() would set it.
+
+    None (unscheduled) when nothing is saved per period, the target is
+    reached, or the next run would fall after the deadline.
+    """
+    return case(
+        (PERIOD_AMOUNT <= 0, None),
+        (REMAINING <= 0, None),
+        *((and_(FinancialGoal.saving_mode == mode,
+                or_(FinancialGoal.deadline.is_(None), FinancialGoal.deadline >= next_run(mode, as_of).date())),
+           next_run(mode, as_of))
+          for mode in SavingMode if mode != SavingMode.NONE),
+        else_=None,
+    )
+
+
+# --------------------------
+# Batches
+# --------------------------
+def run_batch(as_of, now, batch_size=BATCH_SIZE):
+    """Debit one batch of goals due at ``as_of``; the caller commits.
+
+    The batch is the first ``batch_size`` due goals in (next_run_at, id)
+    order, named by the key of its last goal, so every step is one
+    set-based statement with the same predicate:
+
+    1. debit each owner's account by the sum of their goals in the batch,
+       only where the balance covers it (RETURNING the funded owners);
+    2. insert one "Smart Saver Deposit" transaction per goal, "Failed"
+       where the owner's balance did not cover the total (RETURNING the
+       amounts for the dashboard summaries);
+    3. credit the funded owners' goals;
+    4. move the batch's ``next_run_at`` one period past ``as_of``, which
+       takes the goals out of the due set, or unschedule goals that are
+       now fully funded or whose next run would miss the deadline.
+
+    Each goal saves its period amount capped at what its target still
+    needs; goals already funded or past their deadline save nothing.
+    Each statement re-checks ``next_run_at <= as_of``, so a goal is
+    debited at most once per run even if two workers overlap. Goals
+    whose owner cannot pay are skipped for this period, not retried.
+    Returns ``(goals, debited, skipped, amount, last_goal_id)``.
+    """
+    keys = db.session.execute(
+        select(FinancialGoal.next_run_at, FinancialGoal.id)
+        .where(FinancialGoal.next_run_at <= as_of)
+        .order_by(FinancialGoal.next_run_at, FinancialGoal.id)
+        .limit(batch_size)
+    ).all()
+    if not keys:
+        return 0, 0, 0, Money(0), None
+    first_at, cut_at, cut_id = keys[0][0], keys[-1][0], keys[-1][1]
+    in_batch = and_(
+        FinancialGoal.next_run_at <= as_of,
+        # the BETWEEN bounds the index range to this batch; the row value picks the exact cut
+        FinancialGoal.next_run_at.between(first_at, cut_at),
+        tuple_(FinancialGoal.next_run_at, FinancialGoal.id) <= tuple_(cut_at, cut_id),
+    )
+    saving = and_(
+        in_batch,
+        SAVE_AMOUNT > 0,
+        or_(FinancialGoal.deadline.is_(None), FinancialGoal.deadline >= as_of.date()),
+    )
+
+    owed = (
+        select(func.sum(SAVE_AMOUNT))
+        .where(FinancialGoal.user_id == Account.user_id, saving)
+        .scalar_subquery()
+    )
+    funded = db.session.execute(
+        update(Account)
+        .where(Account.user_id.in_(select(FinancialGoal.user_id).where(saving)), Account.balance >= owed)
+        .values(balance=Account.balance - owed)
+        .returning(Account.user_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    # before the goals are credited: SAVE_AMOUNT and ``saving`` read their balances
+    is_funded = FinancialGoal.user_id.in_(funded) if funded else literal(False)
+    deposits = db.session.execute(
+        insert(Transaction).from_select(
+            ["user_id", "type", "amount", "timestamp", "status", "is_fraud", "reported", "description"],
+            select(
+                FinancialGoal.user_id,
+                literal("Smart Saver Deposit"),
+                SAVE_AMOUNT,
+                literal(now),
+                case((is_funded, literal("Success")), else_=literal("Failed")),
+                literal(False),
+                literal(False),
+                case((is_funded, literal("Auto-saved to goal '")),
+                     else_=literal("Auto-save skipped, insufficient balance: '")) + FinancialGoal.name + literal("'"),
+            ).where(saving),
+        ).returning(Transaction.user_id, Transaction.amount, Transaction.status)
+    ).all()
+    if funded:
+        db.session.execute(
+            update(FinancialGoal)
+            .where(saving, is_funded)
+            .values(smart_saver_balance=func.coalesce(FinancialGoal.smart_saver_balance, 0) + SAVE_AMOUNT,
+                    last_saved_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    goals = db.session.execute(
+        update(FinancialGoal)
+        .where(in_batch)
+        .values(next_run_at=_next_run_expr(as_of))
+        .returning(FinancialGoal.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    paid, debited = defaultdict(int), 0
+    for user_id, amount, status in deposits:
+        if status == "Success":
+            paid[user_id] += amount.paise
+            debited += 1
+    summary.adjust_many("balance", {user_id: Money(-paise) for user_id, paise in paid.items()})
+    summary.adjust_many("goal_savings", {user_id: Money(paise) for user_id, paise in paid.items()})
+    return len(goals), debited, len(deposits) - debited, Money(sum(paid.values())), cut_id
+
+
+# --------------------------
+# Runs
+# --------------------------
+def run(as_of=None, batch_size=BATCH_SIZE, max_seconds=None, job=JOB, on_batch=None):
+    """Debit every goal due at ``as_of`` (default: now), batch by batch.
+
+    Each batch and its JobCheckpoint update commit together, so a crash
+    loses at most the batch in flight, which rolls back as a whole. If
+    the previous run of ``job`` never finished, it is resumed with its
+    original ``as_of`` (the argument is ignored). A finished run can be
+    repeated safely: its goals are no longer due. With ``max_seconds``
+    the run stops between batches and is left unfinished for the next
+    invocation. Returns the JobCheckpoint.
+    """
+    checkpoint = db.session.get(JobCheckpoint, job)
+    if checkpoint is None or checkpoint.finished_at is not None:
+        if checkpoint is None:
+            checkpoint = JobCheckpoint(job=job)
+            db.session.add(checkpoint)
+        checkpoint.as_of = as_of or datetime.utcnow()
+        checkpoint.started_at = checkpoint.updated_at = datetime.utcnow()
+        checkpoint.finished_at = None
+        checkpoint.batches = checkpoint.processed = checkpoint.debited = checkpoint.skipped = 0
+        checkpoint.amount = Money(0)
+        checkpoint.last_goal_id = None
+        db.session.commit()
+
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    while deadline is None or time.monotonic() < deadline:
+        now = datetime.utcnow()
+        try:
+            claimed, debited, skipped, amount, last_goal_id = run_batch(checkpoint.as_of, now, batch_size)
+            if not claimed:
+                checkpoint.finished_at = now
+            else:
+                checkpoint.batches += 1
+                checkpoint.processed += claimed
+                checkpoint.debited += debited
+                checkpoint.skipped += skipped
+                checkpoint.amount = checkpoint.amount + amount
+                checkpoint.last_goal_id = last_goal_id
+            checkpoint.updated_at = now
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if on_batch:
+            on_batch(checkpoint)
+        if checkpoint.finished_at is not None:
+            break
+    return checkpoint
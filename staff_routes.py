@@ -1,12 +1,24 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, session
+import os
+from datetime import datetime
+from flask import (Blueprint, Response, render_template, redirect, url_for, flash, request, current_app,
+                   session, jsonify, stream_with_context)
 from flask_login import login_user, logout_user, current_user, login_required
-from .models import User, Transaction, Loan, SpamReport, db
+from .models import User, Transaction, Loan, SpamReport, db, identity_cache
 from .staff_form import (
     StaffLoginForm, StaffRegisterForm,
     ForgotUsernameForm, ForgotPasswordForm
 )
 from .decorators import staff_required
-from .utils import nocache
+from . import face_service, history, loan_queue, summary
+from .utils import nocache, get_face_encoding_from_base64
+from .face_pool import face_pool, FacePoolUnavailable
+from .rate_limit import face_login_limiter, RateLimited
+from .translation import translations
+from .page_cache import page_cache
+from .query_counter import query_counter
+from .fraud import fraud_scorer
+from .goal_analytics import analytics_cache
+from .routes import binary_face_login, face_login_claim
 import random
 import string
 
@@ -27,6 +39,27 @@ def login():
         return redirect(url_for('staff.dashboard'))
 
     form = StaffLoginForm()
+    face_image = request.form.get('face_image')
+    if request.method == 'POST' and face_image:
+        try:
+            identity, claimed = face_login_claim()
+        except RateLimited as e:
+            flash('Too many face login attempts. Please wait a minute and try again.', 'warning')
+            return render_template('staff_login.html', form=form), 429, {'Retry-After': e.retry_after}
+        try:
+            encoding = get_face_encoding_from_base64(face_image)
+        except FacePoolUnavailable:
+            flash('Face login is busy right now. Please try again in a moment.', 'warning')
+            return render_template('staff_login.html', form=form), 503, {'Retry-After': face_pool.retry_after}
+        user = None
+        if encoding is not None:
+            user = face_service.match(encoding, identity, staff_only=True, claimed=claimed)
+        if user:
+            login_user(user)
+            return redirect(url_for('staff.dashboard'))
+        flash('Face not recognised or not authorized.', 'danger')
+        return render_template('staff_login.html', form=form)
+
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data, is_staff=True).first()
         if user and user.check_password(form.password.data):
@@ -38,6 +71,12 @@ def login():
     return render_template('staff_login.html', form=form)
 
 
+@staff_bp.route('/face_login/raw', methods=['POST'])
+def face_login_raw():
+    """Staff face login from raw image bytes (see routes.binary_face_login)."""
+    return binary_face_login(staff_only=True, next_url=url_for('staff.dashboard'))
+
+
 @staff_bp.route('/logout')
 @login_required
 def logout():
@@ -119,8 +158,41 @@ def forgot_password():
 @nocache
 @staff_required
 def approve_loans():
-    pending_loans = Loan.query.filter_by(status='Pending').all()
-    return render_template('approve_loans.html', loans=pending_loans)
+    page = loan_queue.loan_page('Pending', after=request.args.get('after', type=int),
+                                before=request.args.get('before', type=int))
+    return render_template('approve_loans.html', loans=page.items, page=page,
+                           counts=loan_queue.status_counts())
+
+
+@staff_bp.route('/loans/decide', methods=['POST'])
+@nocache
+@staff_required
+def decide_loans():
+    """Approve or reject many pending loans at once.
+
+    Takes ``loan_ids`` (repeated form field or JSON list) and ``status``.
+    Loans that are no longer pending are left alone.
+    """
+    data = request.get_json(silent=True) if request.is_json else None
+    if data is not None:
+        loan_ids, new_status = data.get('loan_ids') or [], data.get('status')
+    else:
+        loan_ids, new_status = request.form.getlist('loan_ids'), request.form.get('status')
+    try:
+        decided = loan_queue.decide(loan_ids, new_status)
+    except (TypeError, ValueError):
+        if data is not None:
+            return jsonify(error="Invalid loan decision."), 400
+        flash("Invalid status update.", "danger")
+        return redirect(url_for('staff.approve_loans'))
+    if data is not None:
+        return jsonify(decided=decided, status=new_status)
+    skipped = len(set(loan_ids)) - decided
+    message = f"{decided} loan(s) {new_status.lower()}."
+    if skipped:
+        message += f" {skipped} skipped (already decided)."
+    flash(message, "success" if decided else "warning")
+    return redirect(url_for('staff.approve_loans', after=request.form.get('after', type=int)))
 
 
 @staff_bp.route('/loan/<int:loan_id>/update', methods=['POST'])
@@ -130,6 +202,8 @@ def update_loan_status(loan_id: int):
     loan = Loan.query.get_or_404(loan_id)
     new_status = request.form.get('status')
     if new_status in ['Approved', 'Rejected']:
+        if loan.status == 'Pending':
+            summary.adjust(loan.user_id, pending_loans=-1)
         loan.status = new_status
         db.session.commit()
         flash(f"Loan #{loan.id} has been {new_status.lower()}.", "success")
@@ -142,23 +216,31 @@ def update_loan_status(loan_id: int):
 @nocache
 @staff_required
 def approved_loans():
-    loans = Loan.query.filter_by(status='Approved').all()
-    return render_template('approved_loans.html', loans=loans)
+    page = loan_queue.loan_page('Approved', after=request.args.get('after', type=int),
+                                before=request.args.get('before', type=int))
+    return render_template('approved_loans.html', loans=page.items, page=page)
 
 
 @staff_bp.route('/rejected_loans')
 @nocache
 @staff_required
 def rejected_loans():
-    loans = Loan.query.filter_by(status='Rejected').all()
-    return render_template('rejected_loans.html', loans=loans)
+    page = loan_queue.loan_page('Rejected', after=request.args.get('after', type=int),
+                                before=request.args.get('before', type=int))
+    return render_template('rejected_loans.html', loans=page.items, page=page)
 
 
 @staff_bp.route('/view_reports')
 @nocache
 @staff_required
 def view_reports():
-    reports = SpamReport.query.order_by(SpamReport.timestamp.desc()).all()
+    reports = (SpamReport.query
+               .options(db.joinedload(SpamReport.reporter).load_only(User.id, User.name, User.email),
+                        db.joinedload(SpamReport.reported_user).load_only(User.id, User.name, User.email),
+                        db.joinedload(SpamReport.transaction).load_only(Transaction.id, Transaction.amount,
+                                                                        Transaction.type, Transaction.timestamp))
+               .order_by(SpamReport.timestamp.desc())
+               .all())
     return render_template("view_reports.html", reports=reports)
 
 
@@ -166,7 +248,7 @@ def view_reports():
 @nocache
 @staff_required
 def customer_list():
-    customers = User.query.filter_by(is_staff=False).all()
+    customers = User.query.options(User.list_options()).filter_by(is_staff=False).all()
     return render_template("customer_list.html", customers=customers)
 
 
@@ -174,17 +256,56 @@ def customer_list():
 @nocache
 @staff_required
 def view_customers():
-    users = User.query.filter_by(is_staff=False).all()
+    users = User.query.options(User.list_options()).filter_by(is_staff=False).all()
     return render_template('staff_customers.html', users=users)
 
 
+def history_filters(args):
+    """history.transaction_page / statement_csv filters from the staff filter form."""
+    return dict(
+        types={'credit': history.CREDIT_TYPES, 'debit': history.DEBIT_TYPES}.get(args.get('type', '')),
+        since=history.range_start(args.get('date_range', '')),
+        search=args.get('search', '').strip() or None,
+    )
+
+
 @staff_bp.route('/customer/<int:user_id>/transactions')
 @nocache
 @staff_required
 def view_user_transactions(user_id: int):
-    user = User.query.get_or_404(user_id)
-    transactions = Transaction.query.filter_by(user_id=user.id).all()
-    return render_template('staff_user_transactions.html', page=1, pages=2, user=user, transactions=transactions)
+    user = User.query.options(db.joinedload(User.account)).get_or_404(user_id)
+    current_type = request.args.get('type', '')
+    current_range = request.args.get('date_range', '')
+    search_query = request.args.get('search', '').strip()
+    page = history.transaction_page(
+        user.id,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        **history_filters(request.args),
+    )
+    return render_template('staff_user_transactions.html', user=user, transactions=page.items, page=page,
+                           current_type=current_type, current_range=current_range, search_query=search_query)
+
+
+@staff_bp.route('/customer/<int:user_id>/transactions/export')
+@staff_required
+def export_user_transactions(user_id: int):
+    """Stream a customer's filtered history as a CSV statement."""
+    user = User.query.options(User.list_options()).get_or_404(user_id)
+    filename = f"statement-{user.username}-{datetime.utcnow():%Y%m%d}.csv"
+    rows = history.statement_csv(user.id, **history_filters(request.args))
+    return Response(stream_with_context(rows), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@staff_bp.route('/metrics')
+@staff_required
+def metrics():
+    """Per-worker cache statistics (each gunicorn worker keeps its own)."""
+    return jsonify(pid=os.getpid(), identity_cache=identity_cache.stats(), face_pool=face_pool.stats(),
+                   face_login_limiter=face_login_limiter.stats(), translations=translations.stats(),
+                   page_cache=page_cache.stats(), query_counter=query_counter.stats(),
+                   fraud_scorer=fraud_scorer.stats(), goal_analytics=analytics_cache.stats())
 
 
 @staff_bp.route('/create_key', methods=['POST'])
@@ -212,6 +333,8 @@ def delete_report(report_id):
         flash('Report not found.', 'warning')
         return redirect(url_for('staff.view_reports'))
     try:
+        if report.status == 'Pending':
+            summary.adjust(report.user_id, unread_reports=-1)
         db.session.delete(report)
         db.session.commit()
         flash('Report deleted successfully.', 'success')
@@ -230,6 +353,8 @@ def resolve_report(report_id):
         flash('Report not found.', 'warning')
         return redirect(url_for('staff.view_reports'))
     try:
+        if report.status == 'Pending':
+            summary.adjust(report.user_id, unread_reports=-1)
         report.status = 'Resolved'
         # Optionally set a resolved_at timestamp if the model has one:
         # report.resolved_at = datetime.utcnow()
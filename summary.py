@@ -0,0 +1,111 @@
+from datetime import datetime
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .models import Account, DashboardSummary, FinancialGoal, Loan, SpamReport
+from .money import Money
+
+
+# --------------------------
+# Dashboard summary rows
+# --------------------------
+def compute(user_id):
+    """Build a user's summary from the source tables.
+
+    The returned row is not added to the session.
+    """
+    account = db.session.execute(
+        select(Account.account_number, Account.balance).where(Account.user_id == user_id)
+    ).first()
+    goal_savings = db.session.execute(
+        select(func.sum(FinancialGoal.smart_saver_balance)).where(FinancialGoal.user_id == user_id)
+    ).scalar()
+    pending_loans = db.session.execute(
+        select(func.count(Loan.id)).where(Loan.user_id == user_id, Loan.status == "Pending")
+    ).scalar()
+    unread_reports = db.session.execute(
+        select(func.count(SpamReport.id)).where(SpamReport.user_id == user_id, SpamReport.status == "Pending")
+    ).scalar()
+    return DashboardSummary(
+        user_id=user_id,
+        account_number=account.account_number if account else None,
+        balance=(account.balance if account else None) or Money(0),
+        goal_savings=goal_savings or Money(0),
+        pending_loans=pending_loans,
+        unread_reports=unread_reports,
+        updated_at=datetime.utcnow(),
+    )
+
+
+def rebuild(user_id):
+    """Recompute a user's summary and stage it in the current transaction."""
+    return db.session.merge(compute(user_id))
+
+
+def insert_missing(user_id):
+    """Insert a user's summary computed from the source tables, unless a
+    row already exists; True if this call inserted it.
+
+    INSERT ... ON CONFLICT DO NOTHING, so of two first writes for one
+    user the loser finds the winner's row instead of failing on the
+    primary key.
+    """
+    insert = postgresql.insert if db.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    row = compute(user_id)
+    values = {column.key: getattr(row, column.key) for column in DashboardSummary.__table__.columns}
+    result = db.session.execute(
+        insert(DashboardSummary).values(**values).on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    return result.rowcount > 0
+
+
+def adjust(user_id, **deltas):
+    """Add ``deltas`` (balance=..., pending_loans=..., ...) to a user's summary.
+
+    Runs as one UPDATE in the caller's transaction. A user without a
+    summary row yet gets one computed from the source tables instead,
+    which already include the caller's change; if a concurrent first
+    write inserted the row meanwhile, the UPDATE is run against it.
+    """
+    values = {name: getattr(DashboardSummary, name) + delta for name, delta in deltas.items() if delta}
+    if not values:
+        return
+    stmt = (
+        update(DashboardSummary)
+        .where(DashboardSummary.user_id == user_id)
+        .values(updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(stmt).rowcount == 0 and not insert_missing(user_id):
+        db.session.execute(stmt)
+
+
+def adjust_many(name, deltas):
+    """Add ``deltas[user_id]`` to column ``name`` for many users at once.
+
+    One executemany UPDATE in the caller's transaction for the users
+    that have a summary row; the few that do not yet go through
+    ``adjust`` one by one.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    existing = set(db.session.execute(
+        select(DashboardSummary.user_id).where(DashboardSummary.user_id.in_(list(deltas)))
+    ).scalars())
+    table = DashboardSummary.__table__  # Core statement: a plain executemany
+    if existing:
+        db.session.execute(
+            update(table)
+            .where(table.c.user_id == bindparam("uid"))
+            .values({name: table.c[name] + bindparam("delta"), "updated_at": datetime.utcnow()}),
+            [{"uid": user_id, "delta": deltas[user_id]} for user_id in existing],
+        )
+    for user_id in deltas.keys() - existing:
+        adjust(user_id, **{name: deltas[user_id]})
+
+
+def get(user_id):
+    """The user's summary row; computed on the fly (and not saved) if missing."""
+    return db.session.get(DashboardSummary, user_id) or compute(user_id)
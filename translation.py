@@ -0,0 +1,272 @@
+import ast
+import asyncio
+import hashlib
+import html
+import inspect
+import json
+import os
+import queue
+import re
+import threading
+from datetime import datetime
+
+from jinja2 import Environment
+from sqlalchemy import select
+from werkzeug.utils import import_string
+
+from . import db
+from .cache import TTLCache
+from .models import Translation
+
+
+def source_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# --------------------------
+# Backends
+# --------------------------
+class NullBackend:
+    """Offline backend that translates nothing; pages stay in the source language."""
+
+    def translate(self, text, lang):
+        return None
+
+
+class CatalogBackend:
+    """Offline backend reading a reviewed JSON catalog: {"ml": {"Deposit": "..."}}."""
+
+    def __init__(self, path=None):
+        self.catalog = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.catalog = json.load(f)
+
+    def translate(self, text, lang):
+        return self.catalog.get(lang, {}).get(text)
+
+
+class GoogleBackend:
+    """googletrans, imported on first use. Network bound: only called off the render path."""
+
+    def __init__(self, **options):
+        self._translator = None
+
+    def translate(self, text, lang):
+        if self._translator is None:
+            from googletrans import Translator
+            self._translator = Translator()
+        result = self._translator.translate(text, dest=lang)
+        if inspect.isawaitable(result):  # googletrans 4.x is async
+            result = asyncio.run(result)
+        return result.text
+
+
+BACKENDS = {
+    "none": NullBackend,
+    "catalog": CatalogBackend,
+    "google": GoogleBackend,
+}
+
+
+def load_backend(name, **options):
+    """A backend from BACKENDS, or any ``module:Class`` with a ``translate(text, lang)`` method."""
+    cls = BACKENDS.get(name) or import_string(name)
+    if cls is CatalogBackend:
+        return cls(options.get("catalog_path"))
+    return cls()
+
+
+# --------------------------
+# String extraction
+# --------------------------
+SCRIPT_OR_STYLE = re.compile(r"<(script|style)\b.*?</\1>", re.S | re.I)
+TAG = re.compile(r"<[^>]*>")
+FILTER_LITERAL = re.compile(r"""(["'])((?:(?!\1).)+)\1\s*\|\s*translate\b""")
+NOT_PROSE = re.compile(r"[{}<>;=]|^\W*$")
+
+
+def template_strings(source, env=None):
+    """Visible text of a Jinja template, plus literals piped through ``|translate``."""
+    env = env or Environment()
+    strings = set(m.group(2) for m in FILTER_LITERAL.finditer(source))
+    data = "\n".join(value for _, kind, value in env.lex(source) if kind == "data")
+    for line in TAG.sub("\n", SCRIPT_OR_STYLE.sub("\n", data)).splitlines():
+        text = " ".join(html.unescape(line).split())
+        if text and not NOT_PROSE.search(text) and any(c.isalpha() for c in text):
+            strings.add(text)
+    return strings
+
+
+def flash_strings(source):
+    """String literals passed to flash() in a Python module."""
+    strings = set()
+    for node in ast.walk(ast.parse(source)):
+        if (isinstance(node, ast.Call) and getattr(node.func, "id", getattr(node.func, "attr", None)) == "flash"
+                and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            strings.add(node.args[0].value)
+    return strings
+
+
+def extract_strings(app):
+    """Every translatable string in the app's templates and flash() calls."""
+    strings = set()
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in files:
+            if name.endswith(".html"):
+                with open(os.path.join(root, name), encoding="utf-8") as f:
+                    strings |= template_strings(f.read(), app.jinja_env)
+    for name in os.listdir(app.root_path):
+        if name.endswith(".py"):
+            with open(os.path.join(app.root_path, name), encoding="utf-8") as f:
+                strings |= flash_strings(f.read())
+    return sorted(strings)
+
+
+# --------------------------
+# Translation cache
+# --------------------------
+class Translations:
+    """Cached translations that never block a request.
+
+    Each language's stored translations are read into a dict on first
+    use. A miss returns the source text straight away and queues the
+    string for a background thread, which asks the backend and stores
+    the result for every worker. ``flask translate build`` fills the
+    table ahead of time from the templates and flash messages.
+    """
+
+    def __init__(self):
+        self.backend_name = "none"
+        self.backend = NullBackend()
+        self.source_lang = "en"
+        self.default_lang = None
+        self._app = None
+        self._lock = threading.Lock()
+        self._catalogs = {}
+        self._pending = set()
+        self._queue = queue.Queue(maxsize=1000)
+        self._failed = TTLCache(maxsize=10000, ttl=300)
+        self._worker = None
+        self.hits = self.misses = self.translated = self.errors = self.dropped = 0
+
+    def init_app(self, app):
+        app.config.setdefault("TRANSLATION_BACKEND", "google")
+        app.config.setdefault("TRANSLATION_CATALOG_PATH", os.path.join(app.root_path, "translations.json"))
+        app.config.setdefault("TRANSLATION_SOURCE_LANG", "en")
+        app.config.setdefault("TRANSLATION_DEFAULT_LANG", None)
+        app.config.setdefault("TRANSLATION_QUEUE_SIZE", 1000)
+        self._app = app
+        self.configure(
+            app.config["TRANSLATION_BACKEND"],
+            catalog_path=app.config["TRANSLATION_CATALOG_PATH"],
+            source_lang=app.config["TRANSLATION_SOURCE_LANG"],
+            default_lang=app.config["TRANSLATION_DEFAULT_LANG"],
+            queue_size=app.config["TRANSLATION_QUEUE_SIZE"],
+        )
+        app.jinja_env.filters["translate"] = self.translate
+
+    def configure(self, backend="none", catalog_path=None, source_lang="en", default_lang=None, queue_size=1000):
+        with self._lock:
+            self.backend_name = backend
+            self.backend = load_backend(backend, catalog_path=catalog_path)
+            self.source_lang = source_lang
+            self.default_lang = default_lang
+            self._catalogs = {}
+            self._pending = set()
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._failed.clear()
+            self._worker = None
+            self.hits = self.misses = self.translated = self.errors = self.dropped = 0
+
+    def _catalog(self, lang):
+        catalog = self._catalogs.get(lang)
+        if catalog is None:
+            rows = db.session.execute(
+                select(Translation.source_hash, Translation.text).where(Translation.lang == lang)
+            )
+            catalog = self._catalogs.setdefault(lang, dict(rows.all()))
+        return catalog
+
+    # --- Lookup ---
+    def translate(self, text, lang=None):
+        """``text`` in ``lang`` if known, else ``text`` itself (and queue it)."""
+        lang = lang or self.default_lang
+        if not text or not lang or lang == self.source_lang:
+            return text
+        key = source_hash(text)
+        translated = self._catalog(lang).get(key)
+        if translated is not None:
+            self.hits += 1
+            return translated
+        self.misses += 1
+        self._enqueue(text, lang, key)
+        return text
+
+    def _enqueue(self, text, lang, key):
+        with self._lock:
+            if (lang, key) in self._pending or self._failed.get((lang, key)):
+                return
+            try:
+                self._queue.put_nowait((text, lang, key))
+            except queue.Full:
+                self.dropped += 1
+                return
+            self._pending.add((lang, key))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._work, name="translation", daemon=True)
+                self._worker.start()
+
+    def _work(self):
+        while True:
+            text, lang, key = self._queue.get()
+            try:
+                with self._app.app_context():
+                    self.fetch(text, lang)
+            finally:
+                with self._lock:
+                    self._pending.discard((lang, key))
+
+    # --- Filling the cache ---
+    def fetch(self, text, lang):
+        """Ask the backend for one string and store it. Returns the translation or None."""
+        key = source_hash(text)
+        try:
+            translated = self.backend.translate(text, lang)
+        except Exception:
+            self.errors += 1
+            self._failed.set((lang, key), True)
+            return None
+        if translated is None:
+            self._failed.set((lang, key), True)
+            return None
+        db.session.merge(Translation(lang=lang, source_hash=key, source=text, text=translated,
+                                     backend=self.backend_name, created_at=datetime.utcnow()))
+        db.session.commit()
+        self._catalog(lang)[key] = translated
+        self.translated += 1
+        return translated
+
+    def build(self, texts, lang):
+        """Translate every string in ``texts`` missing from ``lang``; yields (text, translation)."""
+        catalog = self._catalog(lang)
+        for text in texts:
+            if source_hash(text) not in catalog:
+                yield text, self.fetch(text, lang)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "languages": {lang: len(catalog) for lang, catalog in self._catalogs.items()},
+            "queued": self._queue.qsize(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "translated": self.translated,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+translations = Translations()
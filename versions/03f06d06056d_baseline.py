@@ -0,0 +1,24 @@
+"""baseline schema
+
+Revision ID: 03f06d06056d
+Revises: 
+Create Date: 2025-06-01 00:00:00.000000
+
+"""
+
+
+# revision identifiers, used by Alembic.
+revision = '03f06d06056d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tables were created with db.create_all() before migrations were
+    # tracked; existing databases are already stamped at this revision.
+    pass
+
+
+def downgrade():
+    pass
@@ -0,0 +1,50 @@
+"""store money columns as integer paise
+
+Revision ID: 5b1e7a9c2d40
+Revises: 03f06d06056d
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7a9c2d40'
+down_revision = '03f06d06056d'
+branch_labels = None
+depends_on = None
+
+
+MONEY_COLUMNS = {
+    'account': ['balance'],
+    'transaction': ['amount'],
+    'loan': ['amount', 'emi_due'],
+    'financial_goal': [
+        'target_amount', 'daily_amount', 'weekly_amount',
+        'monthly_amount', 'yearly_amount', 'smart_saver_balance',
+    ],
+}
+
+
+def upgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        for column in columns:
+            op.execute(
+                f'UPDATE "{table}" SET {column} = CAST(ROUND({column} * 100) AS INTEGER) '
+                f'WHERE {column} IS NOT NULL'
+            )
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.Float(), type_=sa.BigInteger(),
+                                      postgresql_using=f'{column}::bigint')
+
+
+def downgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.BigInteger(), type_=sa.Float(),
+                                      postgresql_using=f'{column}::float')
+        for column in columns:
+            op.execute(f'UPDATE "{table}" SET {column} = {column} / 100.0 WHERE {column} IS NOT NULL')
@@ -0,0 +1,23 @@
+"""index transaction history by user, timestamp and id
+
+Revision ID: 8c3d2f61a7e5
+Revises: 5b1e7a9c2d40
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3d2f61a7e5'
+down_revision = '5b1e7a9c2d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transaction_user_timestamp_id', 'transaction', ['user_id', 'timestamp', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_transaction_user_timestamp_id', table_name='transaction')
@@ -0,0 +1,52 @@
+"""Smart Saver schedule column and job checkpoints
+
+Revision ID: a7c4e2f9d813
+Revises: f3a8d5c1b7e2
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c4e2f9d813'
+down_revision = 'f3a8d5c1b7e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('financial_goal', sa.Column('next_run_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_financial_goal_next_run_id', 'financial_goal', ['next_run_at', 'id'])
+    op.create_table(
+        'job_checkpoint',
+        sa.Column('job', sa.String(length=50), primary_key=True),
+        sa.Column('as_of', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('batches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('debited', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('skipped', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('amount', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('last_goal_id', sa.Integer(), nullable=True),
+    )
+
+    # Goals that already save something per period become due at the
+    # first scheduler run, which debits once and moves them a period on.
+    op.execute("""
+        UPDATE financial_goal
+        SET next_run_at = COALESCE(last_saved_at, created_at, CURRENT_TIMESTAMP)
+        WHERE (saving_mode = 'DAILY' AND daily_amount > 0)
+           OR (saving_mode = 'WEEKLY' AND weekly_amount > 0)
+           OR (saving_mode = 'MONTHLY' AND monthly_amount > 0)
+           OR (saving_mode = 'YEARLY' AND yearly_amount > 0)
+    """)
+
+
+def downgrade():
+    op.drop_table('job_checkpoint')
+    op.drop_index('ix_financial_goal_next_run_id', table_name='financial_goal')
+    op.drop_column('financial_goal', 'next_run_at')
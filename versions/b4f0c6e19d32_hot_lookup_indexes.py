@@ -0,0 +1,36 @@
+"""secondary indexes for hot lookup columns
+
+Revision ID: b4f0c6e19d32
+Revises: 8c3d2f61a7e5
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4f0c6e19d32'
+down_revision = '8c3d2f61a7e5'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_user_is_staff', 'user', ['is_staff']),
+    ('ix_account_user_id', 'account', ['user_id']),
+    ('ix_loan_status_id', 'loan', ['status', 'id']),
+    ('ix_loan_user_id_id', 'loan', ['user_id', 'id']),
+    ('ix_financial_goal_user_id', 'financial_goal', ['user_id']),
+    ('ix_spam_report_timestamp', 'spam_report', ['timestamp']),
+    ('ix_saved_contact_user_account', 'saved_contact', ['user_id', 'account_number']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
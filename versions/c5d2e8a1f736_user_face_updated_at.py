@@ -0,0 +1,28 @@
+"""User face_updated_at for face index refresh
+
+Revision ID: c5d2e8a1f736
+Revises: a7c4e2f9d813
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8a1f736'
+down_revision = 'a7c4e2f9d813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing encodings stay NULL: a face index built from scratch reads
+    # them by id, and only later changes need the timestamp.
+    op.add_column('user', sa.Column('face_updated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_user_face_updated_at', 'user', ['face_updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_user_face_updated_at', table_name='user')
+    op.drop_column('user', 'face_updated_at')
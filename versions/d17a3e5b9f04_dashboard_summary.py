@@ -0,0 +1,53 @@
+"""materialized dashboard summary per user
+
+Revision ID: d17a3e5b9f04
+Revises: b4f0c6e19d32
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd17a3e5b9f04'
+down_revision = 'b4f0c6e19d32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_spam_report_user_status', 'spam_report', ['user_id', 'status'])
+    op.create_table(
+        'dashboard_summary',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), primary_key=True),
+        sa.Column('account_number', sa.String(length=20), nullable=True),
+        sa.Column('balance', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('goal_savings', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('pending_loans', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('unread_reports', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+    # Backfill from the source tables; money columns are already paise.
+    op.execute("""
+        INSERT INTO dashboard_summary
+            (user_id, account_number, balance, goal_savings, pending_loans, unread_reports, updated_at)
+        SELECT u.id,
+               a.account_number,
+               COALESCE(a.balance, 0),
+               COALESCE((SELECT SUM(g.smart_saver_balance) FROM financial_goal g
+                         WHERE g.user_id = u.id), 0),
+               (SELECT COUNT(*) FROM loan l
+                WHERE l.user_id = u.id AND l.status = 'Pending'),
+               (SELECT COUNT(*) FROM spam_report r
+                WHERE r.user_id = u.id AND r.status = 'Pending'),
+               CURRENT_TIMESTAMP
+        FROM "user" u
+        LEFT JOIN account a ON a.user_id = u.id
+    """)
+
+
+def downgrade():
+    op.drop_table('dashboard_summary')
+    op.drop_index('ix_spam_report_user_status', table_name='spam_report')
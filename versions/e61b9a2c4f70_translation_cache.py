@@ -0,0 +1,32 @@
+"""persistent translation cache
+
+Revision ID: e61b9a2c4f70
+Revises: d17a3e5b9f04
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e61b9a2c4f70'
+down_revision = 'd17a3e5b9f04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'translation',
+        sa.Column('lang', sa.String(length=10), primary_key=True),
+        sa.Column('source_hash', sa.String(length=40), primary_key=True),
+        sa.Column('source', sa.Text(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('backend', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('translation')
@@ -0,0 +1,23 @@
+"""index spam reports by reported user for fraud scoring
+
+Revision ID: f3a8d5c1b7e2
+Revises: e61b9a2c4f70
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d5c1b7e2'
+down_revision = 'e61b9a2c4f70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_spam_report_reported_user', 'spam_report', ['reported_user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_spam_report_reported_user', table_name='spam_report')